@@ -0,0 +1,281 @@
+import bisect
+import itertools
+from datetime import date, datetime, timedelta
+
+
+def parse_date(value):
+    """Allocation dates are stored as datetimes or as 'YYYY-MM-DD' (or 'DD-MM-YYYY') strings"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.strptime(text, '%Y-%m-%d').date()
+    except ValueError:
+        return datetime.strptime(text, '%d-%m-%Y').date()
+
+
+class MemberIntervals:
+    """One member's allocations, sorted by start date.
+
+    max_end[i] is the latest end date among the first i + 1 intervals, so an
+    overlap query only walks back over intervals that can still reach the
+    requested range instead of scanning the whole list.
+
+    Instances are never changed once built: add() and remove() return a new
+    one, which the index swaps in while readers finish with the old one.
+    """
+
+    __slots__ = ('starts', 'entries', 'max_end')
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)  # (start, end, allocation_id)
+        self.starts = [entry[0] for entry in self.entries]
+        self.max_end = list(itertools.accumulate((entry[1] for entry in self.entries), max))
+
+    def add(self, start, end, allocation_id):
+        i = bisect.bisect_right(self.starts, start)
+        return MemberIntervals(self.entries[:i] + [(start, end, allocation_id)] + self.entries[i:])
+
+    def remove(self, allocation_id):
+        """Return a copy without allocation_id, or None if it is not here"""
+        for i, entry in enumerate(self.entries):
+            if entry[2] == allocation_id:
+                return MemberIntervals(self.entries[:i] + self.entries[i + 1:])
+        return None
+
+    def overlapping(self, start, end):
+        """Yield the (start, end, allocation_id) entries that overlap [start, end]"""
+        i = bisect.bisect_right(self.starts, end) - 1
+        while i >= 0 and self.max_end[i] >= start:
+            if self.entries[i][1] >= start:
+                yield self.entries[i]
+            i -= 1
+
+
+class MemberIntervalIndex:
+    """Allocation date ranges grouped per MemberID for availability checks.
+
+    Writers must be serialised by the caller. Each write replaces a member's
+    MemberIntervals in one dict assignment, so readers need no lock: they
+    see a member's intervals either before or after a write, never halfway.
+    """
+
+    def __init__(self):
+        self._members = {}
+        self._owner = {}  # allocation_id -> member_id
+
+    @classmethod
+    def build(cls, items):
+        """Index (allocation_id, member_id, start, end) items in one pass"""
+        index = cls()
+        grouped = {}
+        for allocation_id, member_id, start, end in items:
+            grouped.setdefault(member_id, []).append((start, end, allocation_id))
+            index._owner[allocation_id] = member_id
+        for member_id, entries in grouped.items():
+            entries.sort(key=lambda entry: entry[0])
+            index._members[member_id] = MemberIntervals(entries)
+        return index
+
+    def add(self, allocation_id, member_id, start, end):
+        """Index an allocation, replacing any entry it already has"""
+        previous = self._owner.get(allocation_id)
+        if previous is not None and previous != member_id:
+            self.remove(allocation_id)
+        intervals = self._members.get(member_id) or MemberIntervals()
+        if previous == member_id:
+            intervals = intervals.remove(allocation_id) or intervals
+        self._owner[allocation_id] = member_id
+        self._members[member_id] = intervals.add(start, end, allocation_id)
+
+    def remove(self, allocation_id):
+        member_id = self._owner.pop(allocation_id, None)
+        if member_id is None:
+            return False
+        intervals = self._members[member_id].remove(allocation_id)
+        if intervals is None:
+            return False
+        self._members[member_id] = intervals
+        return True
+
+    def copy(self):
+        """Independent copy, e.g. for tentative bookings while planning"""
+        clone = MemberIntervalIndex()
+        # MemberIntervals are immutable, so the copy can share them
+        clone._members = dict(self._members)
+        clone._owner = dict(self._owner)
+        return clone
+
+    def move(self, allocation_id, start, end):
+        """Change the dates of an existing allocation"""
+        member_id = self._owner.get(allocation_id)
+        if member_id is None:
+            return False
+        intervals = self._members[member_id].remove(allocation_id)
+        if intervals is None:
+            return False
+        # One swap, so readers never see the allocation missing mid-move
+        self._members[member_id] = intervals.add(start, end, allocation_id)
+        return True
+
+    def is_available(self, member_id, start, end, exclude_allocation_id=None):
+        intervals = self._members.get(member_id)
+        if intervals is None:
+            return True
+        for entry in intervals.overlapping(start, end):
+            if entry[2] != exclude_allocation_id:
+                return False
+        return True
+
+    def available(self, member_ids, start, end):
+        """Return the subset of member_ids that are free for the whole of [start, end]"""
+        return [member_id for member_id in member_ids if self.is_available(member_id, start, end)]
+
+    def intervals(self, member_id):
+        """Return a member's (start, end, allocation_id) entries sorted by start date"""
+        intervals = self._members.get(member_id)
+        return list(intervals.entries) if intervals is not None else []
+
+    def busy(self, member_id, start, end):
+        """Return a member's entries overlapping [start, end], sorted by start date"""
+        intervals = self._members.get(member_id)
+        if intervals is None:
+            return []
+        return list(intervals.overlapping(start, end))[::-1]
+
+
+def working_days(start, end, skip_weekends=False, holidays=()):
+    """Dates in [start, end] that count towards a slot's length, in order"""
+    holidays = set(holidays)
+    days = []
+    day = start
+    while day <= end:
+        if not (skip_weekends and day.weekday() >= 5) and day not in holidays:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _free_runs(busy, days):
+    """Free (first, last) positions in `days` around busy (start, end, ...) entries sorted by start"""
+    runs = []
+    cursor = 0
+    for start, end, _ in busy:
+        first = bisect.bisect_left(days, start)
+        # Busy only on days that do not count gives last == first - 1: nothing
+        # is taken, but the run still breaks there so no window spans it
+        last = bisect.bisect_right(days, end) - 1
+        if first > cursor:
+            runs.append((cursor, first - 1))
+        cursor = max(cursor, last + 1)
+    if cursor < len(days):
+        runs.append((cursor, len(days) - 1))
+    return runs
+
+
+def find_slots(index, member_ids, start, end, duration, team_size=None, manager_ids=(),
+               skip_weekends=False, holidays=(), limit=5):
+    """Earliest windows of `duration` counted days in [start, end] where `team_size` of
+    member_ids, plus one of manager_ids if any are given, are free for the whole window.
+
+    Works in positions over the counted days, so weekends and holidays neither
+    count towards a window nor break one, unless a member is booked on them.
+    Each member's free runs that are long enough become sweep events ordered
+    by start; at every run start the open runs reaching the window's last day
+    are found by bisecting their sorted end positions. A feasible window
+    always starts at some run start, so the first hit is the earliest.
+    Further results come from later gaps.
+
+    Returns dicts with start/end dates, the chosen team (members whose runs
+    last longest), the manager, every free member, and the real length of
+    the team's common free gap (available_days, available_until).
+    """
+    days = working_days(start, end, skip_weekends, holidays)
+    manager_ids = list(dict.fromkeys(manager_ids))
+    member_ids = [m for m in dict.fromkeys(member_ids) if m not in manager_ids]
+    team_size = len(member_ids) if team_size is None else team_size
+    if duration < 1 or not days or team_size > len(member_ids) or (team_size < 1 and not manager_ids):
+        return []
+
+    seq = itertools.count()
+    events = []
+    for is_manager, ids in ((False, member_ids), (True, manager_ids)):
+        for member_id in ids:
+            for first, last in _free_runs(index.busy(member_id, days[0], days[-1]), days):
+                if last - first + 1 >= duration:
+                    events.append((first, last, next(seq), member_id, is_manager))
+    events.sort()
+
+    # (run end, seq, member_id) of every run opened so far; runs that ended
+    # before the current start fall below the bisect and are never counted
+    open_members, open_managers = [], []
+    slots = []
+    skip_until = -1
+    i = 0
+    while i < len(events) and len(slots) < limit:
+        window_start = events[i][0]
+        while i < len(events) and events[i][0] == window_start:
+            first, last, n, member_id, is_manager = events[i]
+            bisect.insort(open_managers if is_manager else open_members, (last, n, member_id))
+            i += 1
+        if window_start <= skip_until:
+            continue
+        window_end = window_start + duration - 1
+        free = open_members[bisect.bisect_left(open_members, (window_end,)):]
+        managers = open_managers[bisect.bisect_left(open_managers, (window_end,)):]
+        if len(free) < team_size or (manager_ids and not managers):
+            continue
+        team = free[len(free) - team_size:] if team_size > 0 else []
+        manager = managers[-1] if managers else None
+        until = min(run[0] for run in team + ([manager] if manager else []))
+        slots.append({
+            'start': days[window_start],
+            'end': days[window_end],
+            'available_days': until - window_start + 1,
+            'available_until': days[until],
+            'members': [run[2] for run in team],
+            'manager': manager[2] if manager else None,
+            'free_members': [run[2] for run in free]
+        })
+        skip_until = until
+    return slots
+
+
+def plan_batch(index, audits, skip_weekends=False, holidays=()):
+    """Greedily place a batch of audits on a copy of the index.
+
+    Each audit is a dict with description, section, duration, headcount,
+    earliest, latest, member_ids and manager_ids. Audits are placed earliest
+    deadline first (longer and larger ones first on ties), each in the
+    earliest slot find_slots() gives; its team is then booked on the copy so
+    later audits see it. Returns (planned, unplaceable), both in input order
+    and carrying the audit's position as 'index'.
+    """
+    working = index.copy()
+    order = sorted(range(len(audits)), key=lambda i: (
+        audits[i]['latest'], -audits[i]['duration'], -audits[i]['headcount']
+    ))
+    planned, unplaceable = [], []
+    for n, i in enumerate(order):
+        audit = audits[i]
+        slots = find_slots(
+            working, audit['member_ids'], audit['earliest'], audit['latest'], audit['duration'],
+            team_size=audit['headcount'], manager_ids=audit['manager_ids'],
+            skip_weekends=skip_weekends, holidays=holidays, limit=1
+        )
+        if not slots:
+            unplaceable.append({'index': i, 'description': audit['description'],
+                                'reason': 'No window with enough free members'})
+            continue
+        slot = slots[0]
+        booked = slot['members'] + ([slot['manager']] if slot['manager'] is not None else [])
+        for member_id in booked:
+            working.add(('planned', n, member_id), member_id, slot['start'], slot['end'])
+        planned.append({'index': i, 'description': audit['description'], 'section': audit['section'],
+                        'start': slot['start'], 'end': slot['end'],
+                        'members': slot['members'], 'manager': slot['manager']})
+    planned.sort(key=lambda p: p['index'])
+    unplaceable.sort(key=lambda u: u['index'])
+    return planned, unplaceable
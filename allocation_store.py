@@ -0,0 +1,489 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import date
+from openpyxl import load_workbook, Workbook
+from allocation_index import MemberIntervalIndex, parse_date
+from member_registry import MemberRegistry
+
+# Sheet headers of the legacy audit_allocations.xlsx layout
+MEMBER_HEADERS = ["MemberID", "Name", "Email", "Department"]
+ALLOCATION_HEADERS = ["AllocationID", "MemberID", "Description", "Section", "FromDate", "ToDate", "FinancialYear"]
+
+
+def financial_year(day):
+    """Financial year (April-March) containing the given date, e.g. '2025-2026'"""
+    if day.month >= 4:
+        return f"{day.year}-{day.year + 1}"
+    return f"{day.year - 1}-{day.year}"
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+class Member:
+    __slots__ = ('member_id', 'name', 'email', 'department')
+
+    def __init__(self, member_id, name, email=None, department=None):
+        self.member_id = member_id
+        self.name = name
+        self.email = email
+        self.department = department
+
+    def to_dict(self):
+        return {"id": self.member_id, "name": self.name, "email": self.email, "department": self.department}
+
+
+class Allocation:
+    __slots__ = ('allocation_id', 'member_id', 'description', 'section', 'from_date', 'to_date', 'financial_year')
+
+    def __init__(self, allocation_id, member_id, description, section, from_date, to_date, financial_year=None):
+        self.allocation_id = allocation_id
+        self.member_id = member_id
+        self.description = description
+        self.section = section
+        self.from_date = from_date
+        self.to_date = to_date
+        self.financial_year = financial_year
+
+    def to_dict(self):
+        return {
+            "id": self.allocation_id,
+            "memberId": self.member_id,
+            "description": self.description,
+            "section": self.section,
+            "fromDate": _iso(self.from_date),
+            "toDate": _iso(self.to_date),
+            "financialYear": self.financial_year
+        }
+
+    def as_row(self):
+        """Values in Allocations sheet order, with ISO date strings"""
+        return (self.allocation_id, self.member_id, self.description, self.section,
+                _iso(self.from_date), _iso(self.to_date), self.financial_year)
+
+
+def _sheet_records(ws):
+    """Yield each data row of a sheet as a dict keyed by its header row"""
+    rows = ws.iter_rows(values_only=True)
+    header = [str(name).strip() if name is not None else None for name in next(rows, ())]
+    for row in rows:
+        if row and row[0] is not None:
+            yield dict(zip(header, row))
+
+
+class AllocationSnapshot:
+    """Members and Allocations parsed once into typed records, plus the interval index.
+
+    Workbook sheets are read by header name, so workbooks without a Section
+    column load too.
+    """
+
+    def __init__(self, members, allocations):
+        self.members = {member.member_id: member for member in members}
+        self.allocations = {alloc.allocation_id: alloc for alloc in allocations}
+        self.index = MemberIntervalIndex.build(
+            (alloc.allocation_id, alloc.member_id, alloc.from_date, alloc.to_date)
+            for alloc in self.allocations.values()
+        )
+        # Allocations partitioned by financial year, and each year's
+        # (etag, serialized rows) once it has been asked for. Writes and
+        # payload builds hold _lock, so a payload built from rows a write has
+        # since replaced is never stored after that write dropped it.
+        self.by_year = {}
+        self._year_payloads = {}
+        self._lock = threading.Lock()
+        self._registry = None
+        for alloc in self.allocations.values():
+            self._file(alloc)
+
+    def _file(self, alloc):
+        self.by_year.setdefault(alloc.financial_year, {})[alloc.allocation_id] = alloc
+        self._year_payloads.pop(alloc.financial_year, None)
+
+    def _unfile(self, alloc):
+        partition = self.by_year.get(alloc.financial_year)
+        if partition is not None:
+            partition.pop(alloc.allocation_id, None)
+            if not partition:
+                del self.by_year[alloc.financial_year]
+        self._year_payloads.pop(alloc.financial_year, None)
+
+    @classmethod
+    def from_workbook(cls, path):
+        wb = load_workbook(path, read_only=True)
+        try:
+            members = [
+                Member(rec.get('MemberID'), rec.get('Name'), rec.get('Email'), rec.get('Department'))
+                for rec in _sheet_records(wb["Members"])
+            ]
+            allocations = []
+            for rec in _sheet_records(wb["Allocations"]):
+                from_date = parse_date(rec['FromDate'])
+                fy = rec.get('FinancialYear')
+                allocations.append(Allocation(
+                    rec['AllocationID'], rec.get('MemberID'), rec.get('Description'), rec.get('Section'),
+                    from_date, parse_date(rec['ToDate']),
+                    str(fy) if fy else financial_year(from_date)
+                ))
+        finally:
+            wb.close()
+        return cls(members, allocations)
+
+    @property
+    def registry(self):
+        """MemberRegistry over this snapshot's members, built on first use.
+
+        Allocation writes applied to the snapshot leave members alone, so it
+        stays valid until the snapshot itself is replaced by a reload.
+        """
+        if self._registry is None:
+            self._registry = MemberRegistry(self.members)
+        return self._registry
+
+    def member_list(self):
+        return list(self.members.values())
+
+    def allocation_list(self):
+        return list(self.allocations.values())
+
+    def year(self, fy):
+        """Allocations of one financial year, without scanning other years"""
+        return list(self.by_year.get(fy, {}).values())
+
+    def year_payload(self, fy):
+        """Return (etag, list of allocation dicts) for a financial year.
+
+        The etag is a hash of the year's content, so it is the same in every
+        process and only changes when that year's allocations do.
+        """
+        with self._lock:
+            payload = self._year_payloads.get(fy)
+            if payload is None:
+                rows = [alloc.to_dict() for alloc in self.year(fy)]
+                digest = hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()[:20]
+                payload = self._year_payloads[fy] = (f"{fy}-{digest}", rows)
+            return payload
+
+    def add_allocation(self, alloc):
+        """Add or, if its id is already here, replace an allocation"""
+        with self._lock:
+            old = self.allocations.get(alloc.allocation_id)
+            if old is not None:
+                self._unfile(old)
+            self.allocations[alloc.allocation_id] = alloc
+            self.index.add(alloc.allocation_id, alloc.member_id, alloc.from_date, alloc.to_date)
+            self._file(alloc)
+
+    def replace_allocation(self, alloc):
+        with self._lock:
+            old = self.allocations.get(alloc.allocation_id)
+            if old is not None:
+                self._unfile(old)
+            self.allocations[alloc.allocation_id] = alloc
+            self.index.move(alloc.allocation_id, alloc.from_date, alloc.to_date)
+            self._file(alloc)
+
+    def remove_allocation(self, allocation_id):
+        with self._lock:
+            alloc = self.allocations.pop(allocation_id, None)
+            if alloc is not None:
+                self.index.remove(allocation_id)
+                self._unfile(alloc)
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SnapshotCache:
+    """Process-wide snapshot of one data source, rebuilt only when its state key changes.
+
+    load() returns (key, snapshot), where key is the state the snapshot was
+    read at, or None if that is not known; state() returns the current key.
+    """
+
+    def __init__(self, load, state):
+        self._load = load
+        self.state = state
+        self._lock = threading.Lock()
+        self._key = None
+        self._snapshot = None
+
+    def get(self):
+        with self._lock:
+            # The key always describes the data actually loaded, so apply()
+            # never replays a write onto a snapshot that already has it
+            if self._snapshot is None or self._key is None or self._key != self.state():
+                self._key, self._snapshot = self._load()
+            return self._snapshot
+
+    def apply(self, state_before, state_after, change):
+        """Apply this process's own write to the snapshot instead of reloading it.
+
+        If the snapshot did not match the source as it was before the write
+        (someone else wrote in between), drop it so the next read reloads.
+        """
+        with self._lock:
+            if self._snapshot is not None and self._key == state_before:
+                change(self._snapshot)
+                self._key = state_after
+            else:
+                self._key = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _load_workbook_snapshot(path):
+    """Return (state, snapshot), with state None if the file changed while it was read"""
+    before = _file_state(path)
+    snapshot = AllocationSnapshot.from_workbook(path)
+    return (before if _file_state(path) == before else None), snapshot
+
+
+def snapshot_cache(path):
+    """Return the shared SnapshotCache for a workbook path"""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = SnapshotCache(
+                lambda: _load_workbook_snapshot(path), lambda: _file_state(path)
+            )
+        return cache
+
+
+class AllocationConflict(Exception):
+    """The member already has an allocation overlapping the requested dates"""
+
+    def __init__(self, member_id, allocation_id):
+        super().__init__(f"Member {member_id} is already allocated ({allocation_id}) for these dates")
+        self.member_id = member_id
+        self.allocation_id = allocation_id
+
+
+def _allocation_from_row(row):
+    return Allocation(row['allocation_id'], row['member_id'], row['description'], row['section'],
+                      date.fromisoformat(row['from_date']), date.fromisoformat(row['to_date']),
+                      row['financial_year'])
+
+
+class AllocationStore:
+    """SQLite store for members and allocations, replacing audit_allocations.xlsx.
+
+    Writes run in BEGIN IMMEDIATE transactions, so the overlap check and the
+    insert or update cannot interleave with another writer in any process.
+    Each write also bumps meta.generation, which read snapshots are keyed on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+        self._cache = SnapshotCache(self._load_snapshot, self.generation)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Never reuse a connection inherited across fork (e.g. gunicorn --preload)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS members (
+                    member_id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    email TEXT,
+                    department TEXT
+                )
+            ''')
+            # AUTOINCREMENT: ids of deleted allocations are never handed out again
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS allocations (
+                    allocation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    member_id INTEGER NOT NULL,
+                    description TEXT,
+                    section TEXT,
+                    from_date TEXT NOT NULL,
+                    to_date TEXT NOT NULL,
+                    financial_year TEXT
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_allocations_member_dates ON allocations (member_id, from_date, to_date)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            # Every write sets financial_year; fill it in once for rows that predate that
+            legacy = conn.execute(
+                'SELECT allocation_id, from_date FROM allocations WHERE financial_year IS NULL'
+            ).fetchall()
+            if legacy:
+                conn.executemany(
+                    'UPDATE allocations SET financial_year = ? WHERE allocation_id = ?',
+                    [(financial_year(date.fromisoformat(row['from_date'])), row['allocation_id']) for row in legacy]
+                )
+                self._bump_generation(conn)
+
+    def _bump_generation(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def _check_free(self, conn, member_id, from_date, to_date, exclude_allocation_id=None):
+        row = conn.execute(
+            'SELECT allocation_id FROM allocations '
+            'WHERE member_id = ? AND from_date <= ? AND to_date >= ? AND allocation_id IS NOT ? LIMIT 1',
+            (member_id, to_date.isoformat(), from_date.isoformat(), exclude_allocation_id)
+        ).fetchone()
+        if row is not None:
+            raise AllocationConflict(member_id, row[0])
+
+    def _load_snapshot(self):
+        """Return (generation, snapshot), all read in one transaction so they always agree"""
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            members = [Member(row['member_id'], row['name'], row['email'], row['department'])
+                       for row in conn.execute('SELECT * FROM members ORDER BY member_id')]
+            allocations = [_allocation_from_row(row)
+                           for row in conn.execute('SELECT * FROM allocations ORDER BY allocation_id')]
+        return generation, AllocationSnapshot(members, allocations)
+
+    def generation(self):
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def snapshot(self):
+        """Shared in-memory view of all members and allocations, reloaded only after other writers"""
+        return self._cache.get()
+
+    def is_empty(self):
+        conn = self._connect()
+        return bool(conn.execute('SELECT NOT EXISTS (SELECT 1 FROM members UNION ALL SELECT 1 FROM allocations)').fetchone()[0])
+
+    def get(self, allocation_id):
+        row = self._connect().execute('SELECT * FROM allocations WHERE allocation_id = ?', (allocation_id,)).fetchone()
+        return _allocation_from_row(row) if row is not None else None
+
+    def create(self, member_id, description, section, from_date, to_date):
+        """Insert an allocation, raising AllocationConflict if the member is already booked"""
+        fy = financial_year(from_date)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._check_free(conn, member_id, from_date, to_date)
+            cursor = conn.execute(
+                'INSERT INTO allocations (member_id, description, section, from_date, to_date, financial_year) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (member_id, description, section, from_date.isoformat(), to_date.isoformat(), fy)
+            )
+            generation = self._bump_generation(conn)
+        alloc = Allocation(cursor.lastrowid, member_id, description, section, from_date, to_date, fy)
+        self._cache.apply(generation - 1, generation, lambda snapshot: snapshot.add_allocation(alloc))
+        return alloc
+
+    def create_many(self, items):
+        """Insert (member_id, description, section, from_date, to_date) items in one transaction.
+
+        Any overlap, with existing allocations or within the batch, raises
+        AllocationConflict and nothing is written.
+        """
+        conn = self._connect()
+        created = []
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for member_id, description, section, from_date, to_date in items:
+                self._check_free(conn, member_id, from_date, to_date)
+                fy = financial_year(from_date)
+                cursor = conn.execute(
+                    'INSERT INTO allocations (member_id, description, section, from_date, to_date, financial_year) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (member_id, description, section, from_date.isoformat(), to_date.isoformat(), fy)
+                )
+                created.append(Allocation(cursor.lastrowid, member_id, description, section, from_date, to_date, fy))
+            generation = self._bump_generation(conn)
+
+        def add_all(snapshot):
+            for alloc in created:
+                snapshot.add_allocation(alloc)
+        self._cache.apply(generation - 1, generation, add_all)
+        return created
+
+    def update(self, allocation_id, description, section, from_date, to_date):
+        """Change an allocation's details and dates; returns None if it does not exist"""
+        fy = financial_year(from_date)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT member_id FROM allocations WHERE allocation_id = ?', (allocation_id,)).fetchone()
+            if row is None:
+                return None
+            self._check_free(conn, row['member_id'], from_date, to_date, exclude_allocation_id=allocation_id)
+            conn.execute(
+                'UPDATE allocations SET description = ?, section = ?, from_date = ?, to_date = ?, financial_year = ? '
+                'WHERE allocation_id = ?',
+                (description, section, from_date.isoformat(), to_date.isoformat(), fy, allocation_id)
+            )
+            generation = self._bump_generation(conn)
+        alloc = Allocation(allocation_id, row['member_id'], description, section, from_date, to_date, fy)
+        self._cache.apply(generation - 1, generation, lambda snapshot: snapshot.replace_allocation(alloc))
+        return alloc
+
+    def delete(self, allocation_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.execute('DELETE FROM allocations WHERE allocation_id = ?', (allocation_id,)).rowcount
+            if not deleted:
+                return False
+            generation = self._bump_generation(conn)
+        self._cache.apply(generation - 1, generation, lambda snapshot: snapshot.remove_allocation(allocation_id))
+        return True
+
+    def import_xlsx(self, path):
+        """Load members and allocations from a workbook in the legacy layout, keeping their ids"""
+        snapshot = AllocationSnapshot.from_workbook(path)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT OR IGNORE INTO members (member_id, name, email, department) VALUES (?, ?, ?, ?)',
+                [(m.member_id, m.name, m.email, m.department) for m in snapshot.member_list()]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO allocations '
+                '(allocation_id, member_id, description, section, from_date, to_date, financial_year) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [alloc.as_row() for alloc in snapshot.allocation_list()]
+            )
+            self._bump_generation(conn)
+        return len(snapshot.members), len(snapshot.allocations)
+
+    def export_xlsx(self, target):
+        """Write members and allocations to an xlsx file path or buffer in the legacy layout"""
+        snapshot = self.snapshot()
+        wb = Workbook()
+        ws_members = wb.active
+        ws_members.title = "Members"
+        ws_members.append(MEMBER_HEADERS)
+        for m in snapshot.member_list():
+            ws_members.append([m.member_id, m.name, m.email, m.department])
+        ws_alloc = wb.create_sheet("Allocations")
+        ws_alloc.append(ALLOCATION_HEADERS)
+        for alloc in snapshot.allocation_list():
+            ws_alloc.append(list(alloc.as_row()))
+        wb.save(target)
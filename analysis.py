@@ -1,37 +1,186 @@
+import sys
+from itertools import chain
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 from datetime import datetime, timedelta
+from punch_state import PunchStateStore
 
-def analyze_punch_data(punch_in_file, punch_out_file):
-    # Read the CSV files
-    punch_in_df = pd.read_csv(punch_in_file)
-    punch_out_df = pd.read_csv(punch_out_file)
+# Punch files are read this many rows at a time
+CHUNK_ROWS = 500_000
 
-    # Data Cleaning and Preparation
-    punch_in_df["in_datetime"] = pd.to_datetime(punch_in_df["in_date"] + " " + punch_in_df["punchin_time"], format="%d-%m-%Y %H:%M:%S")
-    punch_out_df["out_datetime"] = pd.to_datetime(punch_out_df["Date"] + " " + punch_out_df["punch_out_time"], format="%d-%m-%Y %H:%M:%S")
+# Longest time between a punch-in and the punch-out it can be paired with
+MAX_SHIFT = timedelta(hours=12)
 
-    # Sort by person number and datetime
-    punch_in_df = punch_in_df.sort_values(by=["Persno", "in_datetime"])
-    punch_out_df = punch_out_df.sort_values(by=["persno", "out_datetime"])
+# (person, date, time, parsed datetime) columns of each file
+IN_COLUMNS = ("Persno", "in_date", "punchin_time", "in_datetime")
+OUT_COLUMNS = ("persno", "Date", "punch_out_time", "out_datetime")
 
-    # Merge the dataframes
-    merged_df = pd.merge(punch_in_df, punch_out_df, left_on="Persno", right_on="persno", how="outer", suffixes=("_in", "_out"))
+# Incremental mode (--incremental) keeps pairs and open punch-ins here between runs
+STATE_DIR = "punch_pairing_state"
 
-    # Identify overnight shifts
-    # An overnight punch is defined as a punch-in on one day and a punch-out on the next day, within a reasonable timeframe (e.g., less than 12 hours total duration)
-    # For the edge case provided (39305, 22:29:00 on 01-04-2024 and 07:30:00 on 02-04-2024), the time difference is 9 hours and 1 minute.
-    # This condition (time_diff > 0 and time_diff < 12 hours) correctly identifies such cases.
-    merged_df["time_diff"] = merged_df["out_datetime"] - merged_df["in_datetime"]
-    overnight_punches = merged_df[(merged_df["time_diff"] > timedelta(hours=0)) & (merged_df["time_diff"] < timedelta(hours=12))]
+def punch_file_options(person_column, date_column, time_column):
+    """read_csv arguments that load only the person, date and time columns"""
+    return {
+        "usecols": [person_column, date_column, time_column],
+        "dtype": {person_column: "Int64", date_column: "category", time_column: "category"}
+    }
+
+def read_punch_file(path, person_column, date_column, time_column, datetime_column, chunk_rows=CHUNK_ROWS):
+    """Read only the person, date and time columns, in chunks, adding the parsed datetime.
+
+    Chunking keeps the CSV text and parsing temporaries to one chunk, but the
+    whole file is returned as one frame: every row ends up in the workbook,
+    so memory still grows with the file. For large exports use
+    --incremental, which only holds the rows added since the last run.
+    """
+    chunks = pd.read_csv(path, chunksize=chunk_rows, **punch_file_options(person_column, date_column, time_column))
+    return parse_punch_chunks(chunks, person_column, date_column, time_column, datetime_column)
+
+def parse_punch_chunks(chunks, person_column, date_column, time_column, datetime_column):
+    """Concatenate punch chunks, adding the parsed datetime.
+
+    Dates and times repeat heavily, so they are kept as categoricals; the
+    full text columns are never held in memory at once.
+    """
+    frames = []
+    for chunk in chunks:
+        text = chunk[date_column].astype(str) + " " + chunk[time_column].astype(str)
+        # One fixed unit, so frames parsed in different runs (or empty ones) join on equal key types
+        chunk[datetime_column] = pd.to_datetime(text, format="%d-%m-%Y %H:%M:%S").astype("datetime64[ns]")
+        frames.append(chunk)
+    if not frames:
+        return pd.DataFrame({
+            person_column: pd.array([], dtype="Int64"),
+            date_column: pd.Categorical([]),
+            time_column: pd.Categorical([]),
+            datetime_column: pd.Series([], dtype="datetime64[ns]")
+        })
+
+    df = pd.concat(frames, ignore_index=True)
+    # Chunks have their own categories; concat alone would fall back to object
+    for column in (date_column, time_column):
+        df[column] = union_categoricals([frame[column] for frame in frames])
+    return df
+
+def pair_punches(punch_in_df, punch_out_df, max_gap=MAX_SHIFT):
+    """Pair every punch-in with the same person's next punch-out within max_gap.
+
+    Returns (pairs, ins without an out, outs without an in), all in the
+    in-columns + out-columns + time_diff layout. An out is paired with the
+    latest punch-in before it, so a repeated punch-in leaves the earlier one
+    unmatched. Sorting plus the as-of join keeps this linear in the number
+    of punches.
+    """
+    ins = punch_in_df.sort_values("in_datetime", kind="stable").reset_index(drop=True)
+    outs = punch_out_df.sort_values("out_datetime", kind="stable").reset_index(drop=True)
+    outs["out_row"] = np.arange(len(outs))
+    columns = list(ins.columns) + list(punch_out_df.columns) + ["time_diff"]
+
+    candidates = pd.merge_asof(
+        ins, outs,
+        left_on="in_datetime", right_on="out_datetime",
+        left_by="Persno", right_by="persno",
+        direction="forward", tolerance=max_gap, allow_exact_matches=False
+    )
+    # Several ins can reach the same out before it; it belongs to the last of them
+    paired = candidates["out_row"].notna() & ~candidates.duplicated("out_row", keep="last")
+
+    pairs = candidates[paired].assign(time_diff=lambda df: df["out_datetime"] - df["in_datetime"])
+    unmatched_ins = ins[~paired.to_numpy()].reindex(columns=columns)
+    unmatched_outs = outs[~outs["out_row"].isin(pairs["out_row"])].reindex(columns=columns)
+    return pairs.reindex(columns=columns), unmatched_ins, unmatched_outs
+
+def has_later_out(ins, outs, max_gap=MAX_SHIFT):
+    """Whether each punch-in has an out of the same person after it within max_gap, paired or not"""
+    order = np.argsort(ins["in_datetime"].to_numpy(), kind="stable")
+    found = pd.merge_asof(
+        ins[["Persno", "in_datetime"]].iloc[order].reset_index(drop=True),
+        outs[["persno", "out_datetime"]].sort_values("out_datetime", kind="stable"),
+        left_on="in_datetime", right_on="out_datetime",
+        left_by="Persno", right_by="persno",
+        direction="forward", tolerance=max_gap, allow_exact_matches=False
+    )
+    reached = np.empty(len(ins), dtype=bool)
+    reached[order] = found["out_datetime"].notna().to_numpy()
+    return reached
 
-    # Identify punch in without punch out
-    punch_in_without_out = merged_df[merged_df["out_datetime"].isnull()]
+def update_pairing(store, punch_in_files, punch_out_files, chunk_rows=CHUNK_ROWS):
+    """Pair the punches added since the last run, together with the punch-ins still waiting for an out.
 
-    # Identify punch out without punch in
-    punch_out_without_in = merged_df[merged_df["in_datetime"].isnull()]
+    Pairs and unmatched outs are final and go to their day partitions. An
+    unmatched in whose out was taken by a later in is final too. Any other
+    unmatched in stays open until the newest punch seen is more than
+    MAX_SHIFT past it, since until then its out may arrive in a later file.
+    Files are expected to arrive in time order (e.g. one export per day).
+    """
+    def new_punches(paths, columns):
+        chunks = chain.from_iterable(
+            store.new_rows(path, chunk_rows, **punch_file_options(*columns[:3])) for path in paths
+        )
+        return parse_punch_chunks(chunks, *columns)
 
-    # Both punch in and punch out
-    both_in_and_out = merged_df.dropna(subset=["in_datetime", "out_datetime"])
+    new_ins = new_punches(punch_in_files, IN_COLUMNS)
+    new_outs = new_punches(punch_out_files, OUT_COLUMNS)
+    if len(new_ins) or len(new_outs):
+        open_ins = store.read_table("open_ins")
+        ins = new_ins if open_ins is None else pd.concat([open_ins, new_ins], ignore_index=True)
+        pairs, unmatched_ins, unmatched_outs = pair_punches(ins, new_outs)
+
+        latest = pd.Series([
+            pd.Timestamp(store.meta.get("latest")), new_ins["in_datetime"].max(), new_outs["out_datetime"].max()
+        ]).max()
+        still_open = ((unmatched_ins["in_datetime"] + MAX_SHIFT >= latest).to_numpy()
+                      & ~has_later_out(unmatched_ins, new_outs))
+
+        store.append("pairs", pairs, "in_datetime")
+        store.append("unmatched_outs", unmatched_outs, "out_datetime")
+        store.append("unmatched_ins", unmatched_ins[~still_open], "in_datetime")
+        store.write_table("open_ins", unmatched_ins.loc[still_open, list(IN_COLUMNS)])
+        store.meta["latest"] = latest.isoformat()
+
+    for path in list(punch_in_files) + list(punch_out_files):
+        store.mark_ingested(path)
+    store.save()
+
+def stored_pairing(store):
+    """(pairs, ins without an out, outs without an in) for everything ingested into the store"""
+    columns = list(IN_COLUMNS) + list(OUT_COLUMNS) + ["time_diff"]
+
+    def rows(frames, time_column):
+        frames = [frame for frame in frames if frame is not None]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        combined = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+        return combined.sort_values(time_column, kind="stable", ignore_index=True)
+
+    return (
+        rows([store.read("pairs")], "in_datetime"),
+        rows([store.read("unmatched_ins"), store.read_table("open_ins")], "in_datetime"),
+        rows([store.read("unmatched_outs")], "out_datetime")
+    )
+
+def analyze_punch_data(punch_in_file, punch_out_file, incremental=False):
+    if incremental:
+        # Only what was added to the files since the last run is read
+        store = PunchStateStore(STATE_DIR)
+        update_pairing(store, [punch_in_file], [punch_out_file])
+        both_in_and_out, punch_in_without_out, punch_out_without_in = stored_pairing(store)
+    else:
+        # Read the CSV files
+        punch_in_df = read_punch_file(punch_in_file, *IN_COLUMNS)
+        punch_out_df = read_punch_file(punch_out_file, *OUT_COLUMNS)
+
+        # Pair each punch in with its punch out; whatever is left over is unmatched
+        both_in_and_out, punch_in_without_out, punch_out_without_in = pair_punches(punch_in_df, punch_out_df)
+
+    # Identify overnight shifts
+    # An overnight punch is defined as a punch-in on one day and a punch-out on the next day, within a reasonable timeframe (MAX_SHIFT, 12 hours)
+    # For the edge case provided (39305, 22:29:00 on 01-04-2024 and 07:30:00 on 02-04-2024), the time difference is 9 hours and 1 minute.
+    # Pairs are already within MAX_SHIFT, so only the change of day needs checking.
+    overnight_punches = both_in_and_out[
+        both_in_and_out["out_datetime"].dt.normalize() > both_in_and_out["in_datetime"].dt.normalize()
+    ]
 
     print("\n--- Punch In without Punch Out ---")
     print(punch_in_without_out)
@@ -50,6 +199,7 @@ def analyze_punch_data(punch_in_file, punch_out_file):
         overnight_punches.to_excel(writer, sheet_name="Overnight Punches", index=False)
 
 if __name__ == "__main__":
-    analyze_punch_data("punch_in_data.csv", "punch_out_data.csv")
+    # python analysis.py [--incremental]
+    analyze_punch_data("punch_in_data.csv", "punch_out_data.csv", incremental="--incremental" in sys.argv[1:])
 
 
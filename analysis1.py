@@ -1,9 +1,27 @@
+import sys
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
+from punch_state import PunchStateStore
 
 # ==== CONFIG ====
 INPUT_FILE = "punch_data.csv"
 
+# Streaming mode (--stream) reads this many punches at a time
+CHUNK_ROWS = 500_000
+
+# Incremental mode (--incremental) keeps employee-day states here between runs
+STATE_DIR = "attendance_state"
+
+# Columns read from the punch file (after strip/lower) and their types
+PUNCH_DTYPES = {
+    "employee number": "Int64",
+    "last name": "category",
+    "location": "category",
+    "date": str,
+    "time": str
+}
+
 # Shift timings
 STAFF_SHIFTS = [
     ("07:30", "15:30"),
@@ -18,116 +36,361 @@ WORKMEN_SHIFTS = [
 # Grace period
 GRACE_MINUTES = 10
 
+# An out punch belongs to the shift of the employee's last gate in punch up to this long before it
+MAX_SHIFT = timedelta(hours=12)
+
+PUNCH_SLOTS = [("main", "in"), ("lcm", "in"), ("main", "out"), ("lcm", "out")]
+
+
+# ==== Shift boundaries, parsed once ====
+def shift_boundaries(shifts):
+    """(starts, ends) as minutes after midnight; an end at or before its start is on the next day"""
+    def minutes(text):
+        hours, mins = text.split(":")
+        return int(hours) * 60 + int(mins)
+
+    starts = np.array([minutes(start) for start, _ in shifts])
+    ends = np.array([minutes(end) for _, end in shifts])
+    return starts, np.where(ends <= starts, ends + 24 * 60, ends)
+
+
+SHIFT_BOUNDS = {
+    "staff": shift_boundaries(STAFF_SHIFTS),
+    "workmen": shift_boundaries(WORKMEN_SHIFTS)
+}
+
+
 # ==== STEP 1: READ FILE ====
-df = pd.read_csv(INPUT_FILE)
+def read_options(path):
+    """usecols and dtype for read_csv, keyed by the file's own header spelling"""
+    header = pd.read_csv(path, nrows=0).columns
+    names = {column: column.strip().lower() for column in header if column.strip().lower() in PUNCH_DTYPES}
+    return list(names), {column: PUNCH_DTYPES[name] for column, name in names.items()}
+
+
+def prepare_punches(df):
+    # Standardize column names
+    df.columns = df.columns.str.strip().str.lower()
+
+    # Ensure datetime format; the text columns are not needed after this
+    df["datetime"] = pd.to_datetime(df["date"] + " " + df["time"], format="%Y-%m-%d %H:%M")
+    return df.drop(columns=["date", "time"])
+
+
+def load_punches(path=INPUT_FILE):
+    usecols, dtype = read_options(path)
+    return prepare_punches(pd.read_csv(path, usecols=usecols, dtype=dtype))
 
-# Standardize column names
-df.columns = df.columns.str.strip().str.lower()
 
-# Ensure datetime format
-df["datetime"] = pd.to_datetime(df["date"] + " " + df["time"], format="%Y-%m-%d %H:%M")
+def iter_punches(path=INPUT_FILE, chunk_rows=CHUNK_ROWS):
+    """The punch file in chunks of chunk_rows, each prepared like load_punches"""
+    usecols, dtype = read_options(path)
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+        yield prepare_punches(chunk)
+
 
 # ==== STEP 2: Parse location ====
-def parse_location(loc):
-    loc = loc.lower()
-    if "main" in loc:
-        gate = "main"
-    elif "lcm" in loc:
-        gate = "lcm"
-    else:
-        gate = "unknown"
+def parse_locations(locations):
+    """gate (main/lcm/unknown) and punch type (door 1 = in, door 2 = out) for every location"""
+    # A gate log names only a handful of doors, so classify each distinct one once
+    codes, uniques = pd.factorize(locations)
+    loc = pd.Series(uniques).str.lower()
+    gate = np.select([loc.str.contains("main", regex=False), loc.str.contains("lcm", regex=False)],
+                     ["main", "lcm"], default="unknown")
+    punch_type = np.select([loc.str.contains("door 1", regex=False), loc.str.contains("door 2", regex=False)],
+                           ["in", "out"], default="unknown")
+    return gate[codes], punch_type[codes]
 
-    if "door 1" in loc:
-        punch_type = "in"
-    elif "door 2" in loc:
-        punch_type = "out"
-    else:
-        punch_type = "unknown"
 
-    return gate, punch_type
+# ==== STEP 3: Match punches to shifts ====
+def nearest_boundary(minutes, boundaries):
+    """Nearest shift boundary to each minute of the day, looking at the previous, same and next day.
 
-df[["gate", "punch_type"]] = df["location"].apply(lambda x: pd.Series(parse_location(x)))
+    Returns (shift index, day offset of that shift's start from the punch's day);
+    a punch exactly halfway between two boundaries goes to the earlier one.
+    """
+    count = len(boundaries)
+    edges = np.concatenate([boundaries - 24 * 60, boundaries, boundaries + 24 * 60])
+    order = np.argsort(edges, kind="stable")
+    edges = edges[order]
+    shift = np.tile(np.arange(count), 3)[order]
+    offset = np.repeat([-1, 0, 1], count)[order]
 
-# ==== STEP 3: Assign shift times ====
-def get_shift_times(emp_type, punch_dt):
-    if emp_type.lower() == "staff":
-        for start, end in STAFF_SHIFTS:
-            start_dt = datetime.combine(punch_dt.date(), datetime.strptime(start, "%H:%M").time())
-            end_dt = datetime.combine(punch_dt.date(), datetime.strptime(end, "%H:%M").time())
-            return start_dt, end_dt
-    else:
-        for start, end in WORKMEN_SHIFTS:
-            start_dt = datetime.combine(punch_dt.date(), datetime.strptime(start, "%H:%M").time())
-            if end == "07:30":  # night shift crosses midnight
-                end_dt = datetime.combine(punch_dt.date() + timedelta(days=1), datetime.strptime(end, "%H:%M").time())
-            else:
-                end_dt = datetime.combine(punch_dt.date(), datetime.strptime(end, "%H:%M").time())
-            return start_dt, end_dt
-    return None, None
+    pos = np.searchsorted(edges, minutes)
+    before = np.clip(pos - 1, 0, len(edges) - 1)
+    after = np.clip(pos, 0, len(edges) - 1)
+    pick = np.where(minutes - edges[before] <= edges[after] - minutes, before, after)
+    return shift[pick], offset[pick]
+
+
+def match_shifts(punch_times, emp_types, punch_type):
+    """Shift day and (start, end) minutes of the nearest configured shift for every punch.
+
+    Out punches are matched on shift ends and everything else on shift starts,
+    so a night shift's morning out punch lands on the day the shift began.
+    Staff use STAFF_SHIFTS and everyone else WORKMEN_SHIFTS. follow_ins()
+    then moves out punches that have an in punch onto that in's shift.
+    """
+    day = punch_times.dt.normalize()
+    minutes = ((punch_times - day) // pd.Timedelta(minutes=1)).to_numpy()
+    codes, uniques = pd.factorize(emp_types)
+    is_staff = np.append((pd.Series(uniques).str.lower() == "staff").to_numpy(), False)[codes]
+    kinds = np.where(is_staff, list(SHIFT_BOUNDS).index("staff"), list(SHIFT_BOUNDS).index("workmen"))
+    is_out = punch_type == "out"
+
+    offset = np.zeros(len(minutes), dtype=np.int64)
+    start = np.zeros(len(minutes), dtype=np.int64)
+    end = np.zeros(len(minutes), dtype=np.int64)
+    for kind, (starts, ends) in enumerate(SHIFT_BOUNDS.values()):
+        for out_role, boundaries in ((False, starts), (True, ends)):
+            selected = (kinds == kind) & (is_out == out_role)
+            shift, offset[selected] = nearest_boundary(minutes[selected], boundaries)
+            start[selected], end[selected] = starts[shift], ends[shift]
+    return day + pd.to_timedelta(offset, unit="D"), start, end
 
-df[["shift_start", "shift_end"]] = df.apply(lambda row: pd.Series(get_shift_times(row["last name"], row["datetime"])), axis=1)
 
 # ==== STEP 4: Group and find punches ====
-summary_records = []
-for (emp_no, date), group in df.groupby(["employee number", df["datetime"].dt.date]):
-    emp_type = group["last name"].iloc[0]
-    shift_start = group["shift_start"].iloc[0]
-    shift_end = group["shift_end"].iloc[0]
-
-    # Find punches
-    main_in = group[(group["gate"] == "main") & (group["punch_type"] == "in")]["datetime"].min()
-    lcm_in = group[(group["gate"] == "lcm") & (group["punch_type"] == "in")]["datetime"].min()
-    main_out = group[(group["gate"] == "main") & (group["punch_type"] == "out")]["datetime"].max()
-    lcm_out = group[(group["gate"] == "lcm") & (group["punch_type"] == "out")]["datetime"].max()
-
-    # Mismatches
-    in_mismatch = "No"
-    out_mismatch = "No"
-    if pd.notna(main_in) and pd.isna(lcm_in):
-        in_mismatch = "Yes (LCM In missing)"
-    elif pd.notna(lcm_in) and pd.isna(main_in):
-        in_mismatch = "Yes (Main In missing)"
-
-    if pd.notna(main_out) and pd.isna(lcm_out):
-        out_mismatch = "Yes (LCM Out missing)"
-    elif pd.notna(lcm_out) and pd.isna(main_out):
-        out_mismatch = "Yes (Main Out missing)"
-
-    # Late
-    grace_time = shift_start + timedelta(minutes=GRACE_MINUTES)
-    late = "No"
-    if pd.notna(main_in) and main_in > grace_time:
-        late = "Yes"
-
-    summary_records.append({
-        "Employee No": emp_no,
-        "Date": date,
-        "Shift Start": shift_start.time(),
-        "Shift End": shift_end.time(),
-        "Main In": main_in.time() if pd.notna(main_in) else None,
-        "LCM In": lcm_in.time() if pd.notna(lcm_in) else None,
-        "Main Out": main_out.time() if pd.notna(main_out) else None,
-        "LCM Out": lcm_out.time() if pd.notna(lcm_out) else None,
+STATE_KEYS = ["emp_no", "shift_day"]
+IN_COLUMNS = ["emp_no", "anchor_time", "shift_day", "anchor_start", "anchor_end"]
+SUMMARY_COLUMNS = ["Employee No", "Date", "Shift Start", "Shift End", "Main In", "LCM In", "Main Out", "LCM Out",
+                   "In Mismatch", "Out Mismatch", "Late"]
+
+
+def punch_states(df, earlier_ins=None):
+    """Every punch as a one-punch employee-day state, ready for combine_states.
+
+    A shift day runs from the start of the employee's shift to its end, past
+    midnight for a night shift, and is dated by the day the shift began.
+    earlier_ins are gate in punches from earlier chunks or runs (see
+    latest_ins) that this chunk's out punches may belong to.
+    """
+    when = df["datetime"]
+    gate, punch_type = parse_locations(df["location"])
+    shift_day, start, end = match_shifts(when, df["last name"], punch_type)
+    gate_in = (punch_type == "in") & (gate != "unknown")
+
+    states = {"emp_no": df["employee number"], "shift_day": shift_day}
+    for slot_gate, slot_type in PUNCH_SLOTS:
+        states[f"{slot_gate}_{slot_type}"] = when.where((gate == slot_gate) & (punch_type == slot_type))
+    states.update(
+        first_time=when, start=start, end=end,
+        anchor_time=when.where(gate_in),
+        anchor_start=np.where(gate_in, start, np.nan),
+        anchor_end=np.where(gate_in, end, np.nan)
+    )
+    states = pd.DataFrame(states).reset_index(drop=True)
+    return follow_ins(states, punch_type == "out", gate_ins(states, earlier_ins))
+
+
+def gate_ins(states, earlier_ins=None):
+    """Gate in punches of one-punch states, with their shift, after earlier_ins"""
+    ins = states.loc[states["anchor_time"].notna(), IN_COLUMNS]
+    return ins if earlier_ins is None else pd.concat([earlier_ins, ins], ignore_index=True)
+
+
+def latest_ins(states, earlier_ins=None):
+    """Each employee's latest gate in punch, kept for the out punches of later chunks or runs"""
+    ins = gate_ins(states, earlier_ins).sort_values("anchor_time", kind="stable")
+    return ins.drop_duplicates("emp_no", keep="last").reset_index(drop=True)
+
+
+def follow_ins(states, is_out, ins):
+    """Move out punches onto the shift of the employee's latest gate in punch at most MAX_SHIFT before.
+
+    A day-shift out at 11:00 would otherwise be nearest the night shift that
+    ended at 07:30. Out punches without such an in keep their nearest shift.
+    An in punched the same minute as the out does not count, so the result
+    does not depend on how tied punches are split across chunks.
+    """
+    rows = np.flatnonzero(is_out)
+    if not len(rows) or ins.empty:
+        return states
+    outs = states.iloc[rows][["emp_no", "first_time"]].assign(row=rows).sort_values("first_time", kind="stable")
+    found = pd.merge_asof(outs, ins.sort_values("anchor_time", kind="stable"), left_on="first_time",
+                          right_on="anchor_time", by="emp_no", direction="backward", tolerance=MAX_SHIFT,
+                          allow_exact_matches=False)
+    found = found[found["anchor_time"].notna()]
+    rows = found["row"].to_numpy()
+    for column, source in (("shift_day", "shift_day"), ("start", "anchor_start"), ("end", "anchor_end")):
+        states.iloc[rows, states.columns.get_loc(column)] = found[source].to_numpy().astype(states[column].dtype)
+    return states
+
+
+def combine_states(states):
+    """Merge employee-day states (single punches or earlier partial results) into one row per shift day.
+
+    Gate in/out times merge by min/max. The shift comes from the earliest
+    gate in punch (anchor) and, failing that, from the earliest punch.
+    """
+    by_time = states.sort_values("first_time", kind="stable").groupby(STATE_KEYS)
+    combined = by_time.agg(
+        main_in=("main_in", "min"),
+        lcm_in=("lcm_in", "min"),
+        main_out=("main_out", "max"),
+        lcm_out=("lcm_out", "max"),
+        first_time=("first_time", "first"),
+        start=("start", "first"),
+        end=("end", "first")
+    )
+    # NaT sorts last, so "first" is the earliest anchor where there is one
+    by_anchor = states.sort_values("anchor_time", kind="stable").groupby(STATE_KEYS)
+    anchors = by_anchor[["anchor_time", "anchor_start", "anchor_end"]].first()
+    return combined.join(anchors).reset_index()
+
+
+def finish_summary(state):
+    """Report rows for complete employee-day states: mismatches, lateness and times of day"""
+    days = pd.DatetimeIndex(state["shift_day"])
+    shift_start = days + pd.to_timedelta(state["anchor_start"].fillna(state["start"]).to_numpy(), unit="min")
+    shift_end = days + pd.to_timedelta(state["anchor_end"].fillna(state["end"]).to_numpy(), unit="min")
+
+    has = {slot: state[slot].notna().to_numpy() for slot in ("main_in", "lcm_in", "main_out", "lcm_out")}
+    in_mismatch = np.select([has["main_in"] & ~has["lcm_in"], has["lcm_in"] & ~has["main_in"]],
+                            ["Yes (LCM In missing)", "Yes (Main In missing)"], default="No")
+    out_mismatch = np.select([has["main_out"] & ~has["lcm_out"], has["lcm_out"] & ~has["main_out"]],
+                             ["Yes (LCM Out missing)", "Yes (Main Out missing)"], default="No")
+    late = state["main_in"].to_numpy() > (shift_start + timedelta(minutes=GRACE_MINUTES)).to_numpy()
+
+    def times(values):
+        # Time of day per distinct timestamp, None where there was no punch
+        codes, uniques = pd.factorize(values)
+        return np.append(np.array(uniques.time, dtype=object), None)[codes]
+
+    return pd.DataFrame({
+        "Employee No": state["emp_no"].to_numpy(),
+        "Date": days.date,
+        "Shift Start": times(shift_start),
+        "Shift End": times(shift_end),
+        "Main In": times(state["main_in"]),
+        "LCM In": times(state["lcm_in"]),
+        "Main Out": times(state["main_out"]),
+        "LCM Out": times(state["lcm_out"]),
         "In Mismatch": in_mismatch,
         "Out Mismatch": out_mismatch,
-        "Late": late
+        "Late": np.where(late, "Yes", "No")
     })
 
-summary_df = pd.DataFrame(summary_records)
+
+def summarize(df):
+    """One row per employee and shift day: first/last punch per gate, mismatches and lateness.
+
+    Each shift day takes the shift nearest to its first gate in punch (or to
+    its first punch when there is no in punch); out punches go to the shift
+    day of the gate in punch before them.
+    """
+    return finish_summary(combine_states(punch_states(df)))
+
+
+def stream_summary(chunks):
+    """Summary rows for punch chunks in time order, yielded as shift days complete.
+
+    Only the combined state of shift days that can still receive punches is
+    carried between chunks. A punch matches a shift that began at most one
+    day before its own day, so a shift day is complete once punches from two
+    days later have been read. Rows come out in batches of completed days.
+    """
+    pending = None
+    latest = None
+    ins = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        states = punch_states(chunk, ins)
+        ins = latest_ins(states, ins)
+        if pending is not None:
+            if latest is not None and (states["shift_day"] < latest - pd.Timedelta(days=1)).any():
+                print("⚠️ Punches out of time order; some shift days are reported more than once")
+            states = pd.concat([pending, states], ignore_index=True)
+        state = combine_states(states)
+
+        chunk_latest = chunk["datetime"].max().normalize()
+        latest = chunk_latest if latest is None else max(latest, chunk_latest)
+        done = (state["shift_day"] < latest - pd.Timedelta(days=1)).to_numpy()
+        if done.any():
+            yield finish_summary(state[done])
+        pending = state[~done]
+
+    if pending is not None and len(pending):
+        yield finish_summary(pending)
+
+
+def update_states(store, paths, chunk_rows=CHUNK_ROWS):
+    """Merge the punches added to paths since the last run into the stored employee-day states.
+
+    Only the shift days the new punches belong to are read and rewritten.
+    Merging is by min/max and earliest punch, so ingesting a punch twice
+    (after an interrupted run) leaves the state unchanged. Returns the
+    shift days that changed.
+    """
+    touched = set()
+    ins = store.read_table("last_ins")
+    for path in paths:
+        usecols, dtype = read_options(path)
+        for chunk in store.new_rows(path, chunk_rows, usecols=usecols, dtype=dtype):
+            states = punch_states(prepare_punches(chunk), ins)
+            ins = latest_ins(states, ins)
+            days = states["shift_day"].unique()
+            stored = store.read("states", days)
+            if stored is not None:
+                states = pd.concat([stored, states], ignore_index=True)
+            store.write("states", combine_states(states), "shift_day")
+            touched.update(days)
+        store.mark_ingested(path)
+    if ins is not None:
+        store.write_table("last_ins", ins)
+    store.save()
+    return sorted(touched)
+
+
+def stored_summary(store):
+    """Summary of every shift day in the state store, ordered like summarize()"""
+    states = store.read("states")
+    if states is None:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    return finish_summary(states.sort_values(STATE_KEYS, kind="stable"))
+
 
 # ==== STEP 5: Export files ====
-# File 1 - Punch Mismatch Report
-mismatch_df = summary_df[(summary_df["In Mismatch"] != "No") | (summary_df["Out Mismatch"] != "No")]
-mismatch_df.to_csv("punch_mismatch_report.csv", index=False)
+REPORT_FILES = ["punch_mismatch_report.csv", "late_comers_report.csv", "attendance_summary.csv"]
 
-# File 2 - Late Comers Report
-late_df = summary_df[summary_df["Late"] == "Yes"]
-late_df.to_csv("late_comers_report.csv", index=False)
 
-# File 3 - Full Summary
-summary_df.to_csv("attendance_summary.csv", index=False)
+def report_rows(summary_df):
+    """Rows of each report file, in REPORT_FILES order"""
+    # File 1 - Punch Mismatch Report
+    mismatch_df = summary_df[(summary_df["In Mismatch"] != "No") | (summary_df["Out Mismatch"] != "No")]
+
+    # File 2 - Late Comers Report
+    late_df = summary_df[summary_df["Late"] == "Yes"]
+
+    # File 3 - Full Summary
+    return [mismatch_df, late_df, summary_df]
+
+
+def export_reports(summaries):
+    """Write the report files from a summary frame, or append batch by batch from an iterable of them"""
+    if isinstance(summaries, pd.DataFrame):
+        summaries = [summaries]
+    written = set()
+    for summary_df in summaries:
+        for name, rows in zip(REPORT_FILES, report_rows(summary_df)):
+            rows.to_csv(name, index=False, mode="a" if name in written else "w", header=name not in written)
+            written.add(name)
+
+
+if __name__ == "__main__":
+    # python analysis1.py [--stream]  (bounded memory for very large exports)
+    # python analysis1.py --incremental [punch files...]  (only punches added since the last run)
+    if "--incremental" in sys.argv[1:]:
+        paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or [INPUT_FILE]
+        store = PunchStateStore(STATE_DIR)
+        touched = update_states(store, paths)
+        print(f"Updated {len(touched)} shift day(s)")
+        export_reports(stored_summary(store))
+    elif "--stream" in sys.argv[1:]:
+        export_reports(stream_summary(iter_punches(INPUT_FILE)))
+    else:
+        export_reports(summarize(load_punches(INPUT_FILE)))
 
-print("✅ Analysis complete. Files generated:")
-print("- punch_mismatch_report.csv")
-print("- late_comers_report.csv")
-print("- attendance_summary.csv")
\ No newline at end of file
+    print("✅ Analysis complete. Files generated:")
+    for name in REPORT_FILES:
+        print(f"- {name}")
@@ -0,0 +1,145 @@
+"""Daily punch summary: vectorized analysis1.summarize vs the old apply/groupby loop.
+
+    python bench_analysis1.py [employees] [days]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from analysis1 import STAFF_SHIFTS, WORKMEN_SHIFTS, GRACE_MINUTES, summarize
+
+LOCATIONS = ["Main Gate Door 1", "Main Gate Door 2", "LCM Door 1", "LCM Door 2", "Canteen Door 1"]
+
+
+def parse_location(loc):
+    loc = loc.lower()
+    if "main" in loc:
+        gate = "main"
+    elif "lcm" in loc:
+        gate = "lcm"
+    else:
+        gate = "unknown"
+
+    if "door 1" in loc:
+        punch_type = "in"
+    elif "door 2" in loc:
+        punch_type = "out"
+    else:
+        punch_type = "unknown"
+
+    return gate, punch_type
+
+
+def get_shift_times(emp_type, punch_dt):
+    if emp_type.lower() == "staff":
+        for start, end in STAFF_SHIFTS:
+            start_dt = datetime.combine(punch_dt.date(), datetime.strptime(start, "%H:%M").time())
+            end_dt = datetime.combine(punch_dt.date(), datetime.strptime(end, "%H:%M").time())
+            return start_dt, end_dt
+    else:
+        for start, end in WORKMEN_SHIFTS:
+            start_dt = datetime.combine(punch_dt.date(), datetime.strptime(start, "%H:%M").time())
+            if end == "07:30":  # night shift crosses midnight
+                end_dt = datetime.combine(punch_dt.date() + timedelta(days=1), datetime.strptime(end, "%H:%M").time())
+            else:
+                end_dt = datetime.combine(punch_dt.date(), datetime.strptime(end, "%H:%M").time())
+            return start_dt, end_dt
+    return None, None
+
+
+def legacy_summarize(df):
+    """analysis1.py steps 2-4 as they were before vectorizing, kept as the baseline"""
+    df = df.copy()
+    df[["gate", "punch_type"]] = df["location"].apply(lambda x: pd.Series(parse_location(x)))
+    df[["shift_start", "shift_end"]] = df.apply(lambda row: pd.Series(get_shift_times(row["last name"], row["datetime"])), axis=1)
+
+    summary_records = []
+    for (emp_no, date), group in df.groupby(["employee number", df["datetime"].dt.date]):
+        shift_start = group["shift_start"].iloc[0]
+        shift_end = group["shift_end"].iloc[0]
+
+        main_in = group[(group["gate"] == "main") & (group["punch_type"] == "in")]["datetime"].min()
+        lcm_in = group[(group["gate"] == "lcm") & (group["punch_type"] == "in")]["datetime"].min()
+        main_out = group[(group["gate"] == "main") & (group["punch_type"] == "out")]["datetime"].max()
+        lcm_out = group[(group["gate"] == "lcm") & (group["punch_type"] == "out")]["datetime"].max()
+
+        in_mismatch = "No"
+        out_mismatch = "No"
+        if pd.notna(main_in) and pd.isna(lcm_in):
+            in_mismatch = "Yes (LCM In missing)"
+        elif pd.notna(lcm_in) and pd.isna(main_in):
+            in_mismatch = "Yes (Main In missing)"
+
+        if pd.notna(main_out) and pd.isna(lcm_out):
+            out_mismatch = "Yes (LCM Out missing)"
+        elif pd.notna(lcm_out) and pd.isna(main_out):
+            out_mismatch = "Yes (Main Out missing)"
+
+        grace_time = shift_start + timedelta(minutes=GRACE_MINUTES)
+        late = "No"
+        if pd.notna(main_in) and main_in > grace_time:
+            late = "Yes"
+
+        summary_records.append({
+            "Employee No": emp_no,
+            "Date": date,
+            "Shift Start": shift_start.time(),
+            "Shift End": shift_end.time(),
+            "Main In": main_in.time() if pd.notna(main_in) else None,
+            "LCM In": lcm_in.time() if pd.notna(lcm_in) else None,
+            "Main Out": main_out.time() if pd.notna(main_out) else None,
+            "LCM Out": lcm_out.time() if pd.notna(lcm_out) else None,
+            "In Mismatch": in_mismatch,
+            "Out Mismatch": out_mismatch,
+            "Late": late
+        })
+
+    return pd.DataFrame(summary_records)
+
+
+def synthetic_punches(employees, days, seed=5):
+    """About four gate punches per employee per day, some of them missing, as load_punches returns them"""
+    rng = np.random.default_rng(seed)
+    emp = np.repeat(np.arange(10000, 10000 + employees), days * 4)
+    day = np.tile(np.repeat(np.arange(days), 4), employees)
+    slot = np.tile(np.arange(4), employees * days)
+    # Slots 0/1 arrive around 07:30, slots 2/3 leave around 15:30
+    minute = np.where(slot < 2, 7 * 60 + 15, 15 * 60 + 25) + rng.integers(0, 30, emp.size)
+    # Main in, LCM in, Main out, LCM out; a few punches at a door the report ignores
+    location = np.array(LOCATIONS)[np.where(rng.random(emp.size) < 0.03, 4, np.array([0, 2, 1, 3])[slot])]
+    keep = rng.random(emp.size) > 0.05
+    when = pd.Timestamp("2025-04-01") + pd.to_timedelta(day, unit="D") + pd.to_timedelta(minute, unit="min")
+    kinds = np.where(emp % 3 == 0, "Staff", "Workmen")
+    return pd.DataFrame({
+        "employee number": emp[keep],
+        "last name": kinds[keep],
+        "location": location[keep],
+        "datetime": when[keep]
+    })
+
+
+def best_of(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    employees = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    df = synthetic_punches(employees, days)
+    print(f"{len(df):,} punches, {employees} employees x {days} days")
+
+    legacy_time, legacy = best_of(legacy_summarize, df, repeat=1)
+    vector_time, vector = best_of(summarize, df)
+    # The old loop put everyone on the first configured shift, so only the
+    # punch columns are comparable; the synthetic day has no night shifts
+    punch_columns = ["Employee No", "Date", "Main In", "LCM In", "Main Out", "LCM Out", "In Mismatch", "Out Mismatch"]
+    assert legacy[punch_columns].to_csv(index=False) == vector[punch_columns].to_csv(index=False), "summaries differ"
+
+    for label, seconds in [("apply + per-group loop", legacy_time), ("vectorized", vector_time)]:
+        print(f"{label:<24} {seconds:>8.2f} s  {len(df) / seconds:>12,.0f} punches/s  {len(vector)} employee-days")
@@ -0,0 +1,107 @@
+"""Rows per second for the audit programme table: measured layout vs the old per-cell estimate.
+
+    python bench_pdf_layout.py [rows]
+"""
+import sys
+import time
+import random
+from programme_pdf import PDF, COLUMN_WIDTHS
+
+UNITS = ["HO-Finance", "HO-Treasury", "SOF-Procurement", "Plant A - Stores and Spares Inventory",
+         "Plant B - Maintenance Contracts and Work Orders", "SOF-Logistics"]
+NAMES = ["John Doe", "Jane Smith", "Mike Johnson", "Sarah Williams", "David Brown",
+         "Priya Raman", "Arjun Mehta", "Kavita Iyer"]
+
+
+class BenchPDF(PDF):
+    def header(self):
+        # The real header needs static/logo.png; the table is what is measured here
+        self.set_y(20)
+
+
+class LegacyPDF(BenchPDF):
+    """Row drawing as it was before the layout pass, kept as the baseline"""
+
+    def get_text_height(self, text, width, font_size=8):
+        self.set_font('Arial', '', font_size)
+        char_width = font_size * 0.35
+        chars_per_line = max(1, int((width - 4) / char_width))
+        lines_needed = max(1, (len(str(text)) + chars_per_line - 1) // chars_per_line)
+        return max(12, lines_needed * (font_size + 1))
+
+    def multi_cell_row(self, data, widths, min_height=12):
+        max_height = min_height
+        font_size = 8
+        for text, width in zip(data, widths):
+            if len(str(text)) > 0:
+                max_height = max(max_height, self.get_text_height(str(text), width, font_size))
+        start_x = 10
+        start_y = self.get_y()
+        for i, (text, width) in enumerate(zip(data, widths)):
+            self.set_xy(start_x + sum(widths[:i]), start_y)
+            self.rect(self.get_x(), self.get_y(), width, max_height)
+            self.set_font('Arial', '', font_size)
+            if i in [0, 1, 4, 5, 6]:
+                self.set_xy(start_x + sum(widths[:i]), start_y + (max_height - font_size) / 2)
+                self.cell(width, font_size, str(text), align='C')
+            else:
+                self.set_xy(start_x + sum(widths[:i]) + 2, start_y + 2)
+                if len(str(text)) > (width - 4) / (font_size * 0.35):
+                    self.multi_cell(width - 4, font_size + 1, str(text), align='L')
+                else:
+                    self.cell(width - 4, font_size, str(text), align='L')
+        self.set_xy(start_x, start_y + max_height)
+
+    def table_row(self, index, row, audit_ref_no=''):
+        if self.get_y() > 250:
+            self.add_page()
+            self.table_header()
+        self.multi_cell_row(self.row_values(index, row, audit_ref_no), COLUMN_WIDTHS)
+
+
+def synthetic_rows(count, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        day = rng.randint(1, 28)
+        rows.append({
+            "Description": rng.choice(UNITS),
+            "Auditors": ", ".join(rng.sample(NAMES, rng.randint(1, 4))),
+            "Manager": rng.choice(NAMES[:2]),
+            "FromDate": f"{day:02d}-06-2025",
+            "ToDate": f"{min(day + 5, 30):02d}-06-2025",
+            "Remarks": ""
+        })
+    return rows
+
+
+def new_document(cls):
+    pdf = cls(orientation='P', unit='mm', format='A4')
+    pdf.set_header_data('2025-2026', '01.04.2025', 'QUARTER APRIL - JUNE 2025')
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.table_header()
+    return pdf
+
+
+def bench(label, cls, rows, batched):
+    pdf = new_document(cls)
+    start = time.perf_counter()
+    if batched:
+        pdf.draw_rows(pdf.layout_rows(enumerate(rows, 1)))
+    else:
+        for index, row in enumerate(rows, 1):
+            pdf.table_row(index, row)
+    laid_out = time.perf_counter() - start
+    pdf.output(dest='S')
+    total = time.perf_counter() - start
+    print(f"{label:<28} {len(rows) / laid_out:>10,.0f} rows/s table  "
+          f"{len(rows) / total:>10,.0f} rows/s incl. output  {pdf.page_no():>5} pages")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = synthetic_rows(count)
+    print(f"{count} programme rows")
+    bench("old per-cell estimate", LegacyPDF, rows, batched=False)
+    bench("layout pass + render pass", BenchPDF, rows, batched=True)
@@ -0,0 +1,129 @@
+"""Audit programme data preparation: columnar pipeline vs the old per-allocation loop.
+
+    python bench_programme_data.py [allocations]
+"""
+import sys
+import time
+import random
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from allocation_store import Allocation
+from programme_data import allocations_frame, group_programme, programme_sections, quarter_label
+
+PREFIXES = ["HO-", "SOF-", "Plant "]
+MANAGERS = ["Manager %d" % n for n in range(10)]
+
+
+def calculate_quarter_from_dates(grouped_data):
+    """Quarter header as it was computed before the pipeline, kept as the baseline"""
+    from_dates = [from_date for (desc, from_date, to_date) in grouped_data if isinstance(from_date, date)]
+    if not from_dates:
+        return "QUARTER NOT DETERMINED"
+    quarter_counts = {1: 0, 2: 0, 3: 0, 4: 0}
+    years = []
+    for from_day in from_dates:
+        years.append(from_day.year)
+        month = from_day.month
+        if month in [4, 5, 6]:
+            quarter_counts[1] += 1
+        elif month in [7, 8, 9]:
+            quarter_counts[2] += 1
+        elif month in [10, 11, 12]:
+            quarter_counts[3] += 1
+        else:
+            quarter_counts[4] += 1
+    dominant_quarter = max(quarter_counts, key=quarter_counts.get)
+    most_common_year = max(set(years), key=years.count) if years else datetime.now().year
+    quarter_texts = {
+        1: f"QUARTER APRIL - JUNE {most_common_year}",
+        2: f"QUARTER JULY - SEPTEMBER {most_common_year}",
+        3: f"QUARTER OCTOBER - DECEMBER {most_common_year}",
+        4: f"QUARTER JANUARY - MARCH {most_common_year + 1}"
+    }
+    return quarter_texts.get(dominant_quarter, "QUARTER NOT DETERMINED")
+
+
+def legacy_prepare(allocations, member_map, managers):
+    grouped = defaultdict(lambda: {'Auditors': [], 'Manager': None})
+    for alloc in allocations:
+        key = (alloc.description, alloc.from_date, alloc.to_date)
+        name = member_map.get(alloc.member_id, 'Unknown')
+        if name in managers:
+            grouped[key]['Manager'] = name
+        else:
+            grouped[key]['Auditors'].append(name)
+
+    quarter_info = calculate_quarter_from_dates(grouped)
+    ho_units, sof_units, plant_units = [], [], []
+    for (desc, from_date, to_date), val in grouped.items():
+        row_data = {
+            "Description": desc,
+            "Auditors": ", ".join(val['Auditors']),
+            "Manager": val['Manager'] or '',
+            "FromDate": from_date.strftime('%d-%m-%Y'),
+            "ToDate": to_date.strftime('%d-%m-%Y'),
+            "Remarks": ''
+        }
+        desc_upper = str(desc).strip().upper()
+        if desc_upper.startswith("HO-"):
+            ho_units.append(row_data)
+        elif desc_upper.startswith("SOF-"):
+            sof_units.append(row_data)
+        else:
+            plant_units.append(row_data)
+    sections = [(name, units) for name, units in
+                [("HO Units", ho_units), ("SOF Units", sof_units), ("Plant Units", plant_units)] if units]
+    return quarter_info, sections
+
+
+def frame_prepare(frame, member_map, managers):
+    grouped = group_programme(frame, member_map, managers)
+    return quarter_label(grouped['FromDate']), programme_sections(grouped)
+
+
+def pipeline_prepare(allocations, member_map, managers):
+    return frame_prepare(allocations_frame(allocations), member_map, managers)
+
+
+def synthetic_year(count, seed=11):
+    """count allocations over FY 2025-2026, a few members per audit"""
+    rng = random.Random(seed)
+    member_map = {n: "Auditor %d" % n for n in range(1, 801)}
+    member_map.update({900 + n: name for n, name in enumerate(MANAGERS)})
+    allocations = []
+    while len(allocations) < count:
+        start = date(2025, 4, 1) + timedelta(days=rng.randrange(365))
+        end = start + timedelta(days=rng.randint(2, 15))
+        description = rng.choice(PREFIXES) + "Unit %d" % rng.randrange(400)
+        members = rng.sample(range(1, 801), rng.randint(2, 6)) + [900 + rng.randrange(len(MANAGERS))]
+        for member_id in members:
+            allocations.append(Allocation(len(allocations) + 1, member_id, description, 'Audit', start, end))
+    return allocations[:count], member_map
+
+
+def best_of(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    allocations, member_map = synthetic_year(count)
+    managers = list(MANAGERS)
+    print(f"{count} allocations")
+
+    legacy_time, legacy = best_of(legacy_prepare, allocations, member_map, managers)
+    pipeline_time, pipeline = best_of(pipeline_prepare, allocations, member_map, managers)
+    assert legacy == pipeline, "pipeline output differs from the per-allocation loop"
+
+    # Reports that already hold the year as a frame skip the record conversion
+    framed_time, _ = best_of(frame_prepare, allocations_frame(allocations), member_map, managers)
+
+    audits = sum(len(units) for _, units in pipeline[1])
+    for label, seconds in [("old per-allocation loop", legacy_time), ("columnar pipeline", pipeline_time),
+                           ("  from a prebuilt frame", framed_time)]:
+        print(f"{label:<26} {seconds * 1000:>9.1f} ms  {count / seconds:>12,.0f} allocations/s  {audits} audits")
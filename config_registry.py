@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+
+
+def atomic_write(path, text):
+    """Write text to path via a temp file and rename, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    # A unique temp name per call, so concurrent writers never share (or rename away) each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ConfigRegistry:
+    """Small config files parsed once and served from memory.
+
+    Each registered file is re-parsed only when its mtime or size changes on
+    disk, or when it is invalidated after a write from this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held across read-modify-write, so concurrent updates in this process are never lost
+        self._write_lock = threading.RLock()
+        self._files = {}
+        self._cache = {}
+
+    def register(self, name, path, loader):
+        """Register a file under `name`; loader(file) parses an open file object"""
+        self._files[name] = (path, loader)
+
+    def get(self, name):
+        """Return the parsed contents of a registered file, reloading if it changed"""
+        path, loader = self._files[name]
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        with open(path, 'r') as f:
+            value = loader(f)
+        with self._lock:
+            self._cache[name] = (key, value)
+        return value
+
+    def write(self, name, text):
+        """Atomically replace a registered file and drop its cached value"""
+        path, _ = self._files[name]
+        with self._write_lock:
+            atomic_write(path, text)
+            self.invalidate(name)
+
+    def update(self, name, change):
+        """Read-modify-write a registered file.
+
+        change(current value) returns the new file text, or None to leave the
+        file alone; it must not modify the value it is given. Returns whether
+        the file was written.
+        """
+        with self._write_lock:
+            text = change(self.get(name))
+            if text is None:
+                return False
+            self.write(name, text)
+            return True
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
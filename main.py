@@ -1,12 +1,18 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, send_file, Response, stream_with_context
 from flask_session import Session
 from flask_cors import CORS, cross_origin
-import pandas as pd
 import os
 import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
+import io
+import time
+import threading
+import copy
+import csv
+from request_store import open_store, VersionConflict
+from config_registry import ConfigRegistry
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-very-secret-key-123'
@@ -19,19 +25,37 @@ CORS(app, supports_credentials=True, origins=["http://localhost:5000"])
 
 # Configuration
 EXCEL_FILE = 'requests.xlsx'
+REQUEST_DB_FILE = 'requests.db'
+REQUEST_STORE_BACKEND = os.environ.get('REQUEST_STORE_BACKEND', 'sqlite')  # 'sqlite' or 'excel'
+COUNTER_RECONCILE_SECONDS = 600
+EVENT_POLL_SECONDS = 2
+EVENT_KEEPALIVE_SECONDS = 15
+PUSHED_EVENT_TYPES = ['created', 'forwarded', 'status']
+MAX_BULK_ITEMS = 10000
 REQUEST_TYPES_FILE = 'request_types.txt'
 DESCRIPTIONS_FILE = 'descriptions.json'
 USERS_FILE = 'users.txt'
 
+# Request storage backend
+if REQUEST_STORE_BACKEND == 'excel':
+    store = open_store('excel', EXCEL_FILE)
+else:
+    store = open_store(REQUEST_STORE_BACKEND, REQUEST_DB_FILE)
+
+# Wakes /api/events streams in this process as soon as a handler records an event;
+# events written by other worker processes are picked up on the next poll
+event_signal = threading.Condition()
+
+def publish_events():
+    with event_signal:
+        event_signal.notify_all()
+
 # Initialize files
 def init_files():
-    if not os.path.exists(EXCEL_FILE):
-        df = pd.DataFrame(columns=[
-            'request_id', 'sno', 'request_type', 'description', 'custom_description',
-            'raiser_name', 'raiser_username', 'updates', 'status', 'created_at',
-            'current_admin', 'approval_path', 'last_updated', 'notification_sent'
-        ])
-        df.to_excel(EXCEL_FILE, index=False)
+    # One-shot import of the legacy workbook into an empty database
+    if REQUEST_STORE_BACKEND == 'sqlite' and store.is_empty() and os.path.exists(EXCEL_FILE):
+        imported = store.import_xlsx(EXCEL_FILE)
+        print(f"Imported {imported} requests from {EXCEL_FILE}")
     
     if not os.path.exists(REQUEST_TYPES_FILE):
         with open(REQUEST_TYPES_FILE, 'w') as f:
@@ -50,59 +74,101 @@ def init_files():
         with open(USERS_FILE, 'w') as f:
             f.write("admin1:password1:admin1\nadmin2:password2:admin2\nadmin3:password3:admin3\nuser1:user123:user")
 
+# Config file parsers
+def parse_request_types(f):
+    return [line.strip() for line in f.readlines() if line.strip()]
+
+def parse_users(f):
+    users = {}
+    for line in f.readlines():
+        if line.strip():
+            username, password, role = line.strip().split(':')
+            users[username] = {'password': password, 'role': role}
+    return users
+
+# Runs at import, so every server (flask run, gunicorn, python main.py) sets up its files
+init_files()
+
+# Config files are parsed once and reloaded only when they change
+config = ConfigRegistry()
+config.register('request_types', REQUEST_TYPES_FILE, parse_request_types)
+config.register('descriptions', DESCRIPTIONS_FILE, json.load)
+config.register('users', USERS_FILE, parse_users)
+
 # Get request types
 def get_request_types():
-    with open(REQUEST_TYPES_FILE, 'r') as f:
-        return [line.strip() for line in f.readlines() if line.strip()]
+    return list(config.get('request_types'))
 
 # Get predefined descriptions
 def get_predefined_descriptions():
-    with open(DESCRIPTIONS_FILE, 'r') as f:
-        return json.load(f)
+    return copy.deepcopy(config.get('descriptions'))
 
 # Save predefined descriptions
 def save_predefined_descriptions(descriptions):
-    with open(DESCRIPTIONS_FILE, 'w') as f:
-        json.dump(descriptions, f)
+    config.write('descriptions', json.dumps(descriptions))
+
+# Read-modify-write the descriptions under the registry's write lock;
+# change gets a private copy and returns False to leave the file alone
+def update_predefined_descriptions(change):
+    def apply(current):
+        descriptions = copy.deepcopy(current)
+        if change(descriptions) is False:
+            return None
+        return json.dumps(descriptions)
+    return config.update('descriptions', apply)
 
 # Add request type
 def add_request_type(type_name):
-    types = get_request_types()
-    if type_name not in types:
-        with open(REQUEST_TYPES_FILE, 'a') as f:
-            f.write(f"\n{type_name}")
-        
-        descriptions = get_predefined_descriptions()
+    def add(types):
+        if type_name in types:
+            return None
+        return "\n".join(list(types) + [type_name])
+    def add_descriptions(descriptions):
         descriptions[type_name] = []
-        save_predefined_descriptions(descriptions)
+    if config.update('request_types', add):
+        update_predefined_descriptions(add_descriptions)
 
 # Remove request type
 def remove_request_type(type_name):
-    types = get_request_types()
-    if type_name in types:
-        types.remove(type_name)
-        with open(REQUEST_TYPES_FILE, 'w') as f:
-            f.write("\n".join(types))
-        
-        descriptions = get_predefined_descriptions()
-        if type_name in descriptions:
-            del descriptions[type_name]
-            save_predefined_descriptions(descriptions)
+    def remove(types):
+        if type_name not in types:
+            return None
+        return "\n".join(t for t in types if t != type_name)
+    def remove_descriptions(descriptions):
+        if type_name not in descriptions:
+            return False
+        del descriptions[type_name]
+    if config.update('request_types', remove):
+        update_predefined_descriptions(remove_descriptions)
+
+# Add predefined description, returns False if it already exists
+def add_predefined_description(request_type, description):
+    def add(descriptions):
+        entries = descriptions.setdefault(request_type, [])
+        if description in entries:
+            return False
+        entries.append(description)
+    return update_predefined_descriptions(add)
+
+# Remove predefined description, returns False if it does not exist
+def remove_predefined_description(request_type, description):
+    def remove(descriptions):
+        if description not in descriptions.get(request_type, []):
+            return False
+        descriptions[request_type].remove(description)
+    return update_predefined_descriptions(remove)
 
-# Get users
+# Get users (shared cached mapping, treat as read-only)
 def get_users():
-    users = {}
-    with open(USERS_FILE, 'r') as f:
-        for line in f.readlines():
-            if line.strip():
-                username, password, role = line.strip().split(':')
-                users[username] = {'password': password, 'role': role}
-    return users
+    return config.get('users')
 
 # Add user
 def add_user(username, password, role):
-    with open(USERS_FILE, 'a') as f:
-        f.write(f"\n{username}:{password}:{role}")
+    def add(users):
+        lines = [f"{name}:{info['password']}:{info['role']}" for name, info in users.items()]
+        lines.append(f"{username}:{password}:{role}")
+        return "\n".join(lines)
+    config.update('users', add)
 
 # Routes
 @app.route('/api/login', methods=['POST'])
@@ -145,8 +211,8 @@ def logout():
 @cross_origin(supports_credentials=True)
 def get_request_types_api():
     return jsonify({
-        'types': get_request_types(),
-        'predefined_descriptions': get_predefined_descriptions()
+        'types': config.get('request_types'),
+        'predefined_descriptions': config.get('descriptions')
     })
 
 @app.route('/api/request-types', methods=['POST', 'DELETE'])
@@ -183,18 +249,11 @@ def manage_descriptions():
     if request.method == 'GET':
         return jsonify(get_predefined_descriptions())
     
-    descriptions = get_predefined_descriptions()
-    
     if request.method == 'POST':
         if not request_type or not description:
             return jsonify({'error': 'Request type and description required'}), 400
         
-        if request_type not in descriptions:
-            descriptions[request_type] = []
-        
-        if description not in descriptions[request_type]:
-            descriptions[request_type].append(description)
-            save_predefined_descriptions(descriptions)
+        if add_predefined_description(request_type, description):
             return jsonify({'success': True})
         return jsonify({'error': 'Description already exists'}), 400
     
@@ -202,100 +261,122 @@ def manage_descriptions():
         if not request_type or not description:
             return jsonify({'error': 'Request type and description required'}), 400
         
-        if request_type in descriptions and description in descriptions[request_type]:
-            descriptions[request_type].remove(description)
-            save_predefined_descriptions(descriptions)
+        if remove_predefined_description(request_type, description):
             return jsonify({'success': True})
         return jsonify({'error': 'Description not found'}), 404
 
 @app.route('/api/requests', methods=['GET', 'POST'])
-@cross_origin(supports_credentials=True)
+@cross_origin(supports_credentials=True, expose_headers=['X-Next-Cursor'])
 def handle_requests():
     if request.method == 'GET':
-        df = pd.read_excel(EXCEL_FILE).fillna('')
-        
         if 'user' not in session:
             return jsonify({'error': 'Unauthorized'}), 401
         
         user_role = session['role']
         username = session['user']
+        args = request.args
+        
+        filters = {
+            'request_type': args.get('request_type') or None,
+            'created_from': args.get('from') or None,
+            'created_to': args.get('to') or None,
+            'sort': args.get('sort', 'sno'),
+        }
+        # Date-only upper bounds include the whole day
+        if filters['created_to'] and len(filters['created_to']) == 10:
+            filters['created_to'] += ' 23:59:59'
         
         if user_role == 'user':
-            df = df[df['raiser_username'] == username]
+            filters['raiser_username'] = username
         else:
-            status_filter = request.args.get('status', 'all')
-            if status_filter != 'all':
-                df = df[df['status'] == status_filter]
+            status_filter = args.get('status', 'all')
+            filters['status'] = None if status_filter == 'all' else status_filter
+            filters['current_admin'] = args.get('current_admin') or None
         
-        return jsonify(df.to_dict('records'))
+        if args.get('fields'):
+            filters['fields'] = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        
+        try:
+            if 'limit' in args:
+                filters['limit'] = max(1, min(int(args['limit']), 500))
+            if args.get('cursor'):
+                filters['cursor'] = int(args['cursor'])
+            requests, next_cursor = store.query(**filters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        response = jsonify(requests)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response
     
     if request.method == 'POST':
         data = request.get_json()
-        required_fields = ['request_type', 'description', 'custom_description', 'raiser_name']
-        
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields'}), 400
-        
-        df = pd.read_excel(EXCEL_FILE)
-        new_sno = df['sno'].max() + 1 if not df.empty else 1
+        new_request, error = build_new_request(data, session.get('user', ''))
         
-        request_id = str(uuid.uuid4())
+        if error:
+            return jsonify({'error': error}), 400
         
-        full_description = data['description']
-        if data['custom_description']:
-            full_description += f" - {data['custom_description']}"
-        
-        new_request = {
+        request_id = new_request['request_id']
+        # The request and its first history entry are written in one transaction
+        store.create(new_request, [{
             'request_id': request_id,
-            'sno': new_sno,
-            'request_type': data['request_type'],
-            'description': full_description,
-            'custom_description': data['custom_description'],
-            'raiser_name': data['raiser_name'],
-            'raiser_username': session.get('user', ''),
-            'updates': f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Request created by {data['raiser_name']} - Pending admin1 approval",
-            'status': 'Open',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'current_admin': 'admin1',
-            'approval_path': 'admin1',
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'notification_sent': False
-        }
-        
-        df = pd.concat([df, pd.DataFrame([new_request])], ignore_index=True)
-        df.to_excel(EXCEL_FILE, index=False)
+            'event_type': 'created',
+            'actor': session.get('user', ''),
+            'message': f"Request created by {data['raiser_name']} - Pending admin1 approval",
+            'created_at': new_request['created_at']
+        }])
+        publish_events()
         
         return jsonify({'success': True, 'request_id': request_id})
 
-@app.route('/api/requests/<string:request_id>', methods=['PUT'])
-@cross_origin(supports_credentials=True)
-def update_request(request_id):
-    if 'user' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
+# Build a new request record from submitted fields, or return an error message
+def build_new_request(data, username):
+    required_fields = ['request_type', 'description', 'custom_description', 'raiser_name']
     
-    user_role = session['role']
-    username = session['user']
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
+        return None, 'Missing required fields'
     
-    data = request.get_json()
-    df = pd.read_excel(EXCEL_FILE)
+    full_description = data['description']
+    if data['custom_description']:
+        full_description += f" - {data['custom_description']}"
     
-    if request_id not in df['request_id'].values:
-        return jsonify({'error': 'Request not found'}), 404
-    
-    idx = df.index[df['request_id'] == request_id].tolist()[0]
-    current_admin = df.at[idx, 'current_admin']
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'request_id': str(uuid.uuid4()),
+        'request_type': data['request_type'],
+        'description': full_description,
+        'custom_description': data['custom_description'],
+        'raiser_name': data['raiser_name'],
+        'raiser_username': username,
+        'updates': '',
+        'status': 'Open',
+        'created_at': now,
+        'current_admin': 'admin1',
+        'approval_path': 'admin1',
+        'last_updated': now,
+        'notification_sent': False
+    }, None
+
+# Work out the column changes and history events for an update under the approval rules.
+# Returns (changes, events, None) or (None, None, (error, status_code)).
+def plan_request_update(record, data, username, user_role):
+    current_admin = record['current_admin']
+    changes = {}
+    events = []
     
     # Admin1 has full control, others only control their own requests
     if user_role != 'admin1' and user_role != current_admin:
-        return jsonify({'error': 'Not authorized to update this request'}), 403
+        return None, None, ('Not authorized to update this request', 403)
     
-    if 'update_text' in data and (user_role == 'admin1' or user_role == current_admin):
-        new_update = f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {username}: {data['update_text']}"
-        df.at[idx, 'updates'] += new_update
+    if 'update_text' in data:
+        events.append(('comment', data['update_text']))
         if 'status' in data:
-            df.at[idx, 'status'] = data['status']
+            changes['status'] = data['status']
+            if data['status'] != record['status']:
+                events.append(('status', f"Status changed from {record['status']} to {data['status']}"))
     
-    if 'next_admin' in data and (user_role == 'admin1' or user_role == current_admin):
+    if 'next_admin' in data:
         next_admin = data['next_admin']
         
         if user_role == 'admin1':
@@ -306,17 +387,254 @@ def update_request(request_id):
             valid_next = []
         
         if next_admin not in valid_next:
-            return jsonify({'error': 'Invalid next admin'}), 400
+            return None, None, ('Invalid next admin', 400)
         
-        df.at[idx, 'current_admin'] = next_admin
-        df.at[idx, 'approval_path'] += f"->{next_admin}"
-        df.at[idx, 'updates'] += f"\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Forwarded to {next_admin} by {username}"
-        df.at[idx, 'notification_sent'] = False
+        changes['current_admin'] = next_admin
+        changes['approval_path'] = record['approval_path'] + f"->{next_admin}"
+        changes['notification_sent'] = False
+        events.append(('forwarded', f"Forwarded to {next_admin} by {username}"))
     
-    df.at[idx, 'last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    df.to_excel(EXCEL_FILE, index=False)
+    changes['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return changes, events, None
+
+@app.route('/api/requests/<string:request_id>', methods=['PUT'])
+@cross_origin(supports_credentials=True)
+def update_request(request_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    user_role = session['role']
+    username = session['user']
+    
+    data = request.get_json()
+    record = store.get(request_id)
     
-    return jsonify({'success': True})
+    if record is None:
+        return jsonify({'error': 'Request not found'}), 404
+    
+    changes, events, error = plan_request_update(record, data, username, user_role)
+    if error:
+        return jsonify({'error': error[0]}), error[1]
+    
+    # Optimistic concurrency: clients may send the version they edited, otherwise
+    # the version read above guards against interleaved writers
+    try:
+        expected_version = int(data.get('version', record['version']))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'version must be an integer'}), 400
+    
+    # The row and its history entries are written in one transaction
+    history = [{'request_id': request_id, 'event_type': event_type, 'actor': username,
+                'message': message, 'created_at': changes['last_updated']}
+               for event_type, message in events]
+    try:
+        new_version = store.update(request_id, changes, expected_version=expected_version, events=history)
+    except VersionConflict as e:
+        return jsonify({'error': 'Request was modified by someone else, reload and try again',
+                        'current_version': e.current_version}), 409
+    if new_version is None:
+        return jsonify({'error': 'Request not found'}), 404
+    publish_events()
+    
+    return jsonify({'success': True, 'version': new_version})
+
+@app.route('/api/requests/bulk', methods=['POST', 'PUT'])
+@cross_origin(supports_credentials=True)
+def bulk_requests():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    username = session['user']
+    user_role = session['role']
+    
+    # Batches come as a JSON array, or for creation also as an uploaded CSV file
+    if request.method == 'POST' and 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        items = [dict(row, custom_description=row.get('custom_description') or '')
+                 for row in csv.DictReader(io.StringIO(text))]
+    else:
+        items = request.get_json(silent=True)
+    
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON array or a CSV file'}), 400
+    if len(items) > MAX_BULK_ITEMS:
+        return jsonify({'error': f'At most {MAX_BULK_ITEMS} items per batch'}), 400
+    
+    if request.method == 'POST':
+        results, records, events = [], [], []
+        for index, data in enumerate(items):
+            new_request, error = build_new_request(data, username)
+            if error:
+                results.append({'index': index, 'success': False, 'error': error})
+                continue
+            records.append(new_request)
+            events.append({
+                'request_id': new_request['request_id'],
+                'event_type': 'created',
+                'actor': username,
+                'message': f"Request created by {data['raiser_name']} - Pending admin1 approval",
+                'created_at': new_request['created_at']
+            })
+            results.append({'index': index, 'success': True, 'request_id': new_request['request_id']})
+        
+        if records:
+            snos = iter(store.create_many(records, events))
+            for result in results:
+                if result['success']:
+                    result['sno'] = next(snos)
+    else:
+        # Bulk status change / forwarding: each item is a PUT body plus its request_id
+        results, planned = [], []
+        for index, data in enumerate(items):
+            request_id = data.get('request_id') if isinstance(data, dict) else None
+            record = store.get(request_id) if request_id else None
+            if record is None:
+                results.append({'index': index, 'request_id': request_id, 'success': False,
+                                'error': 'Request not found', 'status': 404})
+                continue
+            changes, events, error = plan_request_update(record, data, username, user_role)
+            if not error:
+                try:
+                    expected_version = int(data.get('version', record['version']))
+                except (TypeError, ValueError):
+                    error = ('version must be an integer', 400)
+            if error:
+                results.append({'index': index, 'request_id': request_id, 'success': False,
+                                'error': error[0], 'status': error[1]})
+                continue
+            results.append({'index': index, 'request_id': request_id})
+            planned.append({
+                'request_id': request_id,
+                'changes': changes,
+                'expected_version': expected_version,
+                'events': [{'request_id': request_id, 'event_type': event_type, 'actor': username,
+                            'message': message, 'created_at': changes['last_updated']}
+                           for event_type, message in events]
+            })
+        
+        outcomes = iter(store.update_many(planned))
+        for result in results:
+            if 'success' in result:
+                continue
+            outcome = next(outcomes)
+            if isinstance(outcome, VersionConflict):
+                result.update({'success': False, 'status': 409, 'current_version': outcome.current_version,
+                               'error': 'Request was modified by someone else, reload and try again'})
+            elif outcome is None:
+                result.update({'success': False, 'status': 404, 'error': 'Request not found'})
+            else:
+                result.update({'success': True, 'version': outcome})
+    
+    publish_events()
+    
+    return jsonify({
+        'success': all(result['success'] for result in results),
+        'succeeded': sum(1 for result in results if result['success']),
+        'failed': sum(1 for result in results if not result['success']),
+        'results': results
+    })
+
+@app.route('/api/requests/search', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def search_requests():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search text required'}), 400
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    # Users only ever see their own requests
+    raiser_username = session['user'] if session['role'] == 'user' else None
+    results, total = store.search(query, raiser_username=raiser_username, limit=limit, offset=offset)
+    
+    return jsonify({
+        'results': results,
+        'total': total,
+        'next_offset': offset + limit if offset + limit < total else None
+    })
+
+@app.route('/api/requests/<string:request_id>/history', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def get_request_history(request_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    record = store.get(request_id)
+    if record is None:
+        return jsonify({'error': 'Request not found'}), 404
+    
+    if session['role'] == 'user' and record['raiser_username'] != session['user']:
+        return jsonify({'error': 'Not authorized to view this request'}), 403
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        cursor = int(request.args.get('cursor', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be integers'}), 400
+    
+    events = store.history(request_id, cursor=cursor, limit=limit)
+    next_cursor = events[-1]['event_id'] if len(events) == limit else None
+    
+    return jsonify({'events': events, 'next_cursor': next_cursor})
+
+@app.route('/api/events', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def stream_events():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    username = session['user']
+    user_role = session['role']
+    
+    # Resume after the last event the browser saw, otherwise only send new events
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_id = int(last_id) if last_id else store.last_event_id()
+    except ValueError:
+        return jsonify({'error': 'Invalid event id'}), 400
+    
+    # Users follow their own requests, admins follow requests currently assigned to them
+    def is_visible(event):
+        if event['event_type'] not in PUSHED_EVENT_TYPES:
+            return False
+        if user_role == 'user':
+            return event['raiser_username'] == username
+        return event['current_admin'] == user_role
+    
+    def generate():
+        nonlocal last_id
+        yield f"retry: {EVENT_POLL_SECONDS * 1000}\n\n"
+        idle = 0
+        while True:
+            events = store.events_since(last_id)
+            notified = []
+            for event in events:
+                last_id = event['event_id']
+                if is_visible(event):
+                    yield f"id: {event['event_id']}\nevent: {event['event_type']}\ndata: {json.dumps(event)}\n\n"
+                    if user_role != 'user':
+                        notified.append(event['request_id'])
+            if notified:
+                store.mark_notified(notified)
+            if events:
+                idle = 0
+                continue
+            with event_signal:
+                event_signal.wait(EVENT_POLL_SECONDS)
+            idle += EVENT_POLL_SECONDS
+            if idle >= EVENT_KEEPALIVE_SECONDS:
+                idle = 0
+                yield ": keep-alive\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/dashboard', methods=['GET'])
 @cross_origin(supports_credentials=True)
@@ -324,22 +642,23 @@ def get_dashboard():
     if 'user' not in session or session['role'] not in ['admin1', 'admin2', 'admin3']:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    df = pd.read_excel(EXCEL_FILE).fillna('')
+    # Counters are maintained by the store on every create and update
+    counters = store.counters()
     
     # General stats
-    total_requests = len(df)
-    open_requests = len(df[df['status'] == 'Open'])
-    closed_requests = len(df[df['status'] == 'Closed'])
+    total_requests = counters['total'].get('', 0)
+    open_requests = counters['status'].get('Open', 0)
+    closed_requests = counters['status'].get('Closed', 0)
     
     # Requests by type
-    requests_by_type = df['request_type'].value_counts().to_dict()
+    requests_by_type = counters['type']
     
     # Requests by status
-    requests_by_status = df['status'].value_counts().to_dict()
+    requests_by_status = counters['status']
     
     # Pending requests for current admin
     current_admin = session['role']
-    pending_requests = len(df[(df['current_admin'] == current_admin) & (df['status'] == 'Open')])
+    pending_requests = counters['open_admin'].get(current_admin, 0)
     
     return jsonify({
         'total_requests': total_requests,
@@ -350,6 +669,54 @@ def get_dashboard():
         'pending_requests': pending_requests
     })
 
+@app.route('/api/requests/export', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def export_requests():
+    if 'user' not in session or session['role'] not in ['admin1', 'admin2', 'admin3']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    buffer = io.BytesIO()
+    store.export_xlsx(buffer)
+    buffer.seek(0)
+    
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=EXCEL_FILE,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+# Periodically rebuild the dashboard counters from the store and report drift
+def reconcile_dashboard_counters():
+    while True:
+        time.sleep(COUNTER_RECONCILE_SECONDS)
+        try:
+            drift = store.reconcile_counters()
+        except Exception as e:
+            app.logger.error(f"Dashboard counter reconciliation failed: {e}")
+            continue
+        for (dimension, key), (maintained, actual) in drift.items():
+            app.logger.warning(f"Dashboard counter drift {dimension}[{key!r}]: {maintained} -> {actual}")
+
+reconciler_lock = threading.Lock()
+reconciler_pid = None
+
+# Start the reconciliation thread once per process: threads do not survive a fork,
+# so gunicorn workers (forked after import with --preload) each start their own
+def start_counter_reconciliation():
+    global reconciler_pid
+    with reconciler_lock:
+        if reconciler_pid == os.getpid():
+            return False
+        thread = threading.Thread(target=reconcile_dashboard_counters, daemon=True)
+        thread.start()
+        reconciler_pid = os.getpid()
+        return True
+
+# Started from the first request rather than at import, which may run before a fork
+@app.before_request
+def start_background_tasks():
+    start_counter_reconciliation()
+
 if __name__ == '__main__':
-    init_files()
     app.run(debug=True, host='0.0.0.0', port=5000)
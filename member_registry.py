@@ -0,0 +1,71 @@
+import re
+import bisect
+
+
+def _key(value):
+    return str(value).strip().lower() if value is not None else ''
+
+
+def name_tokens(text):
+    return re.findall(r'\w+', _key(text))
+
+
+class MemberRegistry:
+    """Members indexed once for lookups: by id, department, email and name prefix.
+
+    Built from a snapshot's members and owned by that snapshot, so it is
+    dropped together with it whenever the member data changes.
+    """
+
+    def __init__(self, members):
+        self.by_id = dict(members)
+        self._names = {member_id: member.name for member_id, member in self.by_id.items()}
+        self._departments = {}
+        self._emails = {}
+        tokens = []
+        for member_id, member in self.by_id.items():
+            self._departments.setdefault(_key(member.department), []).append(member_id)
+            if member.email:
+                self._emails[_key(member.email)] = member_id
+            tokens.extend((token, member_id) for token in set(name_tokens(member.name)))
+        # (name word, member id) sorted, so every word with a prefix is one bisect range
+        tokens.sort(key=lambda entry: (entry[0], str(entry[1])))
+        self._tokens = [token for token, _ in tokens]
+        self._token_ids = [member_id for _, member_id in tokens]
+        self._ordered = sorted(self.by_id, key=lambda member_id: (_key(self._names[member_id]), str(member_id)))
+        self._rank = {member_id: rank for rank, member_id in enumerate(self._ordered)}
+
+    def get(self, member_id):
+        return self.by_id.get(member_id)
+
+    def names(self):
+        """member id -> name for every member; shared, do not modify"""
+        return self._names
+
+    def in_department(self, department):
+        return list(self._departments.get(_key(department), ()))
+
+    def by_email(self, email):
+        member_id = self._emails.get(_key(email))
+        return self.by_id.get(member_id) if member_id is not None else None
+
+    def _prefixed(self, prefix):
+        lo = bisect.bisect_left(self._tokens, prefix)
+        hi = bisect.bisect_left(self._tokens, prefix + '\U0010ffff', lo)
+        return set(self._token_ids[lo:hi])
+
+    def search(self, text=None, department=None, limit=50, offset=0):
+        """Return (members, total) whose name has a word starting with each word of text.
+
+        Either filter may be omitted; results are ordered by name.
+        """
+        ids = None
+        if department:
+            ids = set(self._departments.get(_key(department), ()))
+        for word in name_tokens(text or ''):
+            matches = self._prefixed(word)
+            ids = matches if ids is None else ids & matches
+            if not ids:
+                break
+        ordered = self._ordered if ids is None else sorted(ids, key=self._rank.__getitem__)
+        return [self.by_id[member_id] for member_id in ordered[offset:offset + limit]], len(ordered)
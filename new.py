@@ -1,13 +1,21 @@
-from flask import Flask, request, jsonify
-from openpyxl import load_workbook, Workbook
+from flask import Flask, request, jsonify, send_file, Response
+from openpyxl import Workbook
 from datetime import datetime, timedelta
+import io
 import os
 from dateutil.relativedelta import relativedelta
+from allocation_store import AllocationStore, AllocationConflict
+from allocation_index import find_slots, plan_batch
 
 app = Flask(__name__)
 
-# Database file
+# Legacy workbook, imported into the database on first run and kept as the export layout
 DB_FILE = 'audit_allocations.xlsx'
+ALLOCATION_DB_FILE = 'audit_allocations.db'
+HOLIDAYS_FILE = 'holidays.txt'  # Each line = one YYYY-MM-DD date
+SLOT_SEARCH_DAYS = 365  # Default window for date suggestions
+MEMBER_PAGE_SIZE = 50
+MEMBER_PAGE_SIZE_MAX = 500
 
 # Initialize database if not exists
 if not os.path.exists(DB_FILE):
@@ -53,6 +61,12 @@ if not os.path.exists(DB_FILE):
       
     wb.save(DB_FILE)
 
+store = AllocationStore(ALLOCATION_DB_FILE)
+
+# One-shot import of the legacy workbook into an empty database
+if store.is_empty() and os.path.exists(DB_FILE):
+    store.import_xlsx(DB_FILE)
+
 def get_financial_year(date_str):
     """Get financial year (April-March) for a given date"""
     date = datetime.strptime(date_str, '%Y-%m-%d').date()
@@ -60,39 +74,36 @@ def get_financial_year(date_str):
         return f"{date.year}-{date.year+1}"
     return f"{date.year-1}-{date.year}"
 
+def get_snapshot():
+    """Members and Allocations as parsed records, shared by every route in this process"""
+    return store.snapshot()
+
 def is_available(member_id, from_date, to_date, exclude_allocation_id=None):
     """Check if member is available for given date range"""
-    wb = load_workbook(DB_FILE)
-    ws = wb["Allocations"]
-
-    for row in ws.iter_rows(min_row=2, values_only=True):  
-        if row[1] == member_id:  
-            # Skip if this is the allocation being excluded (for updates)
-            if exclude_allocation_id and row[0] == exclude_allocation_id:
-                continue
-                
-            alloc_from = datetime.strptime(row[4], '%Y-%m-%d').date() if isinstance(row[4], str) else row[4].date()  
-            alloc_to = datetime.strptime(row[5], '%Y-%m-%d').date() if isinstance(row[5], str) else row[5].date()  
-              
-            # Check for date overlap  
-            if not (to_date < alloc_from or from_date > alloc_to):  
-                return False  
-    return True
+    return get_snapshot().index.is_available(member_id, from_date, to_date, exclude_allocation_id)
 
 @app.route('/api/members', methods=['GET'])
 def get_members():
-    """Get all members"""
-    wb = load_workbook(DB_FILE)
-    ws = wb["Members"]
-    members = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        members.append({
-            "id": row[0],
-            "name": row[1],
-            "email": row[2],
-            "department": row[3]
-        })
-    return jsonify(members)
+    """Get all members, or a page of them filtered by department, email or name prefix"""
+    snapshot = get_snapshot()
+    registry = snapshot.registry
+    args = request.args
+    # No filters: the full list, as existing clients expect
+    if not any(key in args for key in ('department', 'q', 'email', 'limit', 'offset')):
+        return jsonify([member.to_dict() for member in snapshot.member_list()])
+
+    if 'email' in args:
+        member = registry.by_email(args['email'])
+        return jsonify({"members": [member.to_dict()] if member else [], "total": int(member is not None), "nextOffset": None})
+
+    try:
+        limit = min(max(int(args.get('limit', MEMBER_PAGE_SIZE)), 1), MEMBER_PAGE_SIZE_MAX)
+        offset = max(int(args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    members, total = registry.search(args.get('q'), args.get('department'), limit, offset)
+    next_offset = offset + limit if offset + limit < total else None
+    return jsonify({"members": [member.to_dict() for member in members], "total": total, "nextOffset": next_offset})
 
 @app.route('/api/available-members', methods=['POST'])
 def get_available_members():
@@ -101,19 +112,38 @@ def get_available_members():
     from_date = datetime.strptime(data['fromDate'], '%Y-%m-%d').date()
     to_date = datetime.strptime(data['toDate'], '%Y-%m-%d').date()
 
-    wb = load_workbook(DB_FILE)  
-    ws_members = wb["Members"]  
-    available_members = []  
-      
-    for row in ws_members.iter_rows(min_row=2, values_only=True):  
-        if is_available(row[0], from_date, to_date):  
-            available_members.append({  
-                "id": row[0],  
-                "name": row[1]  
-            })  
-      
+    snapshot = get_snapshot()
+    available_members = [
+        {"id": member_id, "name": snapshot.members[member_id].name}
+        for member_id in snapshot.index.available(snapshot.members, from_date, to_date)
+    ]
     return jsonify(available_members)
 
+def load_holidays():
+    if not os.path.exists(HOLIDAYS_FILE):
+        return set()
+    with open(HOLIDAYS_FILE, 'r') as f:
+        return {datetime.strptime(line.strip(), '%Y-%m-%d').date() for line in f if line.strip()}
+
+def slot_to_json(slot):
+    return {
+        "startDate": slot['start'].isoformat(),
+        "endDate": slot['end'].isoformat(),
+        "availableDays": slot['available_days'],
+        "availableUntil": slot['available_until'].isoformat(),
+        "members": slot['members'],
+        "manager": slot['manager'],
+        "freeMembers": slot['free_members']
+    }
+
+def candidate_members(data, snapshot, default=None):
+    """Member ids named in a request, either listed or by department"""
+    if 'memberIds' in data:
+        return data['memberIds']
+    if 'department' in data:
+        return snapshot.registry.in_department(data['department'])
+    return default
+
 @app.route('/api/suggest-dates', methods=['POST'])
 def suggest_dates():
     """Suggest available date ranges for a member"""
@@ -121,100 +151,135 @@ def suggest_dates():
     member_id = data['memberId']
     days_required = int(data['daysRequired'])
 
-    wb = load_workbook(DB_FILE)  
-    ws = wb["Allocations"]  
-      
-    # Get all allocations for this member, sorted by date  
-    member_allocations = []  
-    for row in ws.iter_rows(min_row=2, values_only=True):  
-        if row[1] == member_id:  
-            alloc_from = datetime.strptime(row[4], '%Y-%m-%d').date() if isinstance(row[4], str) else row[4].date()  
-            alloc_to = datetime.strptime(row[5], '%Y-%m-%d').date() if isinstance(row[5], str) else row[5].date()  
-            member_allocations.append((alloc_from, alloc_to))  
-      
-    # Sort allocations by start date  
-    member_allocations.sort()  
-      
-    today = datetime.now().date()  
-    suggestions = []  
-      
-    # Check availability before first allocation  
-    if len(member_allocations) > 0:  
-        first_alloc_start = member_allocations[0][0]  
-        available_days = (first_alloc_start - today).days  
-        if available_days >= days_required:  
-            suggestions.append({  
-                "startDate": today.isoformat(),  
-                "endDate": (today + timedelta(days=days_required - 1)).isoformat(),  
-                "availableDays": available_days  
-            })  
-      
-    # Check gaps between allocations  
-    for i in range(len(member_allocations) - 1):  
-        current_end = member_allocations[i][1]  
-        next_start = member_allocations[i+1][0]  
-          
-        if next_start > current_end:  
-            gap_days = (next_start - current_end).days - 1  
-            if gap_days >= days_required:  
-                start_date = current_end + timedelta(days=1)  
-                suggestions.append({  
-                    "startDate": start_date.isoformat(),  
-                    "endDate": (start_date + timedelta(days=days_required - 1)).isoformat(),  
-                    "availableDays": gap_days  
-                })  
-      
-    # Check availability after last allocation  
-    if len(member_allocations) > 0:  
-        last_alloc_end = member_allocations[-1][1]  
-        start_date = last_alloc_end + timedelta(days=1)  
-        suggestions.append({  
-            "startDate": start_date.isoformat(),  
-            "endDate": (start_date + timedelta(days=days_required - 1)).isoformat(),  
-            "availableDays": 365  # Arbitrary large number  
-        })  
-    else:  
-        # No allocations at all - suggest starting today  
-        suggestions.append({  
-            "startDate": today.isoformat(),  
-            "endDate": (today + timedelta(days=days_required - 1)).isoformat(),  
-            "availableDays": 365  
-        })  
-      
-    # Sort suggestions by start date  
-    suggestions.sort(key=lambda x: x['startDate'])  
-      
-    return jsonify(suggestions[:5])  # Return top 5 suggestions
+    today = datetime.now().date()
+    slots = find_slots(get_snapshot().index, [member_id], today,
+                       today + timedelta(days=SLOT_SEARCH_DAYS - 1), days_required)
+    return jsonify([
+        {"startDate": s["startDate"], "endDate": s["endDate"], "availableDays": s["availableDays"]}
+        for s in map(slot_to_json, slots)
+    ])
+
+@app.route('/api/find-slots', methods=['POST'])
+def find_team_slots():
+    """Earliest windows where a team of members (and optionally a manager) are all free"""
+    data = request.json
+    snapshot = get_snapshot()
+
+    member_ids = candidate_members(data, snapshot)
+    if member_ids is None:
+        return jsonify({"error": "memberIds or department is required"}), 400
+
+    try:
+        days_required = int(data['daysRequired'])
+        today = datetime.now().date()
+        from_date = datetime.strptime(data['fromDate'], '%Y-%m-%d').date() if data.get('fromDate') else today
+        to_date = (datetime.strptime(data['toDate'], '%Y-%m-%d').date() if data.get('toDate')
+                   else from_date + timedelta(days=SLOT_SEARCH_DAYS - 1))
+        holidays = {datetime.strptime(day, '%Y-%m-%d').date() for day in data.get('holidays', [])}
+        team_size = int(data['teamSize']) if data.get('teamSize') is not None else None
+        limit = int(data.get('limit', 5))
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+
+    if data.get('skipHolidays', False):
+        holidays |= load_holidays()
+
+    slots = find_slots(
+        snapshot.index, member_ids, from_date, to_date, days_required,
+        team_size=team_size,
+        manager_ids=data.get('managerIds', []),
+        skip_weekends=bool(data.get('skipWeekends', False)),
+        holidays=holidays,
+        limit=limit
+    )
+    return jsonify([slot_to_json(slot) for slot in slots])
+
+@app.route('/api/allocations/plan', methods=['POST'])
+def plan_allocations():
+    """Schedule a batch of audits and book them in one transaction (or just preview with dryRun)"""
+    data = request.json
+    snapshot = get_snapshot()
+    default_members = candidate_members(data, snapshot, default=list(snapshot.members))
+    default_managers = data.get('managerIds', [])
+
+    audits = []
+    try:
+        for item in data['audits']:
+            earliest = datetime.strptime(item['earliestDate'], '%Y-%m-%d').date()
+            latest = datetime.strptime(item['latestDate'], '%Y-%m-%d').date()
+            if earliest > latest:
+                return jsonify({"error": f"earliestDate after latestDate for '{item['description']}'"}), 400
+            audits.append({
+                "description": item['description'],
+                "section": item.get('section', ''),
+                "duration": int(item['duration']),
+                "headcount": int(item.get('headcount', 1)),
+                "earliest": earliest,
+                "latest": latest,
+                "member_ids": candidate_members(item, snapshot, default=default_members),
+                "manager_ids": item.get('managerIds', default_managers)
+            })
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid audit in batch: {e}"}), 400
+
+    try:
+        holidays = {datetime.strptime(day, '%Y-%m-%d').date() for day in data.get('holidays', [])}
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    if data.get('skipHolidays', False):
+        holidays |= load_holidays()
+
+    planned, unplaceable = plan_batch(snapshot.index, audits,
+                                      skip_weekends=bool(data.get('skipWeekends', False)), holidays=holidays)
+    result = {
+        "planned": [{
+            "index": p['index'],
+            "description": p['description'],
+            "section": p['section'],
+            "fromDate": p['start'].isoformat(),
+            "toDate": p['end'].isoformat(),
+            "memberIds": p['members'],
+            "managerId": p['manager']
+        } for p in planned],
+        "unplaceable": unplaceable,
+        "committed": False
+    }
+    if data.get('dryRun', False) or not planned:
+        return jsonify(result)
+
+    items = [
+        (member_id, p['description'], p['section'], p['start'], p['end'])
+        for p in planned
+        for member_id in p['members'] + ([p['manager']] if p['manager'] is not None else [])
+    ]
+    try:
+        created = store.create_many(items)
+    except AllocationConflict as e:
+        # Someone booked one of the members after the plan was made; nothing was written
+        result["error"] = f"Plan is out of date: {e}"
+        return jsonify(result), 409
+
+    result["committed"] = True
+    result["allocationIds"] = [alloc.allocation_id for alloc in created]
+    return jsonify(result)
 
 @app.route('/api/allocations', methods=['GET'])
 def get_allocations():
     """Get all allocations for a financial year"""
     financial_year = request.args.get('financialYear')
 
-    wb = load_workbook(DB_FILE)  
-    ws = wb["Allocations"]  
-    allocations = []  
-      
-    for row in ws.iter_rows(min_row=2, values_only=True):  
-        row_fy = row[6] if isinstance(row[6], str) else get_financial_year(row[4].strftime('%Y-%m-%d'))  
-        if row_fy == financial_year:  
-            allocations.append({  
-                "id": row[0],  
-                "memberId": row[1],  
-                "description": row[2],  
-                "section": row[3],  
-                "fromDate": row[4].strftime('%Y-%m-%d') if not isinstance(row[4], str) else row[4],  
-                "toDate": row[5].strftime('%Y-%m-%d') if not isinstance(row[5], str) else row[5],  
-                "financialYear": row_fy  
-            })  
-      
-    return jsonify(allocations)
+    etag, allocations = get_snapshot().year_payload(financial_year)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(allocations)
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/allocations', methods=['POST'])
 def create_allocation():
     """Create new allocation"""
     data = request.json
-    today = datetime.now().date()
     from_date = datetime.strptime(data['fromDate'], '%Y-%m-%d').date()
     to_date = datetime.strptime(data['toDate'], '%Y-%m-%d').date()
 
@@ -222,30 +287,12 @@ def create_allocation():
     if from_date > to_date:  
         return jsonify({"error": "From date cannot be after to date"}), 400  
       
-    # Check if member is available  
-    if not is_available(data['memberId'], from_date, to_date):  
-        return jsonify({"error": "Member is not available for the selected dates"}), 400  
-      
-    wb = load_workbook(DB_FILE)  
-    ws = wb["Allocations"]  
-      
-    # Generate new ID  
-    existing_ids = [row[0] for row in ws.iter_rows(min_row=2, values_only=True)]  
-    new_id = max(existing_ids) + 1 if existing_ids else 1  
-      
-    # Add new allocation  
-    financial_year = get_financial_year(data['fromDate'])  
-    ws.append([  
-        new_id,  
-        data['memberId'],  
-        data['description'],  
-        data['section'],  
-        data['fromDate'],  
-        data['toDate'],  
-        financial_year  
-    ])  
-      
-    wb.save(DB_FILE)  
+    # Availability is re-checked inside the insert transaction
+    try:
+        allocation = store.create(data['memberId'], data['description'], data['section'], from_date, to_date)
+    except AllocationConflict:
+        return jsonify({"error": "Member is not available for the selected dates"}), 400
+    new_id = allocation.allocation_id
     return jsonify({"success": True, "id": new_id})
 
 @app.route('/api/allocations/<int:alloc_id>', methods=['PUT'])
@@ -260,38 +307,28 @@ def update_allocation(alloc_id):
     if from_date > to_date:  
         return jsonify({"error": "From date cannot be after to date"}), 400  
       
-    wb = load_workbook(DB_FILE)  
-    ws = wb["Allocations"]  
+    existing = store.get(alloc_id)
+    if existing is None:
+        return jsonify({"error": "Allocation not found"}), 404
+    original_from = existing.from_date
+    original_to = existing.to_date
+      
+    # Validate: Cannot move allocation to the past  
+    if from_date < today and from_date != original_from:  
+        return jsonify({"error": "Cannot move allocation to the past"}), 400  
       
-    # Find the allocation  
-    for row in ws.iter_rows(min_row=2):  
-        if row[0].value == alloc_id:  
-            original_from = datetime.strptime(row[4].value, '%Y-%m-%d').date() if isinstance(row[4].value, str) else row[4].value.date()  
-            original_to = datetime.strptime(row[5].value, '%Y-%m-%d').date() if isinstance(row[5].value, str) else row[5].value.date()  
-              
-            # Validate: Cannot move allocation to the past  
-            if from_date < today and from_date != original_from:  
-                return jsonify({"error": "Cannot move allocation to the past"}), 400  
-              
-            # Validate: Cannot shorten allocation to before today for current allocations  
-            if original_from <= today <= original_to:  
-                if from_date > original_from:  
-                    return jsonify({"error": "Cannot move start date forward for current allocation"}), 400  
-                if to_date < today:  
-                    return jsonify({"error": "Cannot set end date before today for current allocation"}), 400  
-              
-            # Check if member is available for new dates (excluding this allocation)  
-            if not is_available(row[1].value, from_date, to_date, exclude_allocation_id=alloc_id):  
-                return jsonify({"error": "Member is not available for the selected dates"}), 400  
-              
-            # Update the allocation  
-            row[2].value = data['description']  # Description  
-            row[3].value = data['section']      # Section  
-            row[4].value = data['fromDate']     # From Date  
-            row[5].value = data['toDate']       # To Date  
-            break  
+    # Validate: Cannot shorten allocation to before today for current allocations  
+    if original_from <= today <= original_to:  
+        if from_date > original_from:  
+            return jsonify({"error": "Cannot move start date forward for current allocation"}), 400  
+        if to_date < today:  
+            return jsonify({"error": "Cannot set end date before today for current allocation"}), 400  
       
-    wb.save(DB_FILE)  
+    # Member must be free for the new dates (excluding this allocation); checked in the same transaction
+    try:
+        store.update(alloc_id, data['description'], data['section'], from_date, to_date)
+    except AllocationConflict:
+        return jsonify({"error": "Member is not available for the selected dates"}), 400
     return jsonify({"success": True})
 
 @app.route('/api/allocations/<int:alloc_id>', methods=['DELETE'])
@@ -299,25 +336,31 @@ def delete_allocation(alloc_id):
     """Delete an allocation"""
     today = datetime.now().date()
 
-    wb = load_workbook(DB_FILE)  
-    ws = wb["Allocations"]  
+    existing = store.get(alloc_id)
+    if existing is None:
+        return jsonify({"error": "Allocation not found"}), 404
       
-    # Find the allocation  
-    for row in ws.iter_rows(min_row=2):  
-        if row[0].value == alloc_id:  
-            from_date = datetime.strptime(row[4].value, '%Y-%m-%d').date() if isinstance(row[4].value, str) else row[4].value.date()  
-              
-            # Validate: Cannot delete past allocations  
-            if from_date < today:  
-                return jsonify({"error": "Cannot delete past allocations"}), 400  
-              
-            # Delete the row  
-            ws.delete_rows(row[0].row)  
-            break  
+    # Validate: Cannot delete past allocations  
+    if existing.from_date < today:  
+        return jsonify({"error": "Cannot delete past allocations"}), 400  
       
-    wb.save(DB_FILE)  
+    store.delete(alloc_id)
     return jsonify({"success": True})
 
+@app.route('/api/allocations/export', methods=['GET'])
+def export_allocations():
+    """Download members and allocations in the audit_allocations.xlsx layout"""
+    buffer = io.BytesIO()
+    store.export_xlsx(buffer)
+    buffer.seek(0)
+
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=DB_FILE,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
 
  
 
@@ -380,9 +423,6 @@ def generate_pdf():
     if not financial_year:
         return jsonify({"error": "Missing financial year"}), 400
 
-    wb = load_workbook(DB_FILE)
-    ws = wb["Allocations"]
-
     if not os.path.exists(MANAGER_FILE):
         return jsonify({"error": "Manager file not found"}), 404
 
@@ -390,11 +430,8 @@ def generate_pdf():
         managers = [line.strip() for line in f if line.strip()]
 
     data = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        row_fy = row[6] if isinstance(row[6], str) else get_financial_year(row[4])
-        if row_fy != financial_year:
-            continue
-
+    for alloc in get_snapshot().year(financial_year):
+        row = alloc.as_row()
         description = row[2]
         unit_type = classify_unit(description)
         audit_mgr = row[3]
@@ -444,296 +481,72 @@ def generate_pdf():
         mimetype='application/pdf'
     )
 
-member_ids = [int(mid.strip()) for mid in str(member_ids_raw).split(",") if mid.strip().isdigit()]
-        member_names = [member_map.get(mid, f"ID:{mid}") for mid in member_ids]
-
-        audit_mgr = next((name for name in member_names if name in managers), "")
-        auditors = " / ".join([name for name in member_names if name != audit_mgr])
-
-        unit_type = classify_unit(description)
-
-        data.append({
-            "unit": unit_type,
-            "row": [allocation_id, allocation_id, description, auditors, audit_mgr, from_date, to_date, ""]
-        })
-
-    if not data:
-        return jsonify({"error": "No data found for selected financial year"}), 404
-
-    pdf = PDF(header_date=header_date, ref_year=financial_year)
-    pdf.add_page()
-
-    for unit_type in ["HO Units", "SOF Units", "Plant Units"]:
-        unit_data = [d for d in data if d["unit"] == unit_type]
-        if not unit_data:
-            continue
-
-        pdf.set_font('Arial', 'B', 11)
-        pdf.cell(0, 10, unit_type, ln=1)
-        pdf.table_header()
-
-        for idx, entry in enumerate(unit_data, start=1):
-            pdf.table_row(idx, entry["row"])
-
-        pdf.ln(5)
-
-    buffer = io.BytesIO()
-    pdf_output = pdf.output(dest='S').encode('latin1')
-    buffer.write(pdf_output)
-    buffer.seek(0)
-
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"audit_programme_{financial_year}.pdf",
-        mimetype='application/pdf'
-    )
-
 if __name__ == '__main__':
     app.run(debug=True)
 
 
 from flask import Flask, request, jsonify, send_file
-from openpyxl import load_workbook
-from fpdf import FPDF
 import io
 import os
 from flask_cors import CORS
-from datetime import datetime
-from collections import defaultdict
+from concurrent.futures import TimeoutError as RenderTimeout
+from allocation_store import snapshot_cache
+from render_cache import RenderCache, content_key
+from programme_pdf import PDF
+from programme_data import allocations_frame, group_programme, programme_sections, quarter_label
 
 app = Flask(__name__)
 CORS(app)
 MANAGER_FILE = 'managers.txt'
 DB_FILE = 'audit_allocations_1.xlsx'
+PDF_CACHE_DIR = 'pdf_cache'
+PDF_RENDER_WORKERS = 2
+PDF_INLINE_WAIT_SECONDS = 5  # Longer renders answer 202 with a job to poll
 
-class PDF(FPDF):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.quarter_info = None
-        self.fin_year = None
-        self.header_date = None
+pdf_renders = RenderCache(PDF_CACHE_DIR, workers=PDF_RENDER_WORKERS)
 
-    def header(self):
-        # Logo
-        self.image('static/logo.png', 10, 8, 20)
-        
-        # Company name under logo (left side)
-        self.set_font('Arial', 'B', 12)
-        self.set_xy(10, 30)
-        self.cell(30, 8, 'XYZ')
-        
-        # Main heading parallel to company name (center-right)
-        self.set_font('Arial', 'B', 14)
-        self.set_xy(70, 30)
-        self.cell(0, 8, 'INTER OFFICE MEMORANDUM', align='C')
-        
-        # Horizontal line after logo and headings
-        self.set_xy(10, 45)
-        self.line(10, 45, 200, 45)
-        
-        # From and Ref parallel (same line)
-        self.set_font('Arial', '', 10)
-        self.set_xy(10, 55)
-        self.cell(80, 8, 'From: IAD')
-        
-        self.set_xy(120, 55)
-        self.cell(0, 8, f'Ref: __/{self.fin_year}/IAD', align='R')
-        
-        # To and Date parallel (same line)
-        self.set_xy(10, 70)
-        self.cell(80, 8, 'To: CS')
-        
-        self.set_xy(120, 70)
-        self.cell(0, 8, f'Date: {self.header_date}', align='R')
-        
-        # Add line under To and Date
-        self.line(10, 78, 200, 78)
-        
-        # Subject line with dynamic quarter
-        self.set_xy(10, 85)
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 8, f'AUDIT PROGRAMME FOR THE {self.quarter_info}', ln=1, align='C')
-        
-        self.ln(10)
+def render_programme(path, fin_year, header_date, allocations, member_map, managers):
+    """Write the audit programme PDF for one financial year to path"""
+    grouped = group_programme(allocations_frame(allocations), member_map, managers)
 
-    def set_header_data(self, fin_year, header_date, quarter_info):
-        self.fin_year = fin_year
-        self.header_date = header_date
-        self.quarter_info = quarter_info
+    # Prepare PDF in portrait orientation
+    pdf = PDF(orientation='P', unit='mm', format='A4')
+    pdf.set_header_data(fin_year, header_date, quarter_label(grouped['FromDate']))
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
 
-    def table_header(self):
-        # Main table headers with proper widths
-        self.set_font('Arial', 'B', 9)
-        
-        # Column widths - adjusted to fit page width (210mm - 20mm margins = 190mm)
-        widths = [12, 18, 50, 35, 20, 20, 20, 25]  # Total: 200mm
-        
-        # Draw first row of headers
-        start_x = 10
-        start_y = self.get_y()
-        
-        # Draw individual cells for first row
-        headers_row1 = ['Sl', 'Audit Ref', 'UNIT/MODULE', 'AUDITORS', 'AUDIT', 'Audit Period', 'REMARKS']
-        header_widths = [12, 18, 50, 35, 20, 40, 25]  # Audit Period spans 2 columns (20+20=40)
-        
-        for i, (header, width) in enumerate(zip(headers_row1, header_widths)):
-            self.set_xy(start_x + sum(header_widths[:i]), start_y)
-            if i < 5:  # Regular columns
-                self.cell(width, 16, header, border=1, align='C')
-            elif i == 5:  # Audit Period column - only top, left, right borders
-                self.cell(width, 8, header, border=1, align='C')
-            else:  # REMARKS column
-                self.cell(width, 16, header, border=1, align='C')
-        
-        # Draw second row for sub-headers
-        sub_headers = ['No', 'No.', '', '', 'MGR', 'From', 'To', '']
-        
-        for i, (sub_header, width) in enumerate(zip(sub_headers, widths)):
-            self.set_xy(start_x + sum(widths[:i]), start_y + 8)
-            if i < 5:  # First 5 columns get 8px height for second row
-                self.cell(width, 8, sub_header, border=1, align='C')
-            elif i in [5, 6]:  # From and To columns
-                self.cell(width, 8, sub_header, border=1, align='C')
-            else:  # REMARKS column - empty cell for second row
-                self.cell(width, 8, sub_header, border=1, align='C')
-        
-        self.set_xy(start_x, start_y + 16)
-
-    def add_section_header(self, section_name):
-        """Add section headers like 'HO Units', 'Plant Units' etc."""
-        self.set_font('Arial', 'B', 10)
-        self.ln(5)
-        self.cell(0, 8, section_name, ln=1, align='C')
-        self.ln(2)
-        
-    def get_text_height(self, text, width, font_size=8):
-        """Calculate the height needed for text within given width"""
-        self.set_font('Arial', '', font_size)
-        char_width = font_size * 0.35  # More accurate character width
-        chars_per_line = max(1, int((width - 4) / char_width))
-        
-        lines_needed = max(1, (len(str(text)) + chars_per_line - 1) // chars_per_line)
-        return max(12, lines_needed * (font_size + 1))
-
-    def multi_cell_row(self, data, widths, min_height=12):
-        """Create a row with multi-line cells that align properly"""
-        max_height = min_height
-        font_size = 8
-        
-        # Calculate maximum height needed
-        for text, width in zip(data, widths):
-            if len(str(text)) > 0:
-                text_height = self.get_text_height(str(text), width, font_size)
-                max_height = max(max_height, text_height)
-        
-        start_x = 10
-        start_y = self.get_y()
-        
-        # Draw each cell
-        for i, (text, width) in enumerate(zip(data, widths)):
-            self.set_xy(start_x + sum(widths[:i]), start_y)
-            
-            # Draw cell border
-            self.rect(self.get_x(), self.get_y(), width, max_height)
-            
-            # Add text content
-            self.set_font('Arial', '', font_size)
-            if i in [0, 1, 4, 5, 6]:  # Center aligned columns
-                self.set_xy(start_x + sum(widths[:i]), start_y + (max_height - font_size) / 2)
-                self.cell(width, font_size, str(text), align='C')
-            else:  # Left aligned columns with padding
-                self.set_xy(start_x + sum(widths[:i]) + 2, start_y + 2)
-                # For long text, use multi_cell
-                if len(str(text)) > (width - 4) / (font_size * 0.35):
-                    # Calculate available height for multi-cell
-                    available_height = max_height - 4
-                    line_height = font_size + 1
-                    self.multi_cell(width - 4, line_height, str(text), align='L')
-                else:
-                    self.cell(width - 4, font_size, str(text), align='L')
-        
-        # Move to next row
-        self.set_xy(start_x, start_y + max_height)
-
-    def table_row(self, index, row, audit_ref_no=''):
-        data = [
-            str(index),
-            str(audit_ref_no),
-            str(row['Description']),
-            str(row['Auditors']),
-            str(row['Manager']),
-            str(row['FromDate']),
-            str(row['ToDate']),
-            str(row.get('Remarks', ''))
-        ]
-        
-        # Column widths matching header
-        widths = [12, 18, 50, 35, 20, 20, 20, 25]
-        
-        # Check if we need a new page
-        if self.get_y() > 250:
-            self.add_page()
-            self.table_header()
-        
-        self.multi_cell_row(data, widths)
-
-def calculate_quarter_from_dates(grouped_data):
-    """Calculate quarter and year based on the allocation dates"""
-    if not grouped_data:
-        return "QUARTER NOT DETERMINED"
-    
-    # Get all from_dates to determine the dominant quarter
-    from_dates = []
-    for (desc, from_date, to_date), val in grouped_data.items():
-        if isinstance(from_date, datetime):
-            from_dates.append(from_date)
-        elif isinstance(from_date, str):
-            try:
-                # Try to parse string date
-                parsed_date = datetime.strptime(from_date, '%Y-%m-%d')
-                from_dates.append(parsed_date)
-            except ValueError:
-                try:
-                    parsed_date = datetime.strptime(from_date, '%d-%m-%Y')
-                    from_dates.append(parsed_date)
-                except ValueError:
-                    continue
-    
-    if not from_dates:
-        return "QUARTER NOT DETERMINED"
-    
-    # Find the most common quarter
-    quarter_counts = {1: 0, 2: 0, 3: 0, 4: 0}
-    years = []
-    
-    for date in from_dates:
-        years.append(date.year)
-        month = date.month
-        if month in [4, 5, 6]:
-            quarter_counts[1] += 1
-        elif month in [7, 8, 9]:
-            quarter_counts[2] += 1
-        elif month in [10, 11, 12]:
-            quarter_counts[3] += 1
-        else:  # [1, 2, 3]
-            quarter_counts[4] += 1
-    
-    # Get the most common quarter
-    dominant_quarter = max(quarter_counts, key=quarter_counts.get)
-    
-    # Get the most common year
-    most_common_year = max(set(years), key=years.count) if years else datetime.now().year
-    
-    # Generate quarter text
-    quarter_texts = {
-        1: f"QUARTER APRIL - JUNE {most_common_year}",
-        2: f"QUARTER JULY - SEPTEMBER {most_common_year}",
-        3: f"QUARTER OCTOBER - DECEMBER {most_common_year}",
-        4: f"QUARTER JANUARY - MARCH {most_common_year + 1}"
-    }
-    
-    return quarter_texts.get(dominant_quarter, "QUARTER NOT DETERMINED")
+    for position, (section_name, units) in enumerate(programme_sections(grouped)):
+        if position:
+            pdf.ln(10)
+
+        pdf.add_section_header(section_name)
+        pdf.table_header()
+
+        # Measure every row first, then draw without re-measuring
+        pdf.draw_rows(pdf.layout_rows(enumerate(units, 1)))
+
+    # Written straight to the cache file, never held as one bytes object
+    pdf.output(path)
+
+def send_programme(path, job_id, fin_year):
+    # The job id is the content key, so it doubles as a strong ETag
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=f'audit_programme_{fin_year}.pdf',
+        mimetype='application/pdf',
+        etag=job_id,
+        conditional=True
+    )
+
+def job_status(job_id, fin_year):
+    status, error = pdf_renders.status(job_id)
+    body = {'jobId': job_id, 'status': status, 'statusUrl': f'/generate-pdf/jobs/{job_id}?financialYear={fin_year}'}
+    if status == 'done':
+        body['downloadUrl'] = f'/generate-pdf/jobs/{job_id}/download?financialYear={fin_year}'
+    if error:
+        body['error'] = error
+    return body
 
 @app.route('/generate-pdf', methods=['POST'])
 def generate_pdf():
@@ -747,106 +560,55 @@ def generate_pdf():
         if not os.path.exists(DB_FILE) or not os.path.exists(MANAGER_FILE):
             return jsonify({'error': 'Required files not found'}), 404
 
-        wb = load_workbook(DB_FILE)
-        ws_alloc = wb['Allocations']
-        ws_members = wb['Members']
+        snapshot = snapshot_cache(DB_FILE).get()
 
         with open(MANAGER_FILE, 'r') as f:
-            managers = [line.strip() for line in f if line.strip()]
-
-        member_map = {row[0]: row[1] for row in ws_members.iter_rows(min_row=2, values_only=True)}
-
-        # Group by (description, from_date, to_date)
-        grouped = defaultdict(lambda: {'Auditors': [], 'Manager': None})
-
-        for row in ws_alloc.iter_rows(min_row=2, values_only=True):
-            alloc_id, member_id, desc, from_date, to_date, year = row
-            if str(year) != fin_year:
-                continue
-
-            key = (desc, from_date, to_date)
-            name = member_map.get(member_id, 'Unknown')
-
-            if name in managers:
-                grouped[key]['Manager'] = name
-            else:
-                grouped[key]['Auditors'].append(name)
-
-        # Calculate quarter based on allocation data
-        quarter_info = calculate_quarter_from_dates(grouped)
-
-        # Prepare PDF in portrait orientation
-        pdf = PDF(orientation='P', unit='mm', format='A4')
-        pdf.set_header_data(fin_year, header_date, quarter_info)
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-
-        # Categorize and prepare data
-        ho_units = []
-        sof_units = []
-        plant_units = []
-        
-        for idx, ((desc, from_date, to_date), val) in enumerate(grouped.items(), 1):
-            auditors_str = ", ".join(val['Auditors'])
-            row_data = {
-                "Description": desc,
-                "Auditors": auditors_str,
-                "Manager": val['Manager'] or '',
-                "FromDate": from_date.strftime('%d-%m-%Y') if isinstance(from_date, datetime) else str(from_date),
-                "ToDate": to_date.strftime('%d-%m-%Y') if isinstance(to_date, datetime) else str(to_date),
-                "Remarks": ''
-            }
-            
-            # Categorization logic
-            desc_upper = str(desc).strip().upper()
-            if desc_upper.startswith("HO-"):
-                ho_units.append(row_data)
-            elif desc_upper.startswith("SOF-"):
-                sof_units.append(row_data)
-            else:
-                plant_units.append(row_data)
-
-        # Add sections to PDF
-        sections = [
-            ("HO Units", ho_units),
-            ("SOF Units", sof_units),
-            ("Plant Units", plant_units)
-        ]
+            managers_text = f.read()
+        managers = [line.strip() for line in managers_text.splitlines() if line.strip()]
+
+        member_map = snapshot.registry.names()
+
+        # Same year content, managers, member names and header date -> same PDF
+        year_etag, _ = snapshot.year_payload(fin_year)
+        job_id = content_key(fin_year, header_date, year_etag, managers_text, sorted(member_map.items(), key=str))
+
+        # The POST only fetches a deterministic document, so a client that
+        # already holds this PDF gets 304 as on the GET download, without a render
+        if job_id in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(job_id)
+            return response
+
+        path = pdf_renders.lookup(job_id)
+        if path is None:
+            allocations = snapshot.year(fin_year)
+            future = pdf_renders.submit(job_id, lambda target: render_programme(
+                target, fin_year, header_date, allocations, member_map, managers
+            ))
+            try:
+                path = future.result(timeout=PDF_INLINE_WAIT_SECONDS)
+            except RenderTimeout:
+                return jsonify(job_status(job_id, fin_year)), 202
 
-        first_section = True
-        for section_name, units in sections:
-            if units:
-                if not first_section:
-                    pdf.ln(10)
-                
-                pdf.add_section_header(section_name)
-                pdf.table_header()
-                
-                for idx, row in enumerate(units, 1):
-                    pdf.table_row(idx, row)
-                
-                first_section = False
-
-        # Generate PDF
-        pdf_output = pdf.output(dest='S')
-        if isinstance(pdf_output, str):
-            pdf_bytes = pdf_output.encode('latin1')
-        else:
-            pdf_bytes = pdf_output
-            
-        buffer = io.BytesIO(pdf_bytes)
-        buffer.seek(0)
-
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f'audit_programme_{fin_year}.pdf',
-            mimetype='application/pdf'
-        )
+        return send_programme(path, job_id, fin_year)
 
     except Exception as e:
         print(f"Error generating PDF: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/generate-pdf/jobs/<job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    body = job_status(job_id, request.args.get('financialYear', ''))
+    if body['status'] is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(body)
+
+@app.route('/generate-pdf/jobs/<job_id>/download', methods=['GET'])
+def download_pdf_job(job_id):
+    path = pdf_renders.lookup(job_id)
+    if path is None:
+        return jsonify({'error': 'PDF not ready'}), 404
+    return send_programme(path, job_id, request.args.get('financialYear', ''))
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Report sections, in the order they are printed
+UNIT_TYPES = ["HO Units", "SOF Units", "Plant Units"]
+GROUP_KEYS = ['description', 'from_date', 'to_date']
+
+QUARTER_TEXTS = {
+    1: "QUARTER APRIL - JUNE {year}",
+    2: "QUARTER JULY - SEPTEMBER {year}",
+    3: "QUARTER OCTOBER - DECEMBER {year}",
+    4: "QUARTER JANUARY - MARCH {next_year}"
+}
+
+
+def allocations_frame(allocations):
+    """Columnar view of Allocation records, in their original order"""
+    return pd.DataFrame({
+        'member_id': [alloc.member_id for alloc in allocations],
+        'description': [alloc.description for alloc in allocations],
+        'from_date': date_column([alloc.from_date for alloc in allocations]),
+        'to_date': date_column([alloc.to_date for alloc in allocations])
+    })
+
+
+def date_column(values):
+    """datetime64 column from date objects, converting each distinct date once"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    return pd.to_datetime(uniques).to_numpy(dtype='datetime64[ns]')[codes]
+
+
+def join_groups(values, groups, size, sep=', '):
+    """sep-joined values per group number 0..size-1, keeping their order within a group"""
+    order = np.argsort(groups, kind='stable')
+    ordered = values[order].tolist()
+    bounds = np.searchsorted(groups[order], np.arange(size + 1)).tolist()
+    return [sep.join(ordered[lo:hi]) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def format_dates(dates, date_format):
+    """strftime each distinct date once; a year of audits has only a few hundred"""
+    codes, uniques = pd.factorize(dates)
+    return np.asarray(uniques.strftime(date_format), dtype=object)[codes]
+
+
+def classify_units(descriptions):
+    """HO-/SOF- prefixed descriptions are HO/SOF units, everything else a plant unit"""
+    upper = descriptions.astype(str).str.strip().str.upper()
+    return pd.Series(
+        np.select([upper.str.startswith("HO-"), upper.str.startswith("SOF-")],
+                  UNIT_TYPES[:2], default=UNIT_TYPES[2]),
+        index=descriptions.index
+    )
+
+
+def quarter_label(from_dates):
+    """Most common financial quarter (April-June = 1) and calendar year among the dates"""
+    if len(from_dates) == 0:
+        return "QUARTER NOT DETERMINED"
+    dates = pd.DatetimeIndex(from_dates)
+    quarters = (dates.month.to_numpy() - 4) % 12 // 3 + 1
+    # argmax and min() both resolve ties to the earliest quarter / year
+    quarter = int(np.bincount(quarters, minlength=5)[1:].argmax()) + 1
+    year_counts = pd.Series(dates.year).value_counts()
+    year = int(year_counts[year_counts == year_counts.max()].index.min())
+    return QUARTER_TEXTS[quarter].format(year=year, next_year=year + 1)
+
+
+def group_programme(frame, member_names, managers):
+    """One row per audit: allocations sharing description and dates, with their people.
+
+    Members whose name is in `managers` become the audit's Manager (the
+    last one listed wins), everyone else is joined into Auditors in
+    allocation order. Audits keep the order in which they first appear, and
+    Unit holds the report section they belong to.
+    """
+    names = frame['member_id'].map(member_names).fillna('Unknown').astype(str)
+    is_manager = names.isin(set(managers)).to_numpy()
+    audit = frame.groupby(GROUP_KEYS, sort=False, dropna=False).ngroup()
+
+    first = ~audit.duplicated()
+    grouped = frame.loc[first, GROUP_KEYS].set_axis(audit[first].to_numpy())
+    grouped.columns = ['Description', 'FromDate', 'ToDate']
+    audit, names = audit.to_numpy(), names.to_numpy(dtype=object)
+    grouped['Auditors'] = join_groups(names[~is_manager], audit[~is_manager], len(grouped))
+    grouped['Manager'] = (pd.Series(names[is_manager]).groupby(audit[is_manager]).last()
+                          .reindex(grouped.index, fill_value=''))
+    grouped['Unit'] = classify_units(grouped['Description'])
+    return grouped.reset_index(drop=True)
+
+
+def programme_sections(grouped, date_format='%d-%m-%Y'):
+    """[(unit type, row dicts)] for the non-empty report sections, rows ready for the PDF table"""
+    columns = {
+        'Description': grouped['Description'].to_numpy(dtype=object),
+        'Auditors': grouped['Auditors'].to_numpy(dtype=object),
+        'Manager': grouped['Manager'].to_numpy(dtype=object),
+        'FromDate': format_dates(grouped['FromDate'], date_format),
+        'ToDate': format_dates(grouped['ToDate'], date_format)
+    }
+    units = grouped['Unit'].to_numpy()
+    sections = []
+    for unit_type in UNIT_TYPES:
+        selected = units == unit_type
+        if selected.any():
+            values = zip(*(column[selected].tolist() for column in columns.values()))
+            sections.append((unit_type, [dict(zip(columns, row), Remarks='') for row in values]))
+    return sections
@@ -0,0 +1,237 @@
+from itertools import accumulate
+import pandas as pd
+from fpdf import FPDF
+
+# Programme table geometry, in mm (page width 210mm - 20mm margins = 190mm)
+COLUMN_WIDTHS = [12, 18, 50, 35, 20, 20, 20, 25]
+COLUMN_ALIGNS = ['C', 'C', 'L', 'L', 'C', 'C', 'C', 'L']
+TABLE_LEFT = 10
+
+
+def cell_text(value):
+    """Text of one table cell; missing values (None, NaN) are left blank"""
+    return '' if value is None or pd.isna(value) else str(value)
+
+
+class TableLayout:
+    """Wraps row text with real font metrics and positions cells, separately from drawing.
+
+    Column offsets are computed once, and wrapped lines are cached per
+    (text, width, font), so the many repeated names and dates in a programme
+    are measured only once. A laid-out row knows its height before anything
+    is drawn, which is what page breaks are decided on.
+    """
+
+    def __init__(self, pdf, widths, aligns, font=('Arial', '', 8), line_height=9, padding=2, min_height=12):
+        self.pdf = pdf
+        self.widths = widths
+        self.aligns = aligns
+        self.offsets = [TABLE_LEFT + x for x in accumulate([0] + widths[:-1])]
+        self.font = font
+        self.line_height = line_height
+        self.padding = padding
+        self.min_height = min_height
+        self._wrapped = {}
+
+    def use_font(self):
+        self.pdf.set_font(*self.font)
+
+    def wrap(self, text, width):
+        """Split text into lines no wider than the cell; the table font must be current"""
+        key = (text, width, self.font)
+        lines = self._wrapped.get(key)
+        if lines is not None:
+            return lines
+        measure = self.pdf.get_string_width
+        available = width - 2 * self.padding
+        space = measure(' ')
+        lines = []
+        current, current_width = [], 0.0
+        for word in text.split():
+            word_width = measure(word)
+            if word_width > available:
+                # Break an overlong word into chunks that fit
+                if current:
+                    lines.append(' '.join(current))
+                    current, current_width = [], 0.0
+                chunk = ''
+                for char in word:
+                    if chunk and measure(chunk + char) > available:
+                        lines.append(chunk)
+                        chunk = ''
+                    chunk += char
+                current, current_width = [chunk], measure(chunk)
+                continue
+            needed = word_width if not current else current_width + space + word_width
+            if current and needed > available:
+                lines.append(' '.join(current))
+                current, current_width = [word], word_width
+            else:
+                current.append(word)
+                current_width = needed
+        if current or not lines:
+            lines.append(' '.join(current))
+        lines = self._wrapped[key] = tuple(lines)
+        return lines
+
+    def layout_row(self, values):
+        """Return (height, wrapped lines per cell) for one row of cell texts"""
+        cells = [self.wrap(value, width) for value, width in zip(values, self.widths)]
+        height = max(self.min_height, max(len(lines) for lines in cells) * self.line_height)
+        return height, cells
+
+    def draw_row(self, laid_out, y):
+        """Draw a row laid out by layout_row at y; no measuring happens here"""
+        pdf = self.pdf
+        height, cells = laid_out
+        for lines, x, width, align in zip(cells, self.offsets, self.widths, self.aligns):
+            pdf.rect(x, y, width, height)
+            # Vertically centre the block of lines inside the cell
+            line_y = y + (height - len(lines) * self.line_height) / 2
+            for line in lines:
+                pdf.set_xy(x + self.padding, line_y)
+                pdf.cell(width - 2 * self.padding, self.line_height, line, align=align)
+                line_y += self.line_height
+        pdf.set_xy(TABLE_LEFT, y + height)
+
+
+class PDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.quarter_info = None
+        self.fin_year = None
+        self.header_date = None
+        self._body_layout = None
+
+    def header(self):
+        # Logo
+        self.image('static/logo.png', 10, 8, 20)
+        
+        # Company name under logo (left side)
+        self.set_font('Arial', 'B', 12)
+        self.set_xy(10, 30)
+        self.cell(30, 8, 'XYZ')
+        
+        # Main heading parallel to company name (center-right)
+        self.set_font('Arial', 'B', 14)
+        self.set_xy(70, 30)
+        self.cell(0, 8, 'INTER OFFICE MEMORANDUM', align='C')
+        
+        # Horizontal line after logo and headings
+        self.set_xy(10, 45)
+        self.line(10, 45, 200, 45)
+        
+        # From and Ref parallel (same line)
+        self.set_font('Arial', '', 10)
+        self.set_xy(10, 55)
+        self.cell(80, 8, 'From: IAD')
+        
+        self.set_xy(120, 55)
+        self.cell(0, 8, f'Ref: __/{self.fin_year}/IAD', align='R')
+        
+        # To and Date parallel (same line)
+        self.set_xy(10, 70)
+        self.cell(80, 8, 'To: CS')
+        
+        self.set_xy(120, 70)
+        self.cell(0, 8, f'Date: {self.header_date}', align='R')
+        
+        # Add line under To and Date
+        self.line(10, 78, 200, 78)
+        
+        # Subject line with dynamic quarter
+        self.set_xy(10, 85)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 8, f'AUDIT PROGRAMME FOR THE {self.quarter_info}', ln=1, align='C')
+        
+        self.ln(10)
+
+    def set_header_data(self, fin_year, header_date, quarter_info):
+        self.fin_year = fin_year
+        self.header_date = header_date
+        self.quarter_info = quarter_info
+
+    def table_header(self):
+        # Main table headers with proper widths
+        self.set_font('Arial', 'B', 9)
+        
+        # Column widths - adjusted to fit page width (210mm - 20mm margins = 190mm)
+        widths = [12, 18, 50, 35, 20, 20, 20, 25]  # Total: 200mm
+        
+        # Draw first row of headers
+        start_x = 10
+        start_y = self.get_y()
+        
+        # Draw individual cells for first row
+        headers_row1 = ['Sl', 'Audit Ref', 'UNIT/MODULE', 'AUDITORS', 'AUDIT', 'Audit Period', 'REMARKS']
+        header_widths = [12, 18, 50, 35, 20, 40, 25]  # Audit Period spans 2 columns (20+20=40)
+        
+        for i, (header, width) in enumerate(zip(headers_row1, header_widths)):
+            self.set_xy(start_x + sum(header_widths[:i]), start_y)
+            if i < 5:  # Regular columns
+                self.cell(width, 16, header, border=1, align='C')
+            elif i == 5:  # Audit Period column - only top, left, right borders
+                self.cell(width, 8, header, border=1, align='C')
+            else:  # REMARKS column
+                self.cell(width, 16, header, border=1, align='C')
+        
+        # Draw second row for sub-headers
+        sub_headers = ['No', 'No.', '', '', 'MGR', 'From', 'To', '']
+        
+        for i, (sub_header, width) in enumerate(zip(sub_headers, widths)):
+            self.set_xy(start_x + sum(widths[:i]), start_y + 8)
+            if i < 5:  # First 5 columns get 8px height for second row
+                self.cell(width, 8, sub_header, border=1, align='C')
+            elif i in [5, 6]:  # From and To columns
+                self.cell(width, 8, sub_header, border=1, align='C')
+            else:  # REMARKS column - empty cell for second row
+                self.cell(width, 8, sub_header, border=1, align='C')
+        
+        self.set_xy(start_x, start_y + 16)
+
+    def add_section_header(self, section_name):
+        """Add section headers like 'HO Units', 'Plant Units' etc."""
+        self.set_font('Arial', 'B', 10)
+        self.ln(5)
+        self.cell(0, 8, section_name, ln=1, align='C')
+        self.ln(2)
+
+    def body_layout(self):
+        if self._body_layout is None:
+            self._body_layout = TableLayout(self, COLUMN_WIDTHS, COLUMN_ALIGNS)
+        return self._body_layout
+
+    def row_values(self, index, row, audit_ref_no=''):
+        return [
+            str(index),
+            cell_text(audit_ref_no),
+            cell_text(row['Description']),
+            cell_text(row['Auditors']),
+            cell_text(row['Manager']),
+            cell_text(row['FromDate']),
+            cell_text(row['ToDate']),
+            cell_text(row.get('Remarks', ''))
+        ]
+
+    def layout_rows(self, rows):
+        """Layout pass: measure and wrap every (index, row) once"""
+        layout = self.body_layout()
+        layout.use_font()
+        return [layout.layout_row(self.row_values(index, row)) for index, row in rows]
+
+    def draw_rows(self, laid_out_rows):
+        """Render pass: draw laid-out rows, repeating the table header on each new page"""
+        layout = self.body_layout()
+        layout.use_font()
+        for laid_out in laid_out_rows:
+            if self.get_y() + laid_out[0] > self.page_break_trigger:
+                self.add_page()
+                self.table_header()
+                layout.use_font()
+            layout.draw_row(laid_out, self.get_y())
+
+    def table_row(self, index, row, audit_ref_no=''):
+        layout = self.body_layout()
+        layout.use_font()
+        laid_out = layout.layout_row(self.row_values(index, row, audit_ref_no))
+        self.draw_rows([laid_out])
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import importlib.util
+import pandas as pd
+from config_registry import atomic_write
+
+# pandas needs one of these to read and write Parquet; neither is a core dependency
+PARQUET_ENGINES = ("pyarrow", "fastparquet")
+
+
+def require_parquet_engine():
+    """Fail before any input is read when no Parquet engine is installed"""
+    if not any(importlib.util.find_spec(engine) for engine in PARQUET_ENGINES):
+        raise ImportError("Incremental mode keeps its state in Parquet files and needs pyarrow "
+                          "(pip install pyarrow) or fastparquet")
+
+
+class PunchStateStore:
+    """Processed punch data kept on disk between runs, so each run only reads what is new.
+
+    Layout under `directory`:
+        manifest.json                   bytes of each input file already ingested, the
+                                        current file of each unpartitioned table, run metadata
+        <table>/<YYYY-MM-DD>.parquet    one Parquet file per day of a partitioned table
+        <table>-<run>.parquet           an unpartitioned table as written by one run
+
+    Input files are treated as append-only: a file seen before is read from
+    where the last run stopped. Partitions are written to a temporary name
+    and renamed into place; the manifest is saved last, so an interrupted
+    run is repeated from the same input next time. Every run is identified by
+    the input offsets it starts from (`run`), which an interrupted run and
+    its repeat share: appended rows carry it, so a repeat replaces rather
+    than duplicates them, and unpartitioned tables only take effect with the
+    manifest that names them.
+    """
+
+    def __init__(self, directory):
+        require_parquet_engine()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"files": {}, "meta": {}}
+        self.manifest.setdefault("tables", {})
+        offsets = json.dumps(self.manifest["files"], sort_keys=True).encode("utf-8")
+        self.run = hashlib.sha1(offsets).hexdigest()[:16]
+        self._replaced = []
+
+    @property
+    def meta(self):
+        return self.manifest["meta"]
+
+    # ---- input files ----
+    def new_rows(self, path, chunk_rows, **read_csv_args):
+        """Chunks of the CSV rows added to path since it was last ingested (the whole file the first time)"""
+        offset = self.manifest["files"].get(os.path.abspath(path), 0)
+        size = os.path.getsize(path)
+        if size < offset:
+            raise ValueError(f"{path} is shorter than when it was last ingested; delete {self.directory} to rebuild")
+        if size == offset:
+            return
+
+        names = list(pd.read_csv(path, nrows=0).columns)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            # Past the first run the header is behind us, so the names are given explicitly
+            yield from pd.read_csv(f, header=0 if offset == 0 else None, names=names,
+                                   chunksize=chunk_rows, **read_csv_args)
+
+    def mark_ingested(self, path):
+        self.manifest["files"][os.path.abspath(path)] = os.path.getsize(path)
+
+    def save(self):
+        atomic_write(self._manifest_path, json.dumps(self.manifest, indent=2, sort_keys=True))
+        # Table files of earlier runs are only dropped once the manifest no longer names them
+        for name in self._replaced:
+            path = os.path.join(self.directory, name)
+            if name not in self.manifest["tables"].values() and os.path.exists(path):
+                os.remove(path)
+        self._replaced = []
+
+    # ---- tables ----
+    def _partition_dir(self, table):
+        return os.path.join(self.directory, table)
+
+    def _write_parquet(self, frame, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def days(self, table):
+        """Days that have a partition in table"""
+        folder = self._partition_dir(table)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(pd.Timestamp(name[:-len(".parquet")]) for name in os.listdir(folder) if name.endswith(".parquet"))
+
+    def read(self, table, days=None):
+        """Rows of a partitioned table for the given days (every day when None), or None if there are none"""
+        folder = self._partition_dir(table)
+        days = self.days(table) if days is None else days
+        paths = [os.path.join(folder, f"{pd.Timestamp(day):%Y-%m-%d}.parquet") for day in days]
+        frames = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def write(self, table, frame, day_column):
+        """Replace the partitions of table for every day that has rows in frame"""
+        folder = self._partition_dir(table)
+        os.makedirs(folder, exist_ok=True)
+        for day, rows in frame.groupby(frame[day_column].dt.normalize()):
+            self._write_parquet(rows, os.path.join(folder, f"{day:%Y-%m-%d}.parquet"))
+
+    def append(self, table, frame, day_column):
+        """Add rows to the partitions of their days, tagged with this run in a `run` column.
+
+        Rows an earlier attempt of the same run stored are replaced, while
+        identical rows from different runs (repeated punches) are all kept.
+        """
+        if frame.empty:
+            return
+        frame = frame.assign(run=self.run)
+        stored = self.read(table, frame[day_column].dt.normalize().unique())
+        if stored is not None:
+            frame = pd.concat([stored[stored["run"] != self.run], frame], ignore_index=True)
+        self.write(table, frame, day_column)
+
+    def read_table(self, table):
+        """An unpartitioned table as of the last saved run, or None"""
+        name = self.manifest["tables"].get(table)
+        return pd.read_parquet(os.path.join(self.directory, name)) if name else None
+
+    def write_table(self, table, frame):
+        """Replace an unpartitioned table; the new rows take effect when save() records them"""
+        name = f"{table}-{self.run}.parquet"
+        self._write_parquet(frame, os.path.join(self.directory, name))
+        previous = self.manifest["tables"].get(table)
+        if previous and previous != name:
+            self._replaced.append(previous)
+        self.manifest["tables"][table] = name
@@ -0,0 +1,94 @@
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def content_key(*parts):
+    """Stable hex key for a rendered document built from the given parts"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Rendered files kept on disk by content key, with misses rendered on a worker pool.
+
+    render(path) must write the whole document to `path`. It writes to a
+    temporary name that is renamed into place, so readers never see a partial
+    file. The same key is only ever rendered once at a time.
+    """
+
+    def __init__(self, directory, workers=2, suffix='.pdf', max_files=200):
+        # Absolute, since Flask's send_file resolves relative paths against the app root, not the cwd
+        self.directory = os.path.abspath(directory)
+        self.suffix = suffix
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+        self._lock = threading.Lock()
+        self._jobs = {}      # key -> Future of a render in progress
+        self._failures = {}  # key -> error message of the last failed render
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def lookup(self, key):
+        """Path of the cached file for key, or None"""
+        if not re.fullmatch(r'[0-9a-f]+', key):
+            return None  # keys come from content_key(); anything else may be a crafted path
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def submit(self, key, render):
+        """Start rendering key in the background unless it already is; returns the Future"""
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is None:
+                self._failures.pop(key, None)
+                future = self._jobs[key] = self._executor.submit(self._render, key, render)
+            return future
+
+    def status(self, key):
+        """'done', 'pending', 'failed' (with the error) or None for an unknown key"""
+        if self.lookup(key):
+            return 'done', None
+        with self._lock:
+            if key in self._jobs:
+                return 'pending', None
+            if key in self._failures:
+                return 'failed', self._failures[key]
+        return None, None
+
+    def _render(self, key, render):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+            self._prune()
+            return path
+        except Exception as e:
+            with self._lock:
+                self._failures[key] = str(e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def _prune(self):
+        """Drop the least recently written files beyond max_files"""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(self.suffix)]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,1134 @@
+import os
+import re
+import json
+import bisect
+import math
+import sqlite3
+import threading
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Columns of a request record, in workbook order
+REQUEST_COLUMNS = [
+    'request_id', 'sno', 'request_type', 'description', 'custom_description',
+    'raiser_name', 'raiser_username', 'updates', 'status', 'created_at',
+    'current_admin', 'approval_path', 'last_updated', 'notification_sent', 'version'
+]
+
+# Columns returned by list views; history lives in the event log instead of 'updates'
+SUMMARY_COLUMNS = [col for col in REQUEST_COLUMNS if col != 'updates']
+
+# Columns that GET /api/requests may sort on; sno breaks ties for keyset paging
+SORTABLE_COLUMNS = ['sno', 'created_at', 'last_updated', 'status', 'request_type', 'current_admin']
+
+# Columns of a request history event
+EVENT_COLUMNS = ['event_id', 'request_id', 'event_type', 'actor', 'message', 'created_at']
+
+# Builds each request's search document: its own fields plus all of its history text
+SEARCH_DOCUMENT_SQL = (
+    'INSERT INTO request_search (rowid, request_id, description, custom_description, raiser_name, updates) '
+    'SELECT r.sno, r.request_id, r.description, r.custom_description, r.raiser_name, '
+    "(SELECT group_concat(message, ' ') FROM "
+    '(SELECT message FROM request_events e WHERE e.request_id = r.request_id ORDER BY e.event_id)) '
+    'FROM requests r'
+)
+
+# Legacy 'updates' lines look like "2025-01-31 10:15:00 - <message>"
+LEGACY_UPDATE_LINE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - (.*)$')
+
+
+def legacy_events(request_id, updates):
+    """Split a legacy 'updates' text blob into history events"""
+    events = []
+    for line in str(updates or '').splitlines():
+        if not line.strip():
+            continue
+        match = LEGACY_UPDATE_LINE.match(line.strip())
+        if match:
+            created_at, message = match.groups()
+        elif events:
+            # Continuation of a multi-line update
+            events[-1]['message'] += '\n' + line
+            continue
+        else:
+            created_at, message = '', line.strip()
+        events.append({
+            'request_id': request_id,
+            'event_type': 'legacy',
+            'actor': '',
+            'message': message,
+            'created_at': created_at
+        })
+    return events
+
+
+class VersionConflict(Exception):
+    """Raised when an update's expected version no longer matches the stored row"""
+
+    def __init__(self, current_version):
+        super().__init__(f"Request was modified concurrently (now at version {current_version})")
+        self.current_version = current_version
+
+
+class FileLock:
+    """Exclusive lock on a side file, held across threads and processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._handle = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._handle = open(self.path, 'a+')
+            if fcntl:
+                fcntl.flock(self._handle, fcntl.LOCK_EX)
+            else:
+                self._handle.seek(0)
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_LOCK, 1)
+        except Exception:
+            self._release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._release()
+
+    def _release(self):
+        if self._handle is not None:
+            if fcntl:
+                fcntl.flock(self._handle, fcntl.LOCK_UN)
+            else:
+                self._handle.seek(0)
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
+
+
+class RequestStore:
+    """Storage backend interface used by the request routes"""
+
+    def get(self, request_id):
+        """Return a single request as a dict, or None"""
+        raise NotImplementedError
+
+    def list(self, **filters):
+        """Return every matching summary row (no history) as a list of dicts"""
+        return self.query(**filters)[0]
+
+    def query(self, raiser_username=None, status=None, request_type=None, current_admin=None,
+              created_from=None, created_to=None, sort='sno', limit=None, cursor=None, fields=None):
+        """Return one page of summary rows and the sno cursor of the next page.
+
+        Rows are ordered by `sort` (prefix with '-' for descending) and then
+        sno; `cursor` is the sno of the last row of the previous page. `fields`
+        restricts the returned columns. The next cursor is None on the last page.
+        """
+        raise NotImplementedError
+
+    def create(self, record, events=()):
+        """Insert a new request, and its history events in the same transaction, and return its allocated sno"""
+        raise NotImplementedError
+
+    def update(self, request_id, changes, expected_version=None, events=()):
+        """Apply column changes to one request and return its new version.
+
+        `events` are history entries recorded in the same transaction as the
+        change. If expected_version is given and the stored row has moved on,
+        nothing is written and VersionConflict is raised.
+        """
+        raise NotImplementedError
+
+    def create_many(self, records, events=()):
+        """Insert many requests and their history events in one transaction.
+
+        Returns the allocated snos in the order of `records`.
+        """
+        raise NotImplementedError
+
+    def update_many(self, items):
+        """Apply many updates in one transaction.
+
+        Each item is a dict with request_id, changes and expected_version, plus
+        the history events to record if that update is applied. Returns one
+        result per item: the new version, a VersionConflict, or None when the
+        request does not exist. Failed items are skipped, the rest commit together.
+        """
+        raise NotImplementedError
+
+    def history(self, request_id, cursor=None, limit=50):
+        """Return up to `limit` history events after event_id `cursor`, oldest first"""
+        raise NotImplementedError
+
+    def all_events(self):
+        """Return the full history log as a DataFrame"""
+        raise NotImplementedError
+
+    def search(self, text, raiser_username=None, limit=20, offset=0):
+        """Full-text search over descriptions, raiser names and history.
+
+        Returns (summary rows with a 'score', best first, total matches).
+        Every word must match, as a prefix of an indexed word.
+        """
+        raise NotImplementedError
+
+    def last_event_id(self):
+        """Return the id of the newest history event, 0 if there is none"""
+        raise NotImplementedError
+
+    def events_since(self, event_id, limit=100):
+        """Return events after event_id, oldest first, joined with the request's
+        current raiser_username, current_admin and status"""
+        raise NotImplementedError
+
+    def mark_notified(self, request_ids):
+        """Set notification_sent on requests without bumping their version"""
+        raise NotImplementedError
+
+    def counters(self):
+        """Return the maintained dashboard counters as {dimension: {key: count}}"""
+        raise NotImplementedError
+
+    def reconcile_counters(self):
+        """Rebuild the counters from the stored requests and return any drift.
+
+        Drift is a dict of {(dimension, key): (maintained, actual)} for every
+        counter that disagreed with a full recount.
+        """
+        raise NotImplementedError
+
+    def to_dataframe(self):
+        """Return every request as a DataFrame in workbook column order"""
+        raise NotImplementedError
+
+    def export_xlsx(self, target):
+        """Write all requests and their history to an xlsx file path or buffer"""
+        with pd.ExcelWriter(target) as writer:
+            self.to_dataframe().to_excel(writer, sheet_name='Requests', index=False)
+            self.all_events().to_excel(writer, sheet_name='History', index=False)
+
+    def import_xlsx(self, path):
+        """Load requests from an existing requests.xlsx, returns row count"""
+        raise NotImplementedError
+
+
+def _read_import_workbook(path):
+    """Read requests and their history events from a workbook to import"""
+    sheets = pd.read_excel(path, sheet_name=None)
+    requests_df = next(iter(sheets.values())).reindex(columns=REQUEST_COLUMNS)
+    requests_df = requests_df.astype(object).where(pd.notna(requests_df), None)
+    if 'History' in sheets:
+        events_df = sheets['History'].reindex(columns=EVENT_COLUMNS[1:])
+        events = events_df.astype(object).where(pd.notna(events_df), '').to_dict('records')
+    else:
+        events = []
+        for rec in requests_df.to_dict('records'):
+            events.extend(legacy_events(rec['request_id'], rec['updates']))
+    return requests_df, events
+
+
+# Dashboard counter dimensions: all requests, by status, by type, and open per current_admin
+COUNTER_DIMENSIONS = ['total', 'status', 'type', 'open_admin']
+
+
+def _counter_keys(record):
+    """Return the (dimension, key) counters a request contributes to"""
+    keys = [('total', ''), ('status', record['status'] or ''), ('type', record['request_type'] or '')]
+    if record['status'] == 'Open':
+        keys.append(('open_admin', record['current_admin'] or ''))
+    return keys
+
+
+def _counter_deltas(old, new):
+    """Return the net counter changes for a request going from old to new"""
+    deltas = {}
+    for key in _counter_keys(old) if old else []:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in _counter_keys(new) if new else []:
+        deltas[key] = deltas.get(key, 0) + 1
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _counters_from_frame(df):
+    """Recount every dashboard counter from a frame of requests"""
+    df = df.fillna('')
+    return {
+        'total': {'': len(df)} if len(df) else {},
+        'status': df['status'].value_counts().to_dict(),
+        'type': df['request_type'].value_counts().to_dict(),
+        'open_admin': df.loc[df['status'] == 'Open', 'current_admin'].value_counts().to_dict(),
+    }
+
+
+def _sum_deltas(delta_list):
+    total = {}
+    for deltas in delta_list:
+        for key, delta in deltas.items():
+            total[key] = total.get(key, 0) + delta
+    return {key: delta for key, delta in total.items() if delta}
+
+
+def _counter_drift(maintained, actual):
+    drift = {}
+    for dimension in COUNTER_DIMENSIONS:
+        have, want = maintained.get(dimension, {}), actual.get(dimension, {})
+        for key in set(have) | set(want):
+            if have.get(key, 0) != want.get(key, 0):
+                drift[(dimension, key)] = (have.get(key, 0), want.get(key, 0))
+    return drift
+
+
+def search_tokens(text):
+    """Split text into the lowercase word tokens used by the search index"""
+    return re.findall(r'\w+', str(text or '').lower())
+
+
+def _parse_sort(sort):
+    """Split a sort parameter like '-created_at' into (column, descending)"""
+    descending = sort.startswith('-')
+    column = sort.lstrip('-')
+    if column not in SORTABLE_COLUMNS:
+        raise ValueError(f"Cannot sort by {column}")
+    return column, descending
+
+
+def _check_fields(fields):
+    """Return the projected columns, always keeping sno for the cursor"""
+    if not fields:
+        return SUMMARY_COLUMNS
+    unknown = [field for field in fields if field not in SUMMARY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(['sno'] + list(fields)))
+
+
+def _project(rows, fields):
+    """Drop the sno column again if the caller did not ask for it"""
+    if fields and 'sno' not in fields:
+        for row in rows:
+            row.pop('sno', None)
+    return rows
+
+
+def _clean_record(record):
+    """Normalise a stored row the way fillna('') did for the workbook"""
+    record = {k: ('' if v is None else v) for k, v in record.items()}
+    if 'notification_sent' in record and record['notification_sent'] != '':
+        record['notification_sent'] = bool(record['notification_sent'])
+    return record
+
+
+class SQLiteRequestStore(RequestStore):
+    """SQLite backend in WAL mode with indexes on the lookup columns"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Never reuse a connection inherited across fork (e.g. gunicorn --preload)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS requests (
+                    request_id TEXT PRIMARY KEY,
+                    sno INTEGER NOT NULL UNIQUE,
+                    request_type TEXT,
+                    description TEXT,
+                    custom_description TEXT,
+                    raiser_name TEXT,
+                    raiser_username TEXT,
+                    updates TEXT,
+                    status TEXT,
+                    created_at TEXT,
+                    current_admin TEXT,
+                    approval_path TEXT,
+                    last_updated TEXT,
+                    notification_sent INTEGER DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(requests)')]
+            if 'version' not in columns:
+                conn.execute('ALTER TABLE requests ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_raiser ON requests (raiser_username)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (status)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_admin ON requests (current_admin)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_type ON requests (request_type)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_created ON requests (created_at)')
+            has_events = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_events'"
+            ).fetchone() is not None
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS request_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    request_id TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    actor TEXT,
+                    message TEXT,
+                    created_at TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_events_request ON request_events (request_id, event_id)')
+            has_counters = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_counters'"
+            ).fetchone() is not None
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS request_counters (
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, key)
+                )
+            ''')
+            has_search = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_search'"
+            ).fetchone() is not None
+            # One FTS document per request, rowid = sno, holding its own fields and
+            # all of its history text, so every search token is matched and ranked
+            # against the whole request as the Excel backend's index does
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5(
+                    request_id UNINDEXED, description, custom_description, raiser_name, updates,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            ''')
+            if not has_events:
+                # Move history out of the legacy 'updates' column of existing rows
+                for row in conn.execute("SELECT request_id, updates FROM requests WHERE updates <> ''").fetchall():
+                    self._insert_events(conn, legacy_events(row['request_id'], row['updates']))
+                conn.execute("UPDATE requests SET updates = ''")
+            # Also rebuilds an index left in the older one-row-per-event layout
+            if not has_search or not has_events or (
+                    conn.execute('SELECT COUNT(*) FROM request_search').fetchone()[0]
+                    != conn.execute('SELECT COUNT(*) FROM requests').fetchone()[0]):
+                self._rebuild_search(conn)
+            if not has_counters:
+                self._write_counters(conn, self._recount(conn))
+
+    def _insert_events(self, conn, events):
+        conn.executemany(
+            'INSERT INTO request_events (request_id, event_type, actor, message, created_at) VALUES (?, ?, ?, ?, ?)',
+            [(ev['request_id'], ev['event_type'], ev['actor'], ev['message'], ev['created_at']) for ev in events]
+        )
+
+    def _index_requests(self, conn, request_ids):
+        """Replace the search documents of the given requests with their current fields and history"""
+        request_ids = [(request_id,) for request_id in set(request_ids)]
+        conn.executemany(
+            'DELETE FROM request_search WHERE rowid = (SELECT sno FROM requests WHERE request_id = ?)', request_ids
+        )
+        conn.executemany(SEARCH_DOCUMENT_SQL + ' WHERE r.request_id = ?', request_ids)
+
+    def _rebuild_search(self, conn):
+        conn.execute('DELETE FROM request_search')
+        conn.execute(SEARCH_DOCUMENT_SQL)
+
+    def _bump_counters(self, conn, deltas):
+        conn.executemany(
+            'INSERT INTO request_counters (dimension, key, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count',
+            [(dimension, key, delta) for (dimension, key), delta in deltas.items()]
+        )
+
+    def _recount(self, conn):
+        queries = {
+            'total': "SELECT '', COUNT(*) FROM requests HAVING COUNT(*) > 0",
+            'status': "SELECT COALESCE(status, ''), COUNT(*) FROM requests GROUP BY 1",
+            'type': "SELECT COALESCE(request_type, ''), COUNT(*) FROM requests GROUP BY 1",
+            'open_admin': "SELECT COALESCE(current_admin, ''), COUNT(*) FROM requests WHERE status = 'Open' GROUP BY 1",
+        }
+        return {dimension: dict(conn.execute(sql).fetchall()) for dimension, sql in queries.items()}
+
+    def _write_counters(self, conn, counters):
+        conn.execute('DELETE FROM request_counters')
+        conn.executemany(
+            'INSERT INTO request_counters (dimension, key, count) VALUES (?, ?, ?)',
+            [(dimension, key, count) for dimension, counts in counters.items() for key, count in counts.items()]
+        )
+
+    def _read_counters(self, conn):
+        counters = {dimension: {} for dimension in COUNTER_DIMENSIONS}
+        for row in conn.execute('SELECT dimension, key, count FROM request_counters WHERE count <> 0'):
+            counters.setdefault(row['dimension'], {})[row['key']] = row['count']
+        return counters
+
+    def counters(self):
+        return self._read_counters(self._connect())
+
+    def reconcile_counters(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            actual = self._recount(conn)
+            drift = _counter_drift(self._read_counters(conn), actual)
+            if drift:
+                self._write_counters(conn, actual)
+        return drift
+
+    def is_empty(self):
+        return self._connect().execute('SELECT 1 FROM requests LIMIT 1').fetchone() is None
+
+    def get(self, request_id):
+        row = self._connect().execute(
+            'SELECT * FROM requests WHERE request_id = ?', (request_id,)
+        ).fetchone()
+        return _clean_record(dict(row)) if row else None
+
+    def query(self, raiser_username=None, status=None, request_type=None, current_admin=None,
+              created_from=None, created_to=None, sort='sno', limit=None, cursor=None, fields=None):
+        sort_col, descending = _parse_sort(sort)
+        columns = _check_fields(fields)
+        clauses, params = [], []
+        for column, value in [('raiser_username', raiser_username), ('status', status),
+                              ('request_type', request_type), ('current_admin', current_admin)]:
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if created_from is not None:
+            clauses.append('created_at >= ?')
+            params.append(created_from)
+        if created_to is not None:
+            clauses.append('created_at <= ?')
+            params.append(created_to)
+        op = '<' if descending else '>'
+        # NULL compares as unknown in a row value, so empty sort values page as ''
+        sort_key = 'sno' if sort_col == 'sno' else f"COALESCE({sort_col}, '')"
+        if cursor is not None:
+            if sort_col == 'sno':
+                clauses.append(f'sno {op} ?')
+                params.append(cursor)
+            else:
+                clauses.append(f'({sort_key}, sno) {op} ((SELECT {sort_key} FROM requests WHERE sno = ?), ?)')
+                params.extend([cursor, cursor])
+        query = f'SELECT {", ".join(columns)} FROM requests'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        order = 'DESC' if descending else 'ASC'
+        query += f' ORDER BY {sort_key} {order}, sno {order}'
+        if limit is not None:
+            # Fetch one extra row to know whether another page follows
+            query += ' LIMIT ?'
+            params.append(limit + 1)
+        rows = [_clean_record(dict(row)) for row in self._connect().execute(query, params)]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['sno']
+        return _project(rows, fields), next_cursor
+
+    def create(self, record, events=()):
+        record = {col: record.get(col) for col in REQUEST_COLUMNS if col != 'sno'}
+        record['version'] = 1
+        columns = ', '.join(record)
+        placeholders = ', '.join('?' for _ in record)
+        conn = self._connect()
+        with conn:
+            # The write lock is held from MAX(sno) to the INSERT, so concurrent
+            # writers in any process never share a serial number
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                f'INSERT INTO requests (sno, {columns}) '
+                f'SELECT COALESCE(MAX(sno), 0) + 1, {placeholders} FROM requests',
+                list(record.values())
+            )
+            row = conn.execute(
+                'SELECT sno FROM requests WHERE request_id = ?', (record['request_id'],)
+            ).fetchone()
+            self._bump_counters(conn, _counter_deltas(None, record))
+            self._insert_events(conn, events)
+            self._index_requests(conn, [record['request_id']])
+        return row['sno']
+
+    def update(self, request_id, changes, expected_version=None, events=()):
+        changes = {col: val for col, val in changes.items()
+                   if col in REQUEST_COLUMNS and col not in ('request_id', 'version')}
+        assignments = ''.join(f'{col} = ?, ' for col in changes)
+        conn = self._connect()
+        with conn:
+            # Take the write lock up front so the version check and counter deltas
+            # see exactly the row we replace
+            conn.execute('BEGIN IMMEDIATE')
+            old = conn.execute(
+                'SELECT status, request_type, current_admin, version FROM requests WHERE request_id = ?',
+                (request_id,)
+            ).fetchone()
+            if old is None:
+                return None
+            if expected_version is not None and old['version'] != expected_version:
+                raise VersionConflict(old['version'])
+            conn.execute(
+                f'UPDATE requests SET {assignments}version = version + 1 WHERE request_id = ?',
+                list(changes.values()) + [request_id]
+            )
+            old = dict(old)
+            new = dict(old, **{col: changes[col] for col in old if col in changes})
+            self._bump_counters(conn, _counter_deltas(old, new))
+            self._insert_events(conn, events)
+            self._index_requests(conn, [request_id])
+        return old['version'] + 1
+
+    def create_many(self, records, events=()):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            first_sno = conn.execute('SELECT COALESCE(MAX(sno), 0) + 1 FROM requests').fetchone()[0]
+            rows = [dict({col: record.get(col) for col in REQUEST_COLUMNS}, sno=first_sno + offset, version=1)
+                    for offset, record in enumerate(records)]
+            placeholders = ', '.join('?' for _ in REQUEST_COLUMNS)
+            conn.executemany(
+                f'INSERT INTO requests ({", ".join(REQUEST_COLUMNS)}) VALUES ({placeholders})',
+                [[row[col] for col in REQUEST_COLUMNS] for row in rows]
+            )
+            self._bump_counters(conn, _sum_deltas(_counter_deltas(None, row) for row in rows))
+            self._insert_events(conn, events)
+            self._index_requests(conn, [row['request_id'] for row in rows])
+        return [row['sno'] for row in rows]
+
+    def update_many(self, items):
+        results = []
+        deltas = []
+        updated = []
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for item in items:
+                old = conn.execute(
+                    'SELECT status, request_type, current_admin, version FROM requests WHERE request_id = ?',
+                    (item['request_id'],)
+                ).fetchone()
+                if old is None:
+                    results.append(None)
+                    continue
+                if item.get('expected_version') is not None and old['version'] != item['expected_version']:
+                    results.append(VersionConflict(old['version']))
+                    continue
+                changes = {col: val for col, val in item['changes'].items()
+                           if col in REQUEST_COLUMNS and col not in ('request_id', 'version')}
+                assignments = ''.join(f'{col} = ?, ' for col in changes)
+                conn.execute(
+                    f'UPDATE requests SET {assignments}version = version + 1 WHERE request_id = ?',
+                    list(changes.values()) + [item['request_id']]
+                )
+                old = dict(old)
+                new = dict(old, **{col: changes[col] for col in old if col in changes})
+                deltas.append(_counter_deltas(old, new))
+                self._insert_events(conn, item.get('events', []))
+                updated.append(item['request_id'])
+                results.append(old['version'] + 1)
+            self._bump_counters(conn, _sum_deltas(deltas))
+            self._index_requests(conn, updated)
+        return results
+
+    def history(self, request_id, cursor=None, limit=50):
+        rows = self._connect().execute(
+            f'SELECT {", ".join(EVENT_COLUMNS)} FROM request_events '
+            'WHERE request_id = ? AND event_id > ? ORDER BY event_id LIMIT ?',
+            (request_id, cursor or 0, limit)
+        )
+        return [_clean_record(dict(row)) for row in rows]
+
+    def all_events(self):
+        return pd.read_sql_query(
+            f'SELECT {", ".join(EVENT_COLUMNS)} FROM request_events ORDER BY event_id', self._connect()
+        )
+
+    def search(self, text, raiser_username=None, limit=20, offset=0):
+        tokens = search_tokens(text)
+        if not tokens:
+            return [], 0
+        # Quote every token so user input can never be parsed as FTS syntax
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        matched = (
+            'SELECT request_id, bm25(request_search, 0, 3.0, 2.0, 2.0, 1.0) AS score '
+            'FROM request_search WHERE request_search MATCH ?'
+        )
+        where, params = '', [match]
+        if raiser_username is not None:
+            where = ' WHERE r.raiser_username = ?'
+            params.append(raiser_username)
+        conn = self._connect()
+        total = conn.execute(
+            f'SELECT COUNT(*) FROM ({matched}) m JOIN requests r ON r.request_id = m.request_id{where}', params
+        ).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT {", ".join("r." + col for col in SUMMARY_COLUMNS)}, -m.score AS score '
+            f'FROM ({matched}) m JOIN requests r ON r.request_id = m.request_id{where} '
+            'ORDER BY m.score, r.sno LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        )
+        return [_clean_record(dict(row)) for row in rows], total
+
+    def last_event_id(self):
+        return self._connect().execute('SELECT COALESCE(MAX(event_id), 0) FROM request_events').fetchone()[0]
+
+    def events_since(self, event_id, limit=100):
+        rows = self._connect().execute(
+            'SELECT e.event_id, e.request_id, e.event_type, e.actor, e.message, e.created_at, '
+            'r.sno, r.raiser_username, r.current_admin, r.status '
+            'FROM request_events e JOIN requests r ON r.request_id = e.request_id '
+            'WHERE e.event_id > ? ORDER BY e.event_id LIMIT ?',
+            (event_id, limit)
+        )
+        return [_clean_record(dict(row)) for row in rows]
+
+    def mark_notified(self, request_ids):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'UPDATE requests SET notification_sent = 1 WHERE request_id = ? AND notification_sent = 0',
+                [(request_id,) for request_id in set(request_ids)]
+            )
+
+    def to_dataframe(self):
+        df = pd.read_sql_query('SELECT * FROM requests ORDER BY sno', self._connect())
+        df['notification_sent'] = df['notification_sent'].astype(bool)
+        return df[REQUEST_COLUMNS]
+
+    def import_xlsx(self, path):
+        df, events = _read_import_workbook(path)
+        df['updates'] = ''
+        df['notification_sent'] = df['notification_sent'].map(lambda v: int(bool(v)) if v is not None else 0)
+        df['version'] = df['version'].map(lambda v: int(v) if v is not None else 1)
+        records = df.to_dict('records')
+        placeholders = ', '.join('?' for _ in REQUEST_COLUMNS)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f'INSERT OR IGNORE INTO requests ({", ".join(REQUEST_COLUMNS)}) VALUES ({placeholders})',
+                [[rec[col] for col in REQUEST_COLUMNS] for rec in records]
+            )
+            conn.executemany(
+                'INSERT INTO request_events (request_id, event_type, actor, message, created_at) VALUES (?, ?, ?, ?, ?)',
+                [(ev['request_id'], ev['event_type'], ev['actor'], ev['message'], ev['created_at']) for ev in events]
+            )
+            self._write_counters(conn, self._recount(conn))
+            self._rebuild_search(conn)
+        return len(records)
+
+
+class ExcelRequestStore(RequestStore):
+    """Legacy backend that keeps every request in a single xlsx workbook.
+
+    The parsed sheet is cached in memory and only re-read when the file's
+    mtime or size changes on disk; writes from this process replace the
+    cached frame directly. Callers must treat the cached frame as read-only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal = EventJournal(os.path.splitext(path)[0] + '_history.jsonl')
+        self._lock = threading.RLock()
+        # Serialises read-modify-write cycles across worker processes
+        self._file_lock = FileLock(path + '.lock')
+        self._cache = None
+        self._cache_key = None
+        self._counters = None
+        self._search_index = None
+        if not os.path.exists(path):
+            pd.DataFrame(columns=REQUEST_COLUMNS).to_excel(path, index=False)
+
+    def _file_key(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        with self._lock:
+            key = self._file_key()
+            if self._cache is None or key != self._cache_key:
+                self._cache = pd.read_excel(self.path)
+                self._cache_key = key
+                # Changed on disk by someone else: recount on next dashboard read
+                self._counters = None
+            return self._cache
+
+    def _write(self, df):
+        with self._lock:
+            # Write beside the workbook and swap it in, so readers never see a partial file
+            tmp_path = self.path + '.tmp.xlsx'
+            df.to_excel(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+            self._cache = df
+            self._cache_key = self._file_key()
+
+    def get(self, request_id):
+        df = self._read()
+        match = df[df['request_id'] == request_id]
+        if match.empty:
+            return None
+        return _clean_record(match.astype(object).where(match.notna(), None).to_dict('records')[0])
+
+    def query(self, raiser_username=None, status=None, request_type=None, current_admin=None,
+              created_from=None, created_to=None, sort='sno', limit=None, cursor=None, fields=None):
+        sort_col, descending = _parse_sort(sort)
+        columns = _check_fields(fields)
+        df = self._read()
+        for column, value in [('raiser_username', raiser_username), ('status', status),
+                              ('request_type', request_type), ('current_admin', current_admin)]:
+            if value is not None:
+                df = df[df[column] == value]
+        if created_from is not None:
+            df = df[df['created_at'].astype(str) >= created_from]
+        if created_to is not None:
+            df = df[df['created_at'].astype(str) <= created_to]
+        # Empty sort values page as '', like the SQLite backend
+        key = df['sno'] if sort_col == 'sno' else df[sort_col].fillna('').astype(str)
+        df = df.assign(sort_key=key).sort_values(['sort_key', 'sno'], ascending=not descending, kind='mergesort')
+        if cursor is not None:
+            anchor = df.loc[df['sno'] == cursor, 'sort_key']
+            if anchor.empty and sort_col != 'sno':
+                df = df.iloc[0:0]
+            else:
+                value = cursor if sort_col == 'sno' else anchor.iloc[0]
+                key = df['sort_key']
+                if descending:
+                    df = df[(key < value) | ((key == value) & (df['sno'] < cursor))]
+                else:
+                    df = df[(key > value) | ((key == value) & (df['sno'] > cursor))]
+        next_cursor = None
+        if limit is not None:
+            if len(df) > limit:
+                next_cursor = int(df['sno'].iloc[limit - 1])
+            df = df.head(limit)
+        rows = df.reindex(columns=columns).fillna('').to_dict('records')
+        return _project(rows, fields), next_cursor
+
+    def create(self, record, events=()):
+        with self._lock, self._file_lock:
+            df = self._read()
+            new_sno = int(df['sno'].max()) + 1 if not df.empty else 1
+            record = dict(record, sno=new_sno, version=1)
+            df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+            self._write(df)
+            self._bump_counters(_counter_deltas(None, record))
+        self.journal.append_many(events)
+        return new_sno
+
+    def update(self, request_id, changes, expected_version=None, events=()):
+        with self._lock, self._file_lock:
+            # Copy so concurrent readers of the cached frame never see a partial update
+            df = self._read().copy()
+            matches = df.index[df['request_id'] == request_id].tolist()
+            if not matches:
+                return None
+            idx = matches[0]
+            current_version = df.at[idx, 'version'] if 'version' in df else None
+            current_version = 1 if pd.isna(current_version) else int(current_version)
+            if expected_version is not None and current_version != expected_version:
+                raise VersionConflict(current_version)
+            old = {col: df.at[idx, col] for col in ['status', 'request_type', 'current_admin']}
+            for col, val in changes.items():
+                df.at[idx, col] = val
+            df.at[idx, 'version'] = current_version + 1
+            self._write(df)
+            new = {col: df.at[idx, col] for col in old}
+            self._bump_counters(_counter_deltas(old, new))
+        self.journal.append_many(events)
+        return current_version + 1
+
+    def create_many(self, records, events=()):
+        with self._lock, self._file_lock:
+            df = self._read()
+            first_sno = int(df['sno'].max()) + 1 if not df.empty else 1
+            rows = [dict(record, sno=first_sno + offset, version=1) for offset, record in enumerate(records)]
+            df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+            self._write(df)
+            self._bump_counters(_sum_deltas(_counter_deltas(None, row) for row in rows))
+        self.journal.append_many(events)
+        return [row['sno'] for row in rows]
+
+    def update_many(self, items):
+        results = []
+        deltas = []
+        events = []
+        with self._lock, self._file_lock:
+            df = self._read().copy()
+            if 'version' not in df:
+                df['version'] = 1
+            positions = {request_id: idx for idx, request_id in zip(df.index, df['request_id'])}
+            for item in items:
+                idx = positions.get(item['request_id'])
+                if idx is None:
+                    results.append(None)
+                    continue
+                current_version = df.at[idx, 'version']
+                current_version = 1 if pd.isna(current_version) else int(current_version)
+                if item.get('expected_version') is not None and current_version != item['expected_version']:
+                    results.append(VersionConflict(current_version))
+                    continue
+                old = {col: df.at[idx, col] for col in ['status', 'request_type', 'current_admin']}
+                for col, val in item['changes'].items():
+                    df.at[idx, col] = val
+                df.at[idx, 'version'] = current_version + 1
+                deltas.append(_counter_deltas(old, {col: df.at[idx, col] for col in old}))
+                events.extend(item.get('events', []))
+                results.append(current_version + 1)
+            if deltas:
+                self._write(df)
+                self._bump_counters(_sum_deltas(deltas))
+        self.journal.append_many(events)
+        return results
+
+    def _bump_counters(self, deltas):
+        if self._counters is None:
+            return
+        for (dimension, key), delta in deltas.items():
+            counts = self._counters.setdefault(dimension, {})
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+
+    def counters(self):
+        with self._lock:
+            df = self._read()
+            if self._counters is None:
+                self._counters = _counters_from_frame(df)
+            return {dimension: dict(counts) for dimension, counts in self._counters.items()}
+
+    def reconcile_counters(self):
+        with self._lock:
+            df = self._read()
+            actual = _counters_from_frame(df)
+            drift = _counter_drift(self._counters or {}, actual) if self._counters is not None else {}
+            self._counters = actual
+        return drift
+
+    def history(self, request_id, cursor=None, limit=50):
+        return self.journal.history(request_id, cursor, limit)
+
+    def all_events(self):
+        return self.journal.to_dataframe()
+
+    def search(self, text, raiser_username=None, limit=20, offset=0):
+        with self._lock:
+            df = self._read()
+            index = self._search_index
+            if index is None or index.frame_rows > len(df):
+                # Workbook was replaced, not appended to: start a fresh index
+                index = self._search_index = SearchIndex()
+            # Request rows are append-only and events have increasing ids, so
+            # catching up only ever indexes what is new since the last search
+            for rec in df.iloc[index.frame_rows:].to_dict('records'):
+                index.add(rec['request_id'], [
+                    (rec.get('description'), 3.0), (rec.get('custom_description'), 2.0), (rec.get('raiser_name'), 2.0)
+                ])
+            index.frame_rows = len(df)
+            for event in self.journal.events_since(index.last_event_id, limit=None):
+                index.add(event['request_id'], [(event['message'], 1.0)])
+                index.last_event_id = event['event_id']
+            scores = index.search(search_tokens(text))
+        if not scores:
+            return [], 0
+        hits = df[df['request_id'].isin(scores.keys())]
+        if raiser_username is not None:
+            hits = hits[hits['raiser_username'] == raiser_username]
+        hits = hits.reindex(columns=SUMMARY_COLUMNS).fillna('')
+        hits['score'] = hits['request_id'].map(scores)
+        hits = hits.sort_values(['score', 'sno'], ascending=[False, True], kind='mergesort')
+        return hits.iloc[offset:offset + limit].to_dict('records'), len(hits)
+
+    def last_event_id(self):
+        return self.journal.last_event_id()
+
+    def events_since(self, event_id, limit=100):
+        events = self.journal.events_since(event_id, limit)
+        if not events:
+            return []
+        df = self._read()
+        rows = df[df['request_id'].isin({ev['request_id'] for ev in events})]
+        rows = rows.set_index('request_id')[['sno', 'raiser_username', 'current_admin', 'status']]
+        rows = rows.astype(object).where(rows.notna(), '').to_dict('index')
+        return [dict(ev, **rows[ev['request_id']]) for ev in events if ev['request_id'] in rows]
+
+    def mark_notified(self, request_ids):
+        with self._lock, self._file_lock:
+            df = self._read()
+            mask = df['request_id'].isin(set(request_ids)) & ~df['notification_sent'].fillna(False).astype(bool)
+            if mask.any():
+                df = df.copy()
+                df.loc[mask, 'notification_sent'] = True
+                self._write(df)
+
+    def to_dataframe(self):
+        return self._read().reindex(columns=REQUEST_COLUMNS)
+
+    def import_xlsx(self, path):
+        df, events = _read_import_workbook(path)
+        df['updates'] = ''
+        df['version'] = df['version'].fillna(1)
+        with self._lock, self._file_lock:
+            self._write(df)
+        self.journal.append_many(events)
+        return len(df)
+
+
+class SearchIndex:
+    """In-process inverted index with BM25 ranking, used by the excel backend.
+
+    Each request is one document made of its own fields plus all of its
+    history messages; fields carry a weight that scales their term counts.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}     # term -> {request_id: weighted term frequency}
+        self.doc_lengths = {}  # request_id -> weighted token count
+        self.total_length = 0.0
+        self.terms = []        # sorted vocabulary for prefix lookups
+        self._terms_dirty = False
+        self.frame_rows = 0
+        self.last_event_id = 0
+
+    def add(self, request_id, weighted_texts):
+        for text, weight in weighted_texts:
+            for token in search_tokens(text):
+                docs = self.postings.get(token)
+                if docs is None:
+                    docs = self.postings[token] = {}
+                    self._terms_dirty = True
+                docs[request_id] = docs.get(request_id, 0.0) + weight
+                self.doc_lengths[request_id] = self.doc_lengths.get(request_id, 0.0) + weight
+                self.total_length += weight
+
+    def _expand(self, prefix):
+        if self._terms_dirty:
+            self.terms = sorted(self.postings)
+            self._terms_dirty = False
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:end]
+
+    def search(self, tokens):
+        """Return {request_id: score} for documents matching every token as a prefix"""
+        if not tokens or not self.doc_lengths:
+            return {}
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for term in self._expand(token):
+                docs = self.postings[term]
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for request_id, tf in docs.items():
+                    norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[request_id] / avg_length)
+                    token_scores[request_id] = token_scores.get(request_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {rid: score + token_scores[rid] for rid, score in scores.items() if rid in token_scores}
+            if not scores:
+                return {}
+        return scores
+
+
+class EventJournal:
+    """Append-only JSON-lines log of request history events.
+
+    Only bytes appended since the last read are parsed, so both appends and
+    history lookups stay cheap as the journal grows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path + '.lock')
+        self._offset = 0
+        self._last_id = 0
+        self._by_request = {}
+        self._events = []
+        self._event_ids = []
+
+    def _refresh(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size < self._offset:
+            # Journal was replaced, start over
+            self._offset, self._last_id, self._by_request = 0, 0, {}
+            self._events, self._event_ids = [], []
+        if size == self._offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        complete = data.rfind(b'\n') + 1
+        for line in data[:complete].splitlines():
+            if line.strip():
+                self._index(json.loads(line))
+        self._offset += complete
+
+    def _index(self, event):
+        self._last_id = max(self._last_id, event['event_id'])
+        self._by_request.setdefault(event['request_id'], []).append(event)
+        self._events.append(event)
+        self._event_ids.append(event['event_id'])
+
+    def append_many(self, events):
+        if not events:
+            return
+        # Other processes may append too; the file lock keeps event ids unique
+        with self._lock, self._file_lock:
+            self._refresh()
+            events = [dict(event, event_id=self._last_id + offset) for offset, event in enumerate(events, 1)]
+            data = ''.join(json.dumps(event) + '\n' for event in events).encode('utf-8')
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._offset += len(data)
+            for event in events:
+                self._index(event)
+
+    def history(self, request_id, cursor=None, limit=50):
+        with self._lock:
+            self._refresh()
+            events = self._by_request.get(request_id, [])
+        cursor = cursor or 0
+        return [ev for ev in events if ev['event_id'] > cursor][:limit]
+
+    def last_event_id(self):
+        with self._lock:
+            self._refresh()
+            return self._last_id
+
+    def events_since(self, event_id, limit=100):
+        with self._lock:
+            self._refresh()
+            # Ids are appended in increasing order, so bisect for the first newer event
+            start = bisect.bisect_right(self._event_ids, event_id)
+            return self._events[start:start + limit] if limit is not None else self._events[start:]
+
+    def to_dataframe(self):
+        with self._lock:
+            self._refresh()
+            events = list(self._events)
+        return pd.DataFrame(events, columns=EVENT_COLUMNS)
+
+
+def open_store(backend, path):
+    """Return the storage backend configured for the request routes"""
+    if backend == 'sqlite':
+        return SQLiteRequestStore(path)
+    if backend == 'excel':
+        return ExcelRequestStore(path)
+    raise ValueError(f"Unknown request store backend: {backend}")
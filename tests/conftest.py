@@ -0,0 +1,47 @@
+import os
+import sys
+
+# The modules under test live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def main_module(tmp_path_factory):
+    """main.py imported inside a scratch directory, since it keeps its files relative to the cwd"""
+    folder = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        import main
+        yield main
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(params=['sqlite', 'excel'])
+def app(request, main_module, tmp_path, monkeypatch):
+    """main.py with a fresh request store of each backend"""
+    path = tmp_path / ('requests.db' if request.param == 'sqlite' else 'requests.xlsx')
+    monkeypatch.setattr(main_module, 'store', main_module.open_store(request.param, str(path)))
+    return main_module
+
+
+def login(client, username, role):
+    with client.session_transaction() as session:
+        session['user'] = username
+        session['role'] = role
+
+
+@pytest.fixture(scope='session')
+def new_module(tmp_path_factory):
+    """new.py imported inside a scratch directory, since it creates its workbook and database there"""
+    folder = tmp_path_factory.mktemp('allocations')
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        import new
+        yield new
+    finally:
+        os.chdir(cwd)
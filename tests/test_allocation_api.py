@@ -0,0 +1,171 @@
+import struct
+import threading
+import zlib
+from datetime import date
+
+import flask
+import pytest
+from openpyxl import Workbook
+from allocation_store import ALLOCATION_HEADERS, MEMBER_HEADERS, AllocationStore
+from render_cache import RenderCache
+
+
+@pytest.fixture
+def allocations(new_module, tmp_path, monkeypatch):
+    """new.py with a fresh allocation store holding three members and no allocations"""
+    wb = Workbook()
+    wb.active.title = 'Members'
+    wb.active.append(MEMBER_HEADERS)
+    for member_id in (1, 2, 3):
+        wb.active.append([member_id, f'Member {member_id}', '', 'Audit'])
+    wb.create_sheet('Allocations').append(ALLOCATION_HEADERS)
+    wb.save(tmp_path / 'seed.xlsx')
+    store = AllocationStore(str(tmp_path / 'allocations.db'))
+    store.import_xlsx(str(tmp_path / 'seed.xlsx'))
+    monkeypatch.setattr(new_module, 'store', store)
+    return new_module
+
+
+def call(module, view, body):
+    # The allocation routes are registered on the first of new.py's two apps,
+    # which the second one shadows, so the views are called directly
+    with module.app.test_request_context(method='POST', json=body):
+        response = flask.make_response(view())
+        return response.status_code, response.get_json()
+
+
+def plan_body(**extra):
+    body = {
+        'memberIds': [1, 2, 3],
+        'audits': [
+            {'description': 'Stock audit', 'section': 'HO', 'duration': 3, 'headcount': 2,
+             'earliestDate': '2031-06-02', 'latestDate': '2031-06-30'},
+            {'description': 'Branch audit', 'section': 'HO', 'duration': 2, 'headcount': 2,
+             'earliestDate': '2031-06-02', 'latestDate': '2031-06-30'},
+        ],
+    }
+    body.update(extra)
+    return body
+
+
+def booked(module, day):
+    return {member_id for member_id in (1, 2, 3) if not module.store.snapshot().index.is_available(member_id, day, day)}
+
+
+def test_plan_rejects_bad_holiday(allocations):
+    status, body = call(allocations, allocations.plan_allocations, plan_body(holidays=['2031-13-40']))
+    assert status == 400
+    assert 'error' in body
+
+
+def test_dry_run_plan_writes_nothing(allocations):
+    before = len(allocations.store.snapshot().allocations)
+    status, body = call(allocations, allocations.plan_allocations, plan_body(dryRun=True))
+    assert status == 200
+    assert body['committed'] is False
+    assert [p['description'] for p in body['planned']] == ['Stock audit', 'Branch audit']
+    assert all(len(p['memberIds']) == 2 for p in body['planned'])
+    assert len(allocations.store.snapshot().allocations) == before
+
+
+def test_plan_commit_books_every_member(allocations):
+    status, body = call(allocations, allocations.plan_allocations, plan_body())
+    assert status == 200
+    assert body['committed'] is True
+    assert len(body['allocationIds']) == 4
+    for p in body['planned']:
+        assert booked(allocations, date.fromisoformat(p['fromDate'])) >= set(p['memberIds'])
+    # Planning the same batch again works around the first booking
+    status, again = call(allocations, allocations.plan_allocations, plan_body(dryRun=True))
+    assert [p['fromDate'] for p in again['planned']] != [p['fromDate'] for p in body['planned']]
+
+
+def test_out_of_date_plan_writes_nothing(allocations, monkeypatch):
+    plan_batch = allocations.plan_batch
+
+    def plan_then_book(*args, **kwargs):
+        planned, unplaceable = plan_batch(*args, **kwargs)
+        # Another request books a planned member before this plan is committed
+        first = planned[0]
+        allocations.store.create(first['members'][0], 'Walk-in', 'HO', first['start'], first['end'])
+        return planned, unplaceable
+
+    monkeypatch.setattr(allocations, 'plan_batch', plan_then_book)
+    before = len(allocations.store.snapshot().allocations)
+    status, body = call(allocations, allocations.plan_allocations, plan_body())
+    assert status == 409
+    assert body['committed'] is False
+    assert len(allocations.store.snapshot().allocations) == before + 1
+
+
+def white_png(size=4):
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\0' + b'\xff' * 3 * size for _ in range(size))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+@pytest.fixture
+def programme(new_module, tmp_path, monkeypatch):
+    """new.py's PDF app over a small workbook in a scratch directory, with an empty render cache"""
+    monkeypatch.chdir(tmp_path)
+    wb = Workbook()
+    wb.active.title = 'Members'
+    wb.active.append(MEMBER_HEADERS)
+    wb.active.append([1, 'Asha Rao', '', 'Audit'])
+    allocations = wb.create_sheet('Allocations')
+    allocations.append(ALLOCATION_HEADERS)
+    allocations.append([1, 1, 'HO-Finance', 'HO', '2025-05-01', '2025-05-09', '2025-2026'])
+    wb.save(new_module.DB_FILE)
+    (tmp_path / new_module.MANAGER_FILE).write_text('Asha Rao\n')
+    (tmp_path / 'static').mkdir()
+    (tmp_path / 'static' / 'logo.png').write_bytes(white_png())
+    monkeypatch.setattr(new_module, 'pdf_renders', RenderCache(str(tmp_path / 'pdf_cache')))
+    return new_module
+
+
+def test_programme_pdf_is_cached_with_an_etag(programme):
+    client = programme.app.test_client()
+    url = '/generate-pdf?financialYear=2025-2026'
+    first = client.post(url, json={'headerDate': '01-04-2025'})
+    assert first.status_code == 200
+    assert first.mimetype == 'application/pdf'
+    assert first.data.startswith(b'%PDF')
+    etag = first.headers['ETag'].strip('"')
+
+    # Same content: no render, and a client holding the file gets 304 on POST and GET
+    assert client.post(url, json={'headerDate': '01-04-2025'}, headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    download = f'/generate-pdf/jobs/{etag}/download?financialYear=2025-2026'
+    assert client.get(download, headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    assert client.get(f'/generate-pdf/jobs/{etag}').get_json()['status'] == 'done'
+
+    # Another header date is another document
+    other = client.post(url, json={'headerDate': '02-04-2025'})
+    assert other.headers['ETag'].strip('"') != etag
+
+
+def test_slow_programme_pdf_becomes_a_job(programme, monkeypatch):
+    release = threading.Event()
+    render = programme.render_programme
+
+    def slow_render(*args):
+        release.wait(5)
+        render(*args)
+
+    monkeypatch.setattr(programme, 'render_programme', slow_render)
+    monkeypatch.setattr(programme, 'PDF_INLINE_WAIT_SECONDS', 0.01)
+    client = programme.app.test_client()
+    response = client.post('/generate-pdf?financialYear=2025-2026', json={'headerDate': '01-04-2025'})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status'] == 'pending'
+    assert 'downloadUrl' not in job
+    assert client.get(job['statusUrl']).get_json()['status'] == 'pending'
+
+    release.set()
+    programme.pdf_renders.submit(job['jobId'], None).result(5)
+    done = client.get(job['statusUrl']).get_json()
+    assert done['status'] == 'done'
+    assert client.get(done['downloadUrl']).data.startswith(b'%PDF')
+    assert client.get('/generate-pdf/jobs/0123abcd').status_code == 404
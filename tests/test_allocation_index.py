@@ -0,0 +1,145 @@
+import random
+import sys
+import threading
+from datetime import date, timedelta
+from allocation_index import MemberIntervalIndex, find_slots, plan_batch, working_days
+
+
+def random_index(rng, members, start, span):
+    index = MemberIntervalIndex()
+    for member_id in members:
+        for n in range(rng.randint(0, 6)):
+            first = start + timedelta(days=rng.randrange(span))
+            index.add((member_id, n), member_id, first, first + timedelta(days=rng.randint(0, 4)))
+    return index
+
+
+def earliest_window(index, member_ids, start, end, duration, team_size, skip_weekends, holidays):
+    """Brute force: the first run of `duration` counted days whose whole calendar range has enough free members"""
+    days = working_days(start, end, skip_weekends, holidays)
+    for first in range(len(days) - duration + 1):
+        window = (days[first], days[first + duration - 1])
+        if len(index.available(member_ids, *window)) >= team_size:
+            return window
+    return None
+
+
+def test_find_slots_matches_brute_force():
+    rng = random.Random(7)
+    start = date(2025, 4, 1)
+    for trial in range(300):
+        members = list(range(rng.randint(1, 6)))
+        index = random_index(rng, members, start, 40)
+        end = start + timedelta(days=rng.randint(5, 45))
+        duration = rng.randint(1, 6)
+        team_size = rng.randint(1, len(members))
+        skip_weekends = rng.random() < 0.5
+        holidays = {start + timedelta(days=rng.randrange(40)) for _ in range(rng.randint(0, 3))}
+
+        slots = find_slots(index, members, start, end, duration, team_size=team_size,
+                           skip_weekends=skip_weekends, holidays=holidays, limit=1)
+        expected = earliest_window(index, members, start, end, duration, team_size, skip_weekends, holidays)
+        found = (slots[0]['start'], slots[0]['end']) if slots else None
+        assert found == expected, trial
+        if slots:
+            assert index.available(slots[0]['members'], slots[0]['start'], slots[0]['end']) == slots[0]['members']
+
+
+def test_booking_on_a_weekend_breaks_the_window():
+    index = MemberIntervalIndex()
+    saturday = date(2025, 4, 5)
+    index.add(1, 'M1', saturday, saturday)
+    slots = find_slots(index, ['M1'], date(2025, 4, 3), date(2025, 4, 10), 2, skip_weekends=True)
+    # Thu-Fri fits; Fri-Mon would cover the booked Saturday
+    assert [(slot['start'], slot['end']) for slot in slots] == [
+        (date(2025, 4, 3), date(2025, 4, 4)),
+        (date(2025, 4, 7), date(2025, 4, 8))
+    ]
+
+
+def test_plan_batch_books_only_free_calendar_ranges():
+    rng = random.Random(3)
+    start = date(2025, 4, 1)
+    members = list(range(8))
+    index = random_index(rng, members, start, 60)
+    audits = [{'description': f'Audit {n}', 'section': 'HO', 'duration': rng.randint(2, 5),
+               'headcount': rng.randint(1, 3), 'earliest': start, 'latest': start + timedelta(days=60),
+               'member_ids': members, 'manager_ids': []} for n in range(12)]
+    planned, _ = plan_batch(index, audits, skip_weekends=True, holidays={date(2025, 4, 18)})
+    working = index.copy()
+    for plan in planned:
+        assert working.available(plan['members'], plan['start'], plan['end']) == plan['members']
+        for member_id in plan['members']:
+            working.add(('planned', plan['index'], member_id), member_id, plan['start'], plan['end'])
+
+
+def test_interval_index_matches_brute_force():
+    rng = random.Random(11)
+    start = date(2025, 4, 1)
+    index = MemberIntervalIndex()
+    entries = {}
+    for allocation_id in range(400):
+        member_id = rng.randrange(5)
+        first = start + timedelta(days=rng.randrange(120))
+        last = first + timedelta(days=rng.randint(0, 20))
+        index.add(allocation_id, member_id, first, last)
+        entries[allocation_id] = (member_id, first, last)
+        if rng.random() < 0.2:
+            moved = rng.choice(list(entries))
+            first = start + timedelta(days=rng.randrange(120))
+            last = first + timedelta(days=rng.randint(0, 20))
+            index.move(moved, first, last)
+            entries[moved] = (entries[moved][0], first, last)
+        if rng.random() < 0.1:
+            removed = rng.choice(list(entries))
+            index.remove(removed)
+            del entries[removed]
+
+    for _ in range(300):
+        member_id = rng.randrange(5)
+        first = start + timedelta(days=rng.randrange(130))
+        last = first + timedelta(days=rng.randint(0, 10))
+        expected = sorted(allocation_id for allocation_id, (owner, a, b) in entries.items()
+                          if owner == member_id and a <= last and b >= first)
+        assert sorted(entry[2] for entry in index.busy(member_id, first, last)) == expected
+        assert index.is_available(member_id, first, last) == (not expected)
+
+    rebuilt = MemberIntervalIndex.build((allocation_id, owner, a, b) for allocation_id, (owner, a, b) in entries.items())
+    for member_id in range(5):
+        assert sorted(rebuilt.intervals(member_id)) == sorted(index.intervals(member_id))
+
+
+def test_readers_never_see_a_write_halfway():
+    index = MemberIntervalIndex()
+    day = date(2025, 6, 10)
+    index.add('kept', 1, day - timedelta(days=3), day + timedelta(days=3))
+    stop = threading.Event()
+    seen_free = []
+
+    def read():
+        while not stop.is_set():
+            if index.is_available(1, day, day):
+                seen_free.append(True)
+            index.copy()
+
+    def write():
+        for n in range(3000):
+            # 'kept' always covers day; other allocations come and go around it
+            index.move('kept', day - timedelta(days=n % 4), day + timedelta(days=n % 3))
+            index.add(n, 1, day + timedelta(days=5 + n % 7), day + timedelta(days=6 + n % 7))
+            if n >= 10:
+                index.remove(n - 10)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        write()
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+        sys.setswitchinterval(interval)
+    assert seen_free == []
@@ -0,0 +1,85 @@
+import threading
+import time
+from datetime import date
+from allocation_store import Allocation, AllocationSnapshot, AllocationStore, Member
+
+
+def allocation(allocation_id, day):
+    return Allocation(allocation_id, 1, f'Audit {allocation_id}', 'HO', day, day, '2025-2026')
+
+
+def test_year_payload_follows_writes():
+    snapshot = AllocationSnapshot([Member(1, 'A')], [allocation(1, date(2025, 5, 1))])
+    etag, rows = snapshot.year_payload('2025-2026')
+    snapshot.add_allocation(allocation(2, date(2025, 6, 1)))
+    new_etag, new_rows = snapshot.year_payload('2025-2026')
+    assert new_etag != etag
+    assert [row['id'] for row in new_rows] == [1, 2]
+
+
+def test_payload_built_during_a_write_is_not_kept():
+    snapshot = AllocationSnapshot([Member(1, 'A')], [allocation(1, date(2025, 5, 1))])
+    building = threading.Event()
+    year = snapshot.year
+
+    def slow_year(fy):
+        rows = year(fy)
+        building.set()
+        time.sleep(0.2)  # let the writer try to run while the payload is being built
+        return rows
+
+    snapshot.year = slow_year
+    reader = threading.Thread(target=snapshot.year_payload, args=('2025-2026',))
+    reader.start()
+    building.wait()
+    writer = threading.Thread(target=snapshot.add_allocation, args=(allocation(2, date(2025, 6, 1)),))
+    writer.start()
+    reader.join()
+    writer.join()
+
+    snapshot.year = year
+    _, rows = snapshot.year_payload('2025-2026')
+    assert [row['id'] for row in rows] == [1, 2]
+
+
+def test_adding_an_allocation_twice_keeps_one_copy():
+    snapshot = AllocationSnapshot([Member(1, 'A')], [])
+    snapshot.add_allocation(allocation(1, date(2025, 5, 1)))
+    snapshot.add_allocation(allocation(1, date(2025, 5, 1)))
+    snapshot.remove_allocation(1)
+    assert snapshot.index.intervals(1) == []
+    assert snapshot.year('2025-2026') == []
+
+
+def test_snapshot_loaded_during_a_write_has_no_phantom_after_delete(tmp_path):
+    store = AllocationStore(str(tmp_path / 'allocations.db'))
+    cache = store._cache
+    loading, written = threading.Event(), threading.Event()
+    load, apply = cache._load, cache.apply
+
+    def slow_load():
+        loading.set()
+        written.wait(5)  # the writer commits while this reader is loading
+        return load()
+
+    def signalling_apply(*args):
+        written.set()
+        apply(*args)
+
+    cache._load, cache.apply = slow_load, signalling_apply
+    reader = threading.Thread(target=store.snapshot)
+    reader.start()
+    loading.wait(5)
+    created = []
+    writer = threading.Thread(target=lambda: created.append(
+        store.create(1, 'Audit', 'HO', date(2025, 5, 1), date(2025, 5, 2))))
+    writer.start()
+    reader.join()
+    writer.join()
+    cache._load, cache.apply = load, apply
+
+    assert store.delete(created[0].allocation_id)
+    snapshot = store.snapshot()
+    assert snapshot.allocations == {}
+    assert snapshot.index.intervals(1) == []
+    assert snapshot.index.is_available(1, date(2025, 5, 1), date(2025, 5, 2))
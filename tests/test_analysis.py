@@ -0,0 +1,116 @@
+import random
+import pandas as pd
+import pytest
+from analysis import IN_COLUMNS, MAX_SHIFT, OUT_COLUMNS, pair_punches, read_punch_file, stored_pairing, update_pairing
+from punch_state import PunchStateStore
+
+
+def punch_frame(columns, punches):
+    """Punch frame as read_punch_file returns it, from (person, datetime) pairs"""
+    person, date_column, time_column, datetime_column = columns
+    when = pd.to_datetime([moment for _, moment in punches])
+    return pd.DataFrame({
+        person: pd.array([who for who, _ in punches], dtype="Int64"),
+        date_column: pd.Categorical(when.strftime("%d-%m-%Y")),
+        time_column: pd.Categorical(when.strftime("%H:%M:%S")),
+        datetime_column: when
+    })
+
+
+def random_punches(seed, people=5, count=60):
+    rng = random.Random(seed)
+    start = pd.Timestamp("2024-04-01")
+
+    def moments():
+        return [(rng.randrange(people), start + pd.Timedelta(minutes=15 * rng.randrange(4 * 24 * 6)))
+                for _ in range(count)]
+    return moments(), moments()
+
+
+def reference_pairs(ins, outs):
+    """Plain loops: each in reaches the person's first out after it within MAX_SHIFT; the latest in wins"""
+    claims = {}
+    for who, moment in sorted(ins, key=lambda punch: punch[1]):
+        later = [punch for punch in outs if punch[0] == who and moment < punch[1] <= moment + MAX_SHIFT]
+        if later:
+            claims[min(later, key=lambda punch: punch[1])] = (who, moment)
+    return sorted((who, moment, out_moment) for (_, out_moment), (who, moment) in claims.items())
+
+
+def pair_tuples(pairs):
+    return sorted(zip(pairs["Persno"], pairs["in_datetime"], pairs["out_datetime"]))
+
+
+def test_pair_punches_matches_reference():
+    for seed in range(30):
+        ins, outs = random_punches(seed)
+        # Outs at the same minute as another out are ambiguous; keep the reference simple
+        outs = list(dict((moment, (who, moment)) for who, moment in outs).values())
+        pairs, unmatched_ins, unmatched_outs = pair_punches(punch_frame(IN_COLUMNS, ins),
+                                                            punch_frame(OUT_COLUMNS, outs))
+        expected = reference_pairs(ins, outs)
+        assert pair_tuples(pairs) == expected, seed
+        assert len(pairs) + len(unmatched_ins) == len(ins)
+        assert len(pairs) + len(unmatched_outs) == len(outs)
+
+
+def test_repeated_punch_in_leaves_the_earlier_one_unmatched():
+    ins = [(1, pd.Timestamp("2024-04-01 08:00")), (1, pd.Timestamp("2024-04-01 09:00"))]
+    outs = [(1, pd.Timestamp("2024-04-01 10:00"))]
+    pairs, unmatched_ins, unmatched_outs = pair_punches(punch_frame(IN_COLUMNS, ins), punch_frame(OUT_COLUMNS, outs))
+    assert pair_tuples(pairs) == [(1, ins[1][1], outs[0][1])]
+    assert unmatched_ins["in_datetime"].tolist() == [ins[0][1]]
+    assert unmatched_outs.empty
+
+
+def write_punches(path, columns, punches, append):
+    """Append (person, datetime) punches to a punch CSV laid out like the exports"""
+    person, date_column, time_column, _ = columns
+    when = pd.to_datetime([moment for _, moment in punches])
+    pd.DataFrame({
+        person: [who for who, _ in punches],
+        date_column: when.strftime("%d-%m-%Y"),
+        time_column: when.strftime("%H:%M:%S")
+    }).to_csv(path, index=False, mode="a" if append else "w", header=not append)
+
+
+def pairing_tuples(result):
+    pairs, unmatched_ins, unmatched_outs = result
+    return (pair_tuples(pairs),
+            sorted(zip(unmatched_ins["Persno"], unmatched_ins["in_datetime"])),
+            sorted(zip(unmatched_outs["persno"], unmatched_outs["out_datetime"])))
+
+
+def incremental_pairing(tmp_path, ins, outs, cutoffs):
+    """Feed the punches up to each cutoff to update_pairing as appended rows, then read the store"""
+    pytest.importorskip("pyarrow")
+    in_path, out_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    done = None
+    for cutoff in list(cutoffs) + [pd.Timestamp.max]:
+        for path, columns, punches in ((in_path, IN_COLUMNS, ins), (out_path, OUT_COLUMNS, outs)):
+            batch = [punch for punch in punches if (done is None or punch[1] > done) and punch[1] <= cutoff]
+            write_punches(path, columns, batch, append=done is not None)
+        update_pairing(PunchStateStore(str(tmp_path / "state")), [str(in_path)], [str(out_path)])
+        done = cutoff
+    batch = pair_punches(read_punch_file(str(in_path), *IN_COLUMNS), read_punch_file(str(out_path), *OUT_COLUMNS))
+    return pairing_tuples(stored_pairing(PunchStateStore(str(tmp_path / "state")))), pairing_tuples(batch)
+
+
+def test_incremental_in_that_lost_its_out_stays_unmatched(tmp_path):
+    ins = [(1, pd.Timestamp("2024-04-01 08:00")), (1, pd.Timestamp("2024-04-01 09:00"))]
+    outs = [(1, pd.Timestamp("2024-04-01 10:00")), (1, pd.Timestamp("2024-04-01 15:00"))]
+    incremental, batch = incremental_pairing(tmp_path, ins, outs, [pd.Timestamp("2024-04-01 12:00")])
+    assert incremental == batch
+    assert batch[1] == [(1, ins[0][1])] and batch[2] == [(1, outs[1][1])]
+
+
+def test_incremental_matches_single_run(tmp_path):
+    for seed in range(5):
+        ins, outs = random_punches(seed)
+        outs = list(dict((moment, (who, moment)) for who, moment in outs).values())
+        cutoffs = sorted(pd.Timestamp("2024-04-01") + pd.Timedelta(hours=random.Random(seed).randrange(6 * 24))
+                         for _ in range(4))
+        folder = tmp_path / str(seed)
+        folder.mkdir()
+        incremental, batch = incremental_pairing(folder, ins, outs, cutoffs)
+        assert incremental == batch, seed
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis1 import (SHIFT_BOUNDS, WORKMEN_SHIFTS, load_punches, nearest_boundary, stored_summary, stream_summary,
+                       summarize, update_states)
+from bench_analysis1 import legacy_summarize, synthetic_punches
+from punch_state import PunchStateStore
+
+GATES = {("main", "in"): "Main Gate Door 1", ("main", "out"): "Main Gate Door 2",
+         ("lcm", "in"): "LCM Door 1", ("lcm", "out"): "LCM Door 2"}
+
+
+def punches(rows):
+    """Punch frame as load_punches returns it, from (employee, kind, location, 'YYYY-MM-DD HH:MM') rows"""
+    emp, kind, location, when = zip(*rows)
+    return pd.DataFrame({
+        "employee number": pd.array(emp, dtype="Int64"),
+        "last name": pd.Categorical(kind),
+        "location": pd.Categorical(location),
+        "datetime": pd.to_datetime(list(when))
+    }).sort_values("datetime", kind="stable").reset_index(drop=True)
+
+
+def shift_punches(employees=20, days=15, seed=4):
+    """Workmen on random shifts, night shifts included, with some punches missing or late"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for emp in range(employees):
+        for day in pd.date_range("2025-04-01", periods=days):
+            start, end = WORKMEN_SHIFTS[rng.integers(len(WORKMEN_SHIFTS))]
+            shift_start = day + pd.Timedelta(start + ":00")
+            shift_end = day + pd.Timedelta(end + ":00") + pd.Timedelta(days=int(end <= start))
+            for gate in ("main", "lcm"):
+                for punch, base in (("in", shift_start), ("out", shift_end)):
+                    if rng.random() < 0.1:
+                        continue
+                    # Some workmen leave hours early
+                    early = pd.Timedelta(hours=4) if punch == "out" and rng.random() < 0.1 else pd.Timedelta(0)
+                    when = base - early + pd.Timedelta(minutes=int(rng.integers(-20, 20)))
+                    rows.append((emp, "Workmen", GATES[gate, punch], f"{when:%Y-%m-%d %H:%M}"))
+    return punches(rows)
+
+
+def test_nearest_boundary_matches_brute_force():
+    starts, _ = SHIFT_BOUNDS["workmen"]
+    minutes = np.arange(24 * 60)
+    shift, offset = nearest_boundary(minutes, starts)
+    for minute in range(0, 24 * 60, 7):
+        candidates = [(abs(minute - (start + 24 * 60 * day)), start + 24 * 60 * day, n, day)
+                      for n, start in enumerate(starts) for day in (-1, 0, 1)]
+        best = min(candidate[0] for candidate in candidates)
+        _, _, n, day = min(candidate for candidate in candidates if candidate[0] == best)
+        assert (shift[minute], offset[minute]) == (n, day), minute
+
+
+def test_early_out_stays_with_its_in_punch():
+    summary = summarize(punches([
+        (7, "Workmen", "Main Gate Door 1", "2025-04-01 07:25"),
+        (7, "Workmen", "LCM Door 1", "2025-04-01 07:28"),
+        (7, "Workmen", "LCM Door 2", "2025-04-01 11:00"),
+        (7, "Workmen", "Main Gate Door 2", "2025-04-01 11:05")
+    ]))
+    assert len(summary) == 1
+    row = summary.iloc[0]
+    assert str(row["Date"]) == "2025-04-01" and str(row["Shift Start"]) == "07:30:00"
+    assert (str(row["Main Out"]), str(row["LCM Out"])) == ("11:05:00", "11:00:00")
+
+
+def test_night_shift_is_one_shift_day():
+    summary = summarize(punches([
+        (8, "Workmen", "Main Gate Door 1", "2025-04-01 23:20"),
+        (8, "Workmen", "LCM Door 1", "2025-04-01 23:24"),
+        (8, "Workmen", "LCM Door 2", "2025-04-02 07:35"),
+        (8, "Workmen", "Main Gate Door 2", "2025-04-02 07:40")
+    ]))
+    assert summary[["Date", "Shift Start", "Shift End"]].astype(str).values.tolist() == [
+        ["2025-04-01", "23:30:00", "07:30:00"]
+    ]
+    assert (summary[["In Mismatch", "Out Mismatch"]] == "No").all().all()
+
+
+def test_out_without_in_uses_nearest_shift_end():
+    summary = summarize(punches([
+        (9, "Workmen", "Main Gate Door 2", "2025-04-02 07:40"),
+        (9, "Workmen", "LCM Door 2", "2025-04-02 07:41")
+    ]))
+    assert summary[["Date", "Shift Start"]].astype(str).values.tolist() == [["2025-04-01", "23:30:00"]]
+
+
+def test_streaming_matches_batch():
+    df = shift_punches()
+    batch = summarize(df).to_csv(index=False)
+    for chunk_rows in (5, 97, 1000):
+        chunks = (df.iloc[i:i + chunk_rows] for i in range(0, len(df), chunk_rows))
+        streamed = pd.concat(stream_summary(chunks), ignore_index=True)
+        streamed = streamed.sort_values(["Employee No", "Date"], kind="stable")
+        assert streamed.to_csv(index=False) == batch, chunk_rows
+
+
+def test_incremental_matches_single_run(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = shift_punches(employees=8, days=10)
+    export = pd.DataFrame({
+        "Employee Number": df["employee number"],
+        "Last Name": df["last name"],
+        "Location": df["location"],
+        "Date": df["datetime"].dt.strftime("%Y-%m-%d"),
+        "Time": df["datetime"].dt.strftime("%H:%M")
+    })
+    path = str(tmp_path / "punch_data.csv")
+    # Nightly runs over an export that keeps growing, cut mid-shift as well as between days
+    cuts = [0, len(export) // 7, len(export) // 3, len(export) // 3 + 1, len(export) * 4 // 5, len(export)]
+    for first, last in zip(cuts, cuts[1:]):
+        export.iloc[first:last].to_csv(path, index=False, mode="a" if first else "w", header=not first)
+        update_states(PunchStateStore(str(tmp_path / "state")), [path], chunk_rows=50)
+    incremental = stored_summary(PunchStateStore(str(tmp_path / "state")))
+    assert incremental.to_csv(index=False) == summarize(load_punches(path)).to_csv(index=False)
+
+
+def test_summary_matches_legacy_loop():
+    df = synthetic_punches(employees=12, days=6)
+    # The old loop put everyone on the first configured shift, so only the punch columns compare
+    columns = ["Employee No", "Date", "Main In", "LCM In", "Main Out", "LCM Out", "In Mismatch", "Out Mismatch"]
+    assert summarize(df)[columns].to_csv(index=False) == legacy_summarize(df)[columns].to_csv(index=False)
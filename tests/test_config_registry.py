@@ -0,0 +1,82 @@
+import os
+import threading
+
+from config_registry import ConfigRegistry, atomic_write
+
+
+def parse_lines(f):
+    return [line.strip() for line in f.readlines() if line.strip()]
+
+
+def run_threads(target, count):
+    errors = []
+
+    def run(i):
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_atomic_writes_leave_one_whole_file(tmp_path):
+    path = str(tmp_path / 'types.txt')
+    texts = ["\n".join([f"writer {i}"] * 200) for i in range(8)]
+
+    def write(i):
+        for _ in range(20):
+            atomic_write(path, texts[i])
+
+    assert run_threads(write, 8) == []
+    with open(path) as f:
+        assert f.read() in texts
+    assert os.listdir(tmp_path) == ['types.txt']
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    path = tmp_path / 'users.txt'
+    path.write_text('old')
+    os.chmod(path, 0o644)
+    atomic_write(str(path), 'new')
+    assert path.read_text() == 'new'
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    path = tmp_path / 'types.txt'
+    path.write_text('')
+    registry = ConfigRegistry()
+    registry.register('types', str(path), parse_lines)
+
+    def append(i):
+        registry.update('types', lambda types: "\n".join(list(types) + [f"type {i}"]))
+
+    assert run_threads(append, 16) == []
+    assert sorted(registry.get('types')) == sorted(f"type {i}" for i in range(16))
+
+
+def test_update_can_leave_file_alone(tmp_path):
+    path = tmp_path / 'types.txt'
+    path.write_text('a\nb')
+    registry = ConfigRegistry()
+    registry.register('types', str(path), parse_lines)
+    assert registry.update('types', lambda types: None) is False
+    assert registry.update('types', lambda types: "\n".join(types + ['c'])) is True
+    assert registry.get('types') == ['a', 'b', 'c']
+
+
+def test_get_reloads_after_external_change(tmp_path):
+    path = tmp_path / 'types.txt'
+    path.write_text('a')
+    registry = ConfigRegistry()
+    registry.register('types', str(path), parse_lines)
+    assert registry.get('types') == ['a']
+    assert registry.get('types') is registry.get('types')
+    path.write_text('a\nlonger')
+    assert registry.get('types') == ['a', 'longer']
@@ -0,0 +1,34 @@
+import random
+from allocation_store import Member
+from member_registry import MemberRegistry, name_tokens
+
+FIRST = ["Anil", "Anita", "Bala", "Banu", "Chitra", "Deepak", "Devi"]
+LAST = ["Kumar", "Krishnan", "Rao", "Raman", "Singh"]
+DEPARTMENTS = ["Audit", "Finance", "IT"]
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(2)
+    members = {n: Member(n, f"{rng.choice(FIRST)} {rng.choice(LAST)}", f"m{n}@example.com", rng.choice(DEPARTMENTS))
+               for n in range(200)}
+    registry = MemberRegistry(members)
+    order = sorted(members, key=lambda n: (members[n].name.lower(), str(n)))
+    for text in ["", "an", "ani ku", "r", "devi raman", "x", "KU an"]:
+        for department in [None, "audit", "IT"]:
+            words = name_tokens(text)
+            expected = [n for n in order
+                        if (department is None or members[n].department.lower() == department.lower())
+                        and all(any(token.startswith(word) for token in name_tokens(members[n].name))
+                                for word in words)]
+            found, total = registry.search(text, department, limit=7, offset=3)
+            assert total == len(expected)
+            assert [member.member_id for member in found] == expected[3:10]
+
+
+def test_lookups():
+    members = {1: Member(1, "Anil Kumar", "Anil@Example.com", "Audit"), 2: Member(2, "Bala Rao", None, "IT")}
+    registry = MemberRegistry(members)
+    assert registry.by_email(" anil@example.com ").member_id == 1
+    assert registry.by_email("nobody@example.com") is None
+    assert registry.in_department("it") == [2]
+    assert registry.names() == {1: "Anil Kumar", 2: "Bala Rao"}
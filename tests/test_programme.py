@@ -0,0 +1,32 @@
+from datetime import date
+from allocation_store import Allocation
+from bench_programme_data import MANAGERS, legacy_prepare, pipeline_prepare, synthetic_year
+from programme_pdf import COLUMN_WIDTHS, PDF
+
+
+def test_pipeline_matches_per_allocation_loop():
+    allocations, member_map = synthetic_year(3000)
+    assert pipeline_prepare(allocations, member_map, MANAGERS) == legacy_prepare(allocations, member_map, MANAGERS)
+
+
+def test_missing_description_prints_blank():
+    allocations = [Allocation(1, 1, None, 'Audit', date(2025, 5, 1), date(2025, 5, 3)),
+                   Allocation(2, 2, float('nan'), 'Audit', date(2025, 6, 1), date(2025, 6, 3))]
+    _, sections = pipeline_prepare(allocations, {1: 'A', 2: 'B'}, [])
+    rows = [row for _, units in sections for row in units]
+    assert [PDF().row_values(n, row)[2] for n, row in enumerate(rows, 1)] == ['', '']
+
+
+def test_wrapped_lines_fit_their_column():
+    pdf = PDF()
+    layout = pdf.body_layout()
+    layout.use_font()
+    texts = ["Plant B - Maintenance Contracts and Work Orders", "Supercalifragilisticexpialidociousness" * 2,
+             "Priya Raman, Arjun Mehta, Kavita Iyer, John Doe", "", "HO-Finance"]
+    for text in texts:
+        for width in COLUMN_WIDTHS:
+            lines = layout.wrap(text, width)
+            assert all(pdf.get_string_width(line) <= width - 2 * layout.padding for line in lines)
+            assert "".join("".join(lines).split()) == "".join(text.split())
+    height, cells = layout.layout_row(texts[:3] + [""] * 5)
+    assert height == max(layout.min_height, max(len(lines) for lines in cells) * layout.line_height)
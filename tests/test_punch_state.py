@@ -0,0 +1,76 @@
+import importlib.util
+import pandas as pd
+import pytest
+from punch_state import PunchStateStore
+
+needs_parquet = pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="pyarrow is not installed")
+
+
+def test_missing_parquet_engine_fails_up_front(tmp_path, monkeypatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ImportError, match="pip install pyarrow"):
+        PunchStateStore(str(tmp_path / "state"))
+    assert not (tmp_path / "state").exists()
+
+
+def rows(*days):
+    return pd.DataFrame({"day": pd.to_datetime(list(days)), "value": range(len(days))})
+
+
+@needs_parquet
+def test_new_rows_reads_only_what_was_appended(tmp_path):
+    path = tmp_path / "punches.csv"
+    path.write_text("a,b\n1,2\n")
+    store = PunchStateStore(str(tmp_path / "state"))
+    assert pd.concat(store.new_rows(str(path), 10)).to_dict("records") == [{"a": 1, "b": 2}]
+    store.mark_ingested(str(path))
+    store.save()
+
+    with open(path, "a") as f:
+        f.write("3,4\n5,6\n")
+    store = PunchStateStore(str(tmp_path / "state"))
+    assert pd.concat(store.new_rows(str(path), 1)).to_dict("records") == [{"a": 3, "b": 4}, {"a": 5, "b": 6}]
+    store.mark_ingested(str(path))
+    store.save()
+    assert list(PunchStateStore(str(tmp_path / "state")).new_rows(str(path), 10)) == []
+
+
+@needs_parquet
+def test_repeated_run_replaces_its_own_rows(tmp_path):
+    path = tmp_path / "punches.csv"
+    path.write_text("a\n1\n")
+    # An interrupted run appends but never saves; its repeat starts from the same input
+    PunchStateStore(str(tmp_path / "state")).append("t", rows("2024-04-01", "2024-04-01"), "day")
+    store = PunchStateStore(str(tmp_path / "state"))
+    store.append("t", rows("2024-04-01", "2024-04-01"), "day")
+    store.mark_ingested(str(path))
+    store.save()
+    assert len(store.read("t")) == 2
+
+    # A later run may store identical rows again: they are new punches
+    store = PunchStateStore(str(tmp_path / "state"))
+    store.append("t", rows("2024-04-01"), "day")
+    assert len(store.read("t")) == 3
+
+
+@needs_parquet
+def test_table_takes_effect_with_the_manifest(tmp_path):
+    path = tmp_path / "punches.csv"
+    path.write_text("a\n1\n")
+    store = PunchStateStore(str(tmp_path / "state"))
+    store.write_table("open", rows("2024-04-01"))
+    store.mark_ingested(str(path))
+    store.save()
+
+    with open(path, "a") as f:
+        f.write("2\n")
+    interrupted = PunchStateStore(str(tmp_path / "state"))
+    interrupted.write_table("open", rows("2024-04-02", "2024-04-03"))
+    assert len(interrupted.read_table("open")) == 2
+    # Not saved: the next run still sees the table of the last saved run
+    store = PunchStateStore(str(tmp_path / "state"))
+    assert len(store.read_table("open")) == 1
+    store.write_table("open", rows("2024-04-04"))
+    store.mark_ingested(str(path))
+    store.save()
+    assert sorted(p.name for p in (tmp_path / "state").glob("open-*.parquet")) == [store.manifest["tables"]["open"]]
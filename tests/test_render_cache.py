@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from render_cache import RenderCache, content_key
+
+
+def write(text):
+    def render(path):
+        with open(path, 'w') as f:
+            f.write(text)
+    return render
+
+
+def test_render_is_cached_and_shared(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    key = content_key('2025-2026', '01-04-2025')
+    release = threading.Event()
+    calls = []
+
+    def slow(path):
+        calls.append(path)
+        release.wait(5)
+        write('pdf')(path)
+
+    first = cache.submit(key, slow)
+    assert cache.submit(key, slow) is first
+    assert cache.status(key) == ('pending', None)
+    assert cache.lookup(key) is None
+    release.set()
+    path = first.result(5)
+    assert len(calls) == 1
+    assert cache.lookup(key) == path
+    assert cache.status(key) == ('done', None)
+    assert open(path).read() == 'pdf'
+
+
+def test_failed_render_reports_error_and_leaves_no_file(tmp_path):
+    cache = RenderCache(str(tmp_path))
+    key = content_key('broken')
+
+    def fail(path):
+        open(path, 'w').close()
+        raise ValueError('no allocations')
+
+    with pytest.raises(ValueError):
+        cache.submit(key, fail).result(5)
+    assert cache.status(key) == ('failed', 'no allocations')
+    assert list(tmp_path.iterdir()) == []
+    cache.submit(key, write('pdf')).result(5)
+    assert cache.status(key) == ('done', None)
+
+
+def test_lookup_only_accepts_content_keys(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    (tmp_path / 'secret.pdf').write_text('x')
+    assert cache.lookup('../secret') is None
+    assert cache.status('../secret') == (None, None)
+
+
+def test_oldest_files_are_pruned(tmp_path):
+    cache = RenderCache(str(tmp_path), max_files=2)
+    keys = [content_key(n) for n in range(3)]
+    for key in keys:
+        cache.submit(key, write(key)).result(5)
+    assert cache.lookup(keys[0]) is None
+    assert all(cache.lookup(key) for key in keys[1:])
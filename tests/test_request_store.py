@@ -0,0 +1,170 @@
+import multiprocessing
+
+import pandas as pd
+import pytest
+from request_store import REQUEST_COLUMNS, VersionConflict, open_store
+
+
+def new_record(request_id):
+    record = {col: '' for col in REQUEST_COLUMNS}
+    record.update(request_id=request_id, request_type='Access', status='Pending', current_admin='admin1',
+                  created_at='2025-04-01 09:00:00', last_updated='2025-04-01 09:00:00')
+    return record
+
+
+def event(request_id, message):
+    return {'request_id': request_id, 'event_type': 'approved', 'actor': 'admin1',
+            'message': message, 'created_at': '2025-04-02 10:00:00'}
+
+
+@pytest.fixture(params=['sqlite', 'excel'])
+def store(request, tmp_path):
+    path = tmp_path / ('requests.db' if request.param == 'sqlite' else 'requests.xlsx')
+    store = open_store(request.param, str(path))
+    store.create_many([new_record('REQ-1')])
+    return store
+
+
+def test_update_records_its_events(store):
+    version = store.update('REQ-1', {'status': 'Approved'}, expected_version=1,
+                           events=[event('REQ-1', 'Approved by admin1')])
+    assert version == 2
+    assert store.get('REQ-1')['status'] == 'Approved'
+    assert [ev['message'] for ev in store.history('REQ-1')] == ['Approved by admin1']
+
+
+def test_conflicting_update_writes_no_events(store):
+    with pytest.raises(VersionConflict):
+        store.update('REQ-1', {'status': 'Approved'}, expected_version=5,
+                     events=[event('REQ-1', 'Approved by admin1')])
+    assert store.get('REQ-1')['status'] == 'Pending'
+    assert store.history('REQ-1') == []
+
+
+@pytest.mark.parametrize('sort', ['sno', 'request_type', '-request_type', 'status', '-created_at', 'current_admin'])
+def test_paging_returns_every_row_once(store, sort):
+    records = []
+    for n in range(2, 51):
+        record = new_record(f'REQ-{n}')
+        # Several rows share a sort value and some have none at all
+        record.update(request_type=[None, 'Access', 'Laptop', ''][n % 4], status=[None, 'Open', 'Closed'][n % 3],
+                      current_admin=None if n % 5 == 0 else f'admin{n % 3 + 1}',
+                      created_at=None if n % 7 == 0 else f'2025-04-{n % 28 + 1:02d} 09:00:00')
+        records.append(record)
+    store.create_many(records)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.query(sort=sort, limit=7, cursor=cursor)
+        seen.extend(row['sno'] for row in rows)
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(1, 51))
+    assert seen == [row['sno'] for row in store.query(sort=sort)[0]]
+
+
+def test_search_matches_across_fields_and_history_on_both_backends(tmp_path):
+    results = {}
+    for backend, name in (('sqlite', 'requests.db'), ('excel', 'requests.xlsx')):
+        store = open_store(backend, str(tmp_path / name))
+        records = [new_record(f'REQ-{i}') for i in range(1, 5)]
+        records[0].update(description='New laptop request', raiser_name='Asha')
+        records[1].update(description='Laptop battery swap', raiser_name='Ravi')
+        records[2].update(description='Network issue', raiser_name='Asha')
+        records[3].update(description='Chair replacement', custom_description='laptop stand')
+        store.create_many(records, [event('REQ-1', 'Forwarded to admin2'), event('REQ-3', 'Forwarded to admin2')])
+        store.update('REQ-2', {'status': 'Approved'}, events=[event('REQ-2', 'Approved by admin1')])
+        store.update('REQ-4', {'description': 'Desk lamp'}, events=[event('REQ-4', 'Sent to admin2')])
+        results[backend] = {
+            text: (sorted(hit['request_id'] for hit in store.search(text)[0]), store.search(text)[1])
+            for text in ('laptop admin2', 'laptop', 'admin2', 'asha network', 'lamp', 'chair', 'approved admin')
+        }
+    assert results['sqlite'] == results['excel']
+    assert results['sqlite']['laptop admin2'] == (['REQ-1', 'REQ-4'], 2)
+    assert results['sqlite']['chair'] == ([], 0)
+
+
+def test_query_filters_and_projects(store):
+    records = [new_record(f'REQ-{n}') for n in range(2, 6)]
+    records[0].update(raiser_username='asha', status='Closed')
+    records[1].update(raiser_username='asha', current_admin='admin2')
+    records[2].update(raiser_username='ravi', request_type='Laptop')
+    store.create_many(records)
+    assert [row['request_id'] for row in store.list(raiser_username='asha')] == ['REQ-2', 'REQ-3']
+    assert [row['request_id'] for row in store.list(status='Closed')] == ['REQ-2']
+    assert [row['request_id'] for row in store.list(current_admin='admin2')] == ['REQ-3']
+    assert [row['request_id'] for row in store.list(request_type='Laptop', fields=['request_id'])] == ['REQ-4']
+    assert store.get('REQ-5')['sno'] == 5
+    assert store.get('missing') is None
+
+
+@pytest.mark.parametrize('target', ['sqlite', 'excel'])
+def test_export_imports_into_either_backend(store, target, tmp_path):
+    store.create_many([new_record('REQ-2')], [event('REQ-2', 'Forwarded to admin2')])
+    store.update('REQ-1', {'status': 'Closed'}, events=[event('REQ-1', 'Closed by admin1')])
+    store.export_xlsx(str(tmp_path / 'export.xlsx'))
+
+    copy = open_store(target, str(tmp_path / ('copy.db' if target == 'sqlite' else 'copy.xlsx')))
+    assert copy.import_xlsx(str(tmp_path / 'export.xlsx')) == 2
+    assert [(row['request_id'], row['sno'], row['status'], row['version']) for row in copy.list()] == \
+        [('REQ-1', 1, 'Closed', 2), ('REQ-2', 2, 'Pending', 1)]
+    assert [ev['message'] for ev in copy.history('REQ-1')] == ['Closed by admin1']
+    assert [ev['message'] for ev in copy.history('REQ-2')] == ['Forwarded to admin2']
+    assert copy.counters()['status'] == {'Closed': 1, 'Pending': 1}
+
+
+def test_workbook_is_parsed_only_when_it_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'requests.xlsx')
+    store = open_store('excel', path)
+    store.create_many([new_record('REQ-1')])
+    read_excel = pd.read_excel
+    reads = []
+    monkeypatch.setattr(pd, 'read_excel', lambda *args, **kwargs: reads.append(args) or read_excel(*args, **kwargs))
+
+    # Repeated reads and this process's own writes never re-parse the file
+    store.get('REQ-1')
+    store.list()
+    store.update('REQ-1', {'status': 'Approved'})
+    store.create(new_record('REQ-2'))
+    assert store.get('REQ-1')['status'] == 'Approved'
+    assert [row['request_id'] for row in store.list()] == ['REQ-1', 'REQ-2']
+    assert reads == []
+
+    # A write through another handle, as from another worker, is picked up
+    open_store('excel', path).update('REQ-2', {'status': 'Closed'})
+    assert store.get('REQ-2')['status'] == 'Closed'
+    assert len(reads) == 2
+    store.get('REQ-2')
+    assert len(reads) == 2
+
+
+def write_from_worker(backend, path, worker):
+    store = open_store(backend, path)
+    for n in range(5):
+        store.create(new_record(f'W{worker}-{n}'))
+        # Optimistic retry loop: every increment must land exactly once
+        while True:
+            current = store.get('REQ-1')
+            try:
+                store.update('REQ-1', {'status': f'Seen by {worker}'}, expected_version=current['version'])
+                break
+            except VersionConflict:
+                continue
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'excel'])
+def test_writers_in_several_processes_lose_nothing(backend, tmp_path):
+    path = str(tmp_path / ('requests.db' if backend == 'sqlite' else 'requests.xlsx'))
+    open_store(backend, path).create_many([new_record('REQ-1')])
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=write_from_worker, args=(backend, path, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+
+    store = open_store(backend, path)
+    assert sorted(row['sno'] for row in store.list()) == list(range(1, 22))
+    assert store.get('REQ-1')['version'] == 21
+    assert store.counters()['total'] == {'': 21}
@@ -0,0 +1,169 @@
+import io
+import json
+
+from conftest import login
+
+
+def create_request(client, description='New laptop request'):
+    login(client, 'user1', 'user')
+    return create_request_as(client, description)
+
+
+def create_request_as(client, description):
+    response = client.post('/api/requests', json={'request_type': 'IT Support', 'description': description,
+                                                  'custom_description': '', 'raiser_name': 'User One'})
+    assert response.status_code == 200
+    return response.get_json()['request_id']
+
+
+def test_create_records_history(app):
+    client = app.app.test_client()
+    request_id = create_request(client)
+    events = client.get(f'/api/requests/{request_id}/history').get_json()['events']
+    assert [event['event_type'] for event in events] == ['created']
+
+
+def test_history_limit_is_clamped(app):
+    client = app.app.test_client()
+    request_id = create_request(client)
+    login(client, 'admin1', 'admin1')
+    client.put(f'/api/requests/{request_id}', json={'update_text': 'Replaced', 'status': 'Closed'})
+    for limit, expected in (('0', 1), ('-5', 1), ('2', 2), ('1000', 3)):
+        response = client.get(f'/api/requests/{request_id}/history?limit={limit}')
+        assert response.status_code == 200, limit
+        assert len(response.get_json()['events']) == expected, limit
+
+
+def test_counter_reconciliation_starts_once_per_process(app):
+    client = app.app.test_client()
+    create_request(client)
+    assert app.reconciler_pid == app.os.getpid()
+    assert app.start_counter_reconciliation() is False
+
+
+def test_descriptions_add_and_remove(app):
+    client = app.app.test_client()
+    login(client, 'admin1', 'admin1')
+    body = {'request_type': 'IT Support', 'description': 'Monitor request'}
+    assert client.post('/api/request-types/descriptions', json=body).status_code == 200
+    assert client.post('/api/request-types/descriptions', json=body).status_code == 400
+    assert 'Monitor request' in app.get_predefined_descriptions()['IT Support']
+    assert client.delete('/api/request-types/descriptions', json=body).status_code == 200
+    assert client.delete('/api/request-types/descriptions', json=body).status_code == 404
+    assert 'Monitor request' not in app.get_predefined_descriptions()['IT Support']
+
+
+def test_request_types_add_and_remove(app):
+    client = app.app.test_client()
+    login(client, 'admin1', 'admin1')
+    assert client.post('/api/request-types', json={'type_name': 'Legal'}).status_code == 200
+    assert 'Legal' in app.get_request_types()
+    assert app.get_predefined_descriptions()['Legal'] == []
+    assert client.delete('/api/request-types', json={'type_name': 'Legal'}).status_code == 200
+    assert 'Legal' not in app.get_request_types()
+    assert 'Legal' not in app.get_predefined_descriptions()
+
+
+def test_stale_version_is_rejected(app):
+    client = app.app.test_client()
+    request_id = create_request(client)
+    login(client, 'admin1', 'admin1')
+    first = client.put(f'/api/requests/{request_id}', json={'update_text': 'Looking', 'version': 1})
+    assert first.get_json() == {'success': True, 'version': 2}
+    stale = client.put(f'/api/requests/{request_id}', json={'update_text': 'Closing', 'status': 'Closed', 'version': 1})
+    assert stale.status_code == 409
+    assert stale.get_json()['current_version'] == 2
+    assert app.store.get(request_id)['status'] == 'Open'
+    assert client.put(f'/api/requests/{request_id}', json={'version': 'x'}).status_code == 400
+
+
+def read_events(client, count):
+    """Open /api/events from the start and return its first `count` events as (type, data)"""
+    response = client.get('/api/events?since=0')
+    assert response.mimetype == 'text/event-stream'
+    chunks = (chunk.decode() for chunk in response.response)
+    assert next(chunks).startswith('retry:')
+    events = []
+    while len(events) < count:
+        chunk = next(chunks)
+        if chunk.startswith('id:'):
+            lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            events.append((lines['event'], json.loads(lines['data'])))
+    # The next pull runs the notification update for the events just sent
+    next(chunks)
+    response.close()
+    return events
+
+
+def test_event_stream_shows_each_user_only_their_requests(app, monkeypatch):
+    monkeypatch.setattr(app, 'EVENT_POLL_SECONDS', 0.01)
+    monkeypatch.setattr(app, 'EVENT_KEEPALIVE_SECONDS', 0.01)
+    client = app.app.test_client()
+    mine = create_request(client, 'New laptop request')
+    login(client, 'user2', 'user')
+    theirs = create_request_as(client, 'Chair replacement')
+    login(client, 'admin1', 'admin1')
+    client.put(f'/api/requests/{mine}', json={'next_admin': 'admin2'})
+
+    login(client, 'user1', 'user')
+    assert [(kind, event['request_id']) for kind, event in read_events(client, 2)] == \
+        [('created', mine), ('forwarded', mine)]
+
+    login(client, 'admin2', 'admin2')
+    assert [(kind, event['request_id']) for kind, event in read_events(client, 2)] == \
+        [('created', mine), ('forwarded', mine)]
+    assert app.store.get(mine)['notification_sent'] is True
+
+    login(client, 'admin1', 'admin1')
+    assert [(kind, event['request_id']) for kind, event in read_events(client, 1)] == [('created', theirs)]
+    assert app.store.get(theirs)['notification_sent'] is True
+
+
+def test_bulk_create_reports_each_item(app):
+    client = app.app.test_client()
+    login(client, 'user1', 'user')
+    good = {'request_type': 'IT Support', 'description': 'Network issue', 'custom_description': '',
+            'raiser_name': 'User One'}
+    body = client.post('/api/requests/bulk', json=[good, {'request_type': 'IT Support'}, good]).get_json()
+    assert (body['success'], body['succeeded'], body['failed']) == (False, 2, 1)
+    assert [result['success'] for result in body['results']] == [True, False, True]
+    assert [result.get('sno') for result in body['results']] == [1, None, 2]
+    assert body['results'][1]['error'] == 'Missing required fields'
+    assert len(app.store.list()) == 2
+    assert [ev['event_type'] for ev in app.store.history(body['results'][2]['request_id'])] == ['created']
+
+
+def test_bulk_create_from_csv(app):
+    client = app.app.test_client()
+    login(client, 'user1', 'user')
+    csv_text = 'request_type,description,custom_description,raiser_name\nHR Query,Leave request,,User One\n'
+    response = client.post('/api/requests/bulk', data={'file': (io.BytesIO(csv_text.encode()), 'requests.csv')},
+                           content_type='multipart/form-data')
+    assert response.get_json()['succeeded'] == 1
+    assert app.store.list()[0]['request_type'] == 'HR Query'
+
+
+def test_bulk_update_reports_each_item(app):
+    client = app.app.test_client()
+    first, second, third = (create_request(client, f'Request {n}') for n in range(3))
+    login(client, 'admin1', 'admin1')
+    items = [
+        {'request_id': first, 'update_text': 'Done', 'status': 'Closed', 'version': 1},
+        {'request_id': second, 'next_admin': 'admin2', 'version': 7},
+        {'request_id': third, 'next_admin': 'admin9'},
+        {'request_id': 'missing', 'update_text': 'Done'},
+    ]
+    body = client.put('/api/requests/bulk', json=items).get_json()
+    assert (body['succeeded'], body['failed']) == (1, 3)
+    assert [result.get('status') for result in body['results']] == [None, 409, 400, 404]
+    assert body['results'][0]['version'] == 2
+    assert body['results'][1]['current_version'] == 1
+    assert app.store.get(first)['status'] == 'Closed'
+    assert app.store.get(second)['current_admin'] == 'admin1'
+    assert app.store.get(third)['current_admin'] == 'admin1'
+
+
+def test_bulk_rejects_non_array(app):
+    client = app.app.test_client()
+    login(client, 'admin1', 'admin1')
+    assert client.put('/api/requests/bulk', json={'request_id': 'x'}).status_code == 400